@@ -0,0 +1,92 @@
+"""Reloading archived sessions: JSON versus the columnar format.
+
+Writes one session as JSON, NDJSON and columnar files, then times loading
+it back as a SessionTimeline and running deterministic generation from
+each, and an analytics query (events per type) that the columnar file
+answers from one column without building events. Run from the repository root:
+
+    python benchmarks/bench_columnar.py [n_events]
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.columnar import EVENT_TYPES, ColumnarSession, session_header, write_columnar
+from src.core.ingestion import write_ndjson_session
+from src.core.workflow_generator import WorkflowGenerator
+from src.models.events import SessionTimeline
+from benchmarks.synthetic import make_session
+
+
+def best_of(func, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_json(path: str) -> SessionTimeline:
+    with open(path, "rb") as f:
+        return SessionTimeline.model_validate_json(f.read())
+
+
+def load_columnar(path: str) -> SessionTimeline:
+    with ColumnarSession.open(path) as columnar:
+        return columnar.to_session()
+
+
+def type_counts_json(path: str) -> Counter:
+    return Counter(event.event_type for event in load_json(path).events)
+
+
+def type_counts_columnar(path: str) -> Counter:
+    with ColumnarSession.open(path) as columnar:
+        codes = Counter(columnar.columns["event_type"])
+    return Counter({EVENT_TYPES[code]: count for code, count in codes.items()})
+
+
+def generate_ndjson(generator: WorkflowGenerator, path: str) -> None:
+    with open(path, "rb") as f:
+        generator.generate_from_ndjson(f)
+
+
+def main(n_events: int = 100_000):
+    session = make_session(n_events)
+    generator = WorkflowGenerator(chunk_threshold=None)
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "session.json")
+        ndjson_path = os.path.join(directory, "session.ndjson")
+        columnar_path = os.path.join(directory, "session.wfcs")
+        with open(json_path, "w") as f:
+            f.write(session.model_dump_json())
+        with open(ndjson_path, "w") as f:
+            f.writelines(write_ndjson_session(session_header(session), session.events))
+        write_columnar(columnar_path, session_header(session), session.events)
+
+        print(f"{n_events} events")
+        for label, path in (("json", json_path), ("ndjson", ndjson_path), ("columnar", columnar_path)):
+            print(f"  {label:<10} {os.path.getsize(path) / 1e6:>8.1f} MB")
+
+        rows = [
+            ("load, json", lambda: load_json(json_path)),
+            ("load, columnar", lambda: load_columnar(columnar_path)),
+            ("events per type, json", lambda: type_counts_json(json_path)),
+            ("events per type, columnar", lambda: type_counts_columnar(columnar_path)),
+            ("generate, json", lambda: generator.generate_from_events_only(load_json(json_path))),
+            ("generate, ndjson stream", lambda: generate_ndjson(generator, ndjson_path)),
+            ("generate, columnar", lambda: generator.generate_from_columnar(columnar_path)),
+        ]
+        for label, func in rows:
+            elapsed = best_of(func)
+            print(f"  {label:<26}: {n_events / elapsed:>12,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
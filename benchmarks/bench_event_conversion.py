@@ -0,0 +1,103 @@
+"""Events/sec for event-to-step conversion: the original if/elif converter
+over untyped event data versus the converter registry over typed events.
+Both build fully validated steps.
+
+    python benchmarks/bench_event_conversion.py [n_events]
+"""
+import os
+import sys
+import time
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.converters import convert_event
+from src.models.events import EventType
+from src.models.workflow import WorkflowStep, ActionType, Selector
+from benchmarks.synthetic import make_session, make_legacy_session
+
+
+def legacy_event_to_step(event, step_num: int) -> Optional[WorkflowStep]:
+    """The if/elif converter as it was before the registry, over untyped event data"""
+
+    event_type = event.event_type
+    data = event.data
+
+    if event_type == EventType.MOUSE_CLICK:
+        return WorkflowStep(
+            step_id=f"step_{step_num}",
+            action=ActionType.CLICK,
+            description=f"Click at ({data.get('x')}, {data.get('y')})",
+            selector=Selector(type="coordinates", value={"x": data.get("x"), "y": data.get("y")}),
+            parameters={"button": data.get("button", "left")},
+            screenshot_before=event.screenshot_ref
+        )
+    elif event_type == EventType.MOUSE_DOUBLE_CLICK:
+        return WorkflowStep(
+            step_id=f"step_{step_num}",
+            action=ActionType.DOUBLE_CLICK,
+            description=f"Double-click at ({data.get('x')}, {data.get('y')})",
+            selector=Selector(type="coordinates", value={"x": data.get("x"), "y": data.get("y")}),
+            parameters={}
+        )
+    elif event_type == EventType.TEXT_INPUT:
+        return WorkflowStep(
+            step_id=f"step_{step_num}",
+            action=ActionType.TYPE_TEXT,
+            description=f"Type: {data.get('text', '')[:50]}...",
+            selector=None,
+            parameters={"text": data.get("text", "")}
+        )
+    elif event_type == EventType.KEY_PRESS:
+        return WorkflowStep(
+            step_id=f"step_{step_num}",
+            action=ActionType.PRESS_KEY,
+            description=f"Press key: {data.get('key')}",
+            selector=None,
+            parameters={"key": data.get("key"), "modifiers": data.get("modifiers", [])}
+        )
+    elif event_type == EventType.SCROLL:
+        return WorkflowStep(
+            step_id=f"step_{step_num}",
+            action=ActionType.SCROLL,
+            description=f"Scroll by ({data.get('delta_x', 0)}, {data.get('delta_y', 0)})",
+            selector=Selector(type="coordinates", value={"x": data.get("x"), "y": data.get("y")}),
+            parameters={"delta_x": data.get("delta_x", 0), "delta_y": data.get("delta_y", 0)}
+        )
+    elif event_type == EventType.NAVIGATION:
+        return WorkflowStep(
+            step_id=f"step_{step_num}",
+            action=ActionType.NAVIGATE,
+            description=f"Navigate to {data.get('url', '')}",
+            selector=None,
+            parameters={"url": data.get("url", "")}
+        )
+    return None
+
+
+def measure(convert, events, repeats: int = 3) -> tuple[float, int]:
+    """Best-of-repeats events/sec and the number of steps produced"""
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        steps = 0
+        for i, event in enumerate(events):
+            if convert(event, i + 1) is not None:
+                steps += 1
+        best = min(best, time.perf_counter() - start)
+    return len(events) / best, steps
+
+
+def main(n_events: int = 100_000):
+    legacy_rate, legacy_steps = measure(legacy_event_to_step, make_legacy_session(n_events).events)
+    registry_rate, registry_steps = measure(convert_event, make_session(n_events).events)
+
+    print(f"{n_events} events")
+    print(f"  legacy if/elif + validation : {legacy_rate:>12,.0f} events/s ({legacy_steps} steps)")
+    print(f"  registry + typed events     : {registry_rate:>12,.0f} events/s ({registry_steps} steps)")
+    print(f"  speedup                     : {registry_rate / legacy_rate:>12.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
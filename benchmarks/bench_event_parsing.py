@@ -0,0 +1,50 @@
+"""Session JSON parse throughput: the old untyped EventLog.data (Any) versus
+the TypedEventLog tagged union, plus end-to-end parse + conversion.
+
+    python benchmarks/bench_event_parsing.py [n_events]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.converters import convert_event
+from src.models.events import SessionTimeline
+from benchmarks.bench_event_conversion import legacy_event_to_step
+from benchmarks.synthetic import LegacySessionTimeline, make_session_dict
+
+
+def best_of(func, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def parse_and_convert(model, convert, raw: str) -> None:
+    session = model.model_validate_json(raw)
+    for i, event in enumerate(session.events):
+        convert(event, i + 1)
+
+
+def main(n_events: int = 100_000):
+    raw = json.dumps(make_session_dict(n_events))
+    print(f"{n_events} events, {len(raw) / 1e6:.1f} MB JSON")
+
+    rows = [
+        ("parse, untyped data (Any)", lambda: LegacySessionTimeline.model_validate_json(raw)),
+        ("parse, typed tagged union", lambda: SessionTimeline.model_validate_json(raw)),
+        ("parse+convert, untyped", lambda: parse_and_convert(LegacySessionTimeline, legacy_event_to_step, raw)),
+        ("parse+convert, typed", lambda: parse_and_convert(SessionTimeline, convert_event, raw)),
+    ]
+    for label, func in rows:
+        elapsed = best_of(func)
+        print(f"  {label:<28}: {n_events / elapsed:>12,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,75 @@
+"""Prompt template and few-shot retrieval costs.
+
+Reports the size of the static, cached prompt prefix against the per-request
+part, the input tokens billed with and without prompt caching (cache reads
+billed at --cache-read-price of the input rate), and example retrieval
+latency as the index grows. Run from the repository root:
+
+    python benchmarks/bench_few_shot.py --cache-read-price 0.25
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.workflow_generator import WorkflowGenerator
+from src.services.bedrock_client import build_workflow_body
+from src.services.example_index import ExampleIndex
+from src.services.prompt_templates import prompt_text, workflow_template
+from src.services.session_encoder import estimate_tokens
+from benchmarks.synthetic import make_session, make_session_dict
+
+APPLICATIONS = ("Chrome Browser", "Excel", "Outlook", "SAP GUI")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cache-read-price", type=float, default=0.25, help="Cache read price as a share of input")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    generator = WorkflowGenerator(chunk_threshold=None)
+    index = ExampleIndex(k=2)
+    for seed in range(20):
+        session = make_session(30, seed=seed)
+        index.add(session.model_dump(mode="json"), generator.generate_from_events_only(session))
+
+    static = estimate_tokens(workflow_template("compact").system_text)
+    print(f"static prefix: ~{static} tokens (cached after the first request); columns are ~tokens\n")
+    print(f"{'events':>7} {'examples':>9} {'session':>9} {'uncached':>9} {'cached':>9} {'saving':>8}")
+    for n_events in (10, 50, 200):
+        session_data = make_session_dict(n_events, seed=1000 + n_events)
+        examples = index.retrieve(session_data)
+        total = estimate_tokens(prompt_text(build_workflow_body(session_data, [], "compact", examples)))
+        example_tokens = sum(estimate_tokens(text) for text in examples)
+        billed = total - static + static * args.cache_read_price
+        print(
+            f"{n_events:>7} {example_tokens:>9} {total - static - example_tokens:>9} {total:>9} "
+            f"{billed:>9.0f} {1 - billed / total:>7.0%}"
+        )
+
+    print(f"\n{'indexed':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    rng = random.Random(3)
+    for size in (100, 1000, 5000):
+        index = ExampleIndex(k=2, max_examples=size)
+        workflow = generator.generate_from_events_only(make_session(10))
+        for seed in range(size):
+            session_data = make_session_dict(rng.randint(5, 60), seed=seed)
+            session_data["application"] = APPLICATIONS[seed % len(APPLICATIONS)]
+            index.add(session_data, workflow)
+        latencies = []
+        for seed in range(args.queries):
+            query = make_session_dict(rng.randint(5, 60), seed=size + seed)
+            start = time.perf_counter()
+            index.retrieve(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        print(f"{size:>8} {statistics.median(latencies):>8.2f} {latencies[int(len(latencies) * 0.99)]:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Prompt tokens sent to the model: full AI generation versus hybrid mode.
+
+Hybrid mode sends several small requests in parallel, so its latency follows
+the largest one rather than the total. Run from the repository root:
+
+    python benchmarks/bench_hybrid_prompts.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.hybrid import HybridEnricher
+from src.core.workflow_generator import WorkflowGenerator
+from src.services.bedrock_client import build_enrichment_body, build_workflow_body
+from src.services.prompt_templates import prompt_text
+from src.services.session_encoder import estimate_tokens
+from benchmarks.synthetic import make_session
+
+
+def prompt_tokens(body: dict) -> int:
+    return estimate_tokens(prompt_text(body))
+
+
+def main():
+    generator = WorkflowGenerator(chunk_threshold=None)
+    enricher = HybridEnricher()
+
+    print(f"{'events':>7} {'full':>9} {'hybrid':>9} {'requests':>9} {'largest':>9} {'saving':>8}")
+    for n_events in (50, 200, 1000):
+        session = make_session(n_events)
+        full = prompt_tokens(build_workflow_body(session.model_dump(mode="json"), [], "compact"))
+
+        workflow = generator.generate_from_events_only(session)
+        tasks = enricher.plan(workflow, session.events)
+        sizes = [prompt_tokens(build_enrichment_body(task.kind, task.payload)) for task in tasks]
+
+        print(
+            f"{n_events:>7} {full:>9} {sum(sizes):>9} {len(sizes):>9} {max(sizes, default=0):>9} "
+            f"{full / max(1, sum(sizes)):>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Load test against a local Bedrock stand-in: no AWS account needed.
+
+Drives WorkflowGenerator (threads and asyncio) and the API's /generate and
+/generate/deterministic routes in-process with synthetic sessions of several
+sizes, while src.services.fake_bedrock answers model calls with configurable
+latency and errors. Reports p50/p99 latency, throughput and peak memory
+allocated per request. Run from the repository root:
+
+    python benchmarks/bench_load.py --requests 200 --concurrency 32 --latency-ms 400
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+from src.core.workflow_generator import WorkflowGenerator
+from src.services.async_bedrock_client import AsyncBedrockClient
+from src.services.bedrock_client import BedrockClient
+from src.services.client_factory import ClientPoolConfig
+from src.services.fake_bedrock import FakeBedrockConfig, FakeBedrockServer
+from benchmarks.synthetic import make_session
+
+
+def percentile(values: list[float], q: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def distinct(session, i: int):
+    # A fresh session_id per request so the response cache and single-flight do not collapse the load
+    return session.model_copy(update={"session_id": f"{session.session_id}-{i}"})
+
+
+def run_threads(call, n_requests: int, concurrency: int) -> tuple[list[float], int, float]:
+    def timed_call(i: int):
+        started = time.perf_counter()
+        try:
+            call(i)
+            return time.perf_counter() - started, False
+        except Exception:
+            return time.perf_counter() - started, True
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(timed_call, range(n_requests)))
+    elapsed = time.perf_counter() - started
+    return [latency for latency, _ in results], sum(failed for _, failed in results), elapsed
+
+
+async def run_tasks(call, n_requests: int, concurrency: int) -> tuple[list[float], int, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed_call(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await call(i)
+                return time.perf_counter() - started, False
+            except Exception:
+                return time.perf_counter() - started, True
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(timed_call(i) for i in range(n_requests)))
+    elapsed = time.perf_counter() - started
+    return [latency for latency, _ in results], sum(failed for _, failed in results), elapsed
+
+
+def peak_kib(call) -> float:
+    """Peak memory allocated while serving one request, measured apart from the timed runs"""
+
+    tracemalloc.start()
+    try:
+        call(-1)
+    except Exception:
+        pass  # an injected error still shows what the request allocated
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak / 1024
+
+
+async def peak_kib_async(call) -> float:
+    tracemalloc.start()
+    try:
+        await call(-1)
+    except Exception:
+        pass
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def report(name: str, n_events: int, latencies: list[float], errors: int, elapsed: float, memory: float) -> None:
+    print(
+        f"{name:<26} {n_events:>6} {len(latencies):>6} {errors:>6} "
+        f"{percentile(latencies, 50) * 1000:>9.1f} {percentile(latencies, 99) * 1000:>9.1f} "
+        f"{len(latencies) / elapsed:>8.1f} {memory:>10.0f}"
+    )
+
+
+async def run_scenarios(app, generator: WorkflowGenerator, args) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for n_events in args.sizes:
+            session = make_session(n_events)
+            payload = session.model_dump(mode="json")
+
+            def sync_call(i: int):
+                generator.generate_from_session(distinct(session, i))
+
+            async def async_call(i: int):
+                await generator.generate_from_session_async(distinct(session, i))
+
+            async def api_generate(i: int):
+                body = {"session": {**payload, "session_id": f"{payload['session_id']}-{i}"}, "use_ai": True}
+                response = await client.post("/generate", json=body)
+                response.raise_for_status()
+
+            async def api_deterministic(i: int):
+                response = await client.post("/generate/deterministic", json=payload)
+                response.raise_for_status()
+
+            memory = await asyncio.to_thread(peak_kib, sync_call)
+            timings = await asyncio.to_thread(run_threads, sync_call, args.requests, args.concurrency)
+            report("generator sync threads", n_events, *timings, memory)
+
+            for name, call in (
+                ("generator asyncio", async_call),
+                ("api /generate", api_generate),
+                ("api /generate/deterministic", api_deterministic),
+            ):
+                memory = await peak_kib_async(call)
+                report(name, n_events, *await run_tasks(call, args.requests, args.concurrency), memory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario and size")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000], help="Events per session")
+    parser.add_argument("--latency", default="lognormal", choices=["fixed", "uniform", "lognormal"])
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Model latency (median for lognormal)")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="Also delay by output length")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeBedrockServer(FakeBedrockConfig(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate
+    )).start()
+
+    # The API module builds its clients at import time, so configure it first
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "fake")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "fake")
+    os.environ["BEDROCK_ENDPOINT_URL"] = server.endpoint_url
+    os.environ["CIRCUIT_FAILURE_THRESHOLD"] = str(10 ** 9)
+    os.environ.setdefault("AWS_MAX_POOL_CONNECTIONS", str(args.concurrency))
+    from src.api.main import app
+
+    bedrock = BedrockClient(
+        endpoint_url=server.endpoint_url,
+        pool_config=ClientPoolConfig(max_pool_connections=args.concurrency)
+    )
+    generator = WorkflowGenerator(
+        bedrock,
+        AsyncBedrockClient(endpoint_url=server.endpoint_url, max_concurrency=args.concurrency)
+    )
+
+    print(
+        f"fake Bedrock: {args.latency} {args.latency_ms:.0f} ms, error rate {args.error_rate:.0%}; "
+        f"{args.requests} requests per row at concurrency {args.concurrency}\n"
+    )
+    print(f"{'scenario':<26} {'events':>6} {'reqs':>6} {'errors':>6} {'p50 ms':>9} {'p99 ms':>9} {'rps':>8} {'peak KiB':>10}")
+    # Async clients bind to the event loop they first run on, so every scenario shares one loop
+    asyncio.run(run_scenarios(app, generator, args))
+
+    server.stop()
+    print(f"\nfake Bedrock served {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
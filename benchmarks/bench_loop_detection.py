@@ -0,0 +1,68 @@
+"""Loop folding time and output size on 100k-step workflows.
+
+    python benchmarks/bench_loop_detection.py [n_steps]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.converters import coordinates, make_step
+from src.core.loops import LoopFolder, expand_loops
+from src.models.workflow import ActionType, WorkflowDefinition
+
+
+def data_entry_steps(n_steps: int, seed: int = 3) -> list:
+    """Rows of click-cell / type / Enter, with an occasional stray scroll"""
+
+    rng = random.Random(seed)
+    steps = []
+    row = 0
+    while len(steps) < n_steps:
+        if rng.random() < 0.01:
+            steps.append(make_step(len(steps) + 1, ActionType.SCROLL, "Scroll by (0, 3)", parameters={"delta_x": 0, "delta_y": 3}))
+        y = 200 + (row % 40) * 18
+        steps.append(make_step(len(steps) + 1, ActionType.CLICK, f"Click at (310, {y})", selector=coordinates(310, y), parameters={"button": "left"}))
+        steps.append(make_step(len(steps) + 1, ActionType.TYPE_TEXT, f"Type: item-{row}...", parameters={"text": f"item-{row}"}))
+        steps.append(make_step(len(steps) + 1, ActionType.PRESS_KEY, "Press key: Enter", parameters={"key": "Enter", "modifiers": []}))
+        row += 1
+    return steps[:n_steps]
+
+
+def random_steps(n_steps: int, seed: int = 3) -> list:
+    """No structure: the scan's worst case, every period tried and rejected"""
+
+    rng = random.Random(seed)
+    keys = ["Enter", "Tab", "Escape", "a", "b", "c", "Delete", "Home"]
+    return [
+        make_step(i + 1, ActionType.PRESS_KEY, "Press key", parameters={"key": rng.choice(keys), "modifiers": []})
+        for i in range(n_steps)
+    ]
+
+
+def workflow_bytes(steps: list, variables: dict) -> int:
+    workflow = WorkflowDefinition(
+        workflow_id="bench", name="bench", description="bench", application="bench",
+        steps=steps, variables=variables
+    )
+    return len(workflow.model_dump_json())
+
+
+def main(n_steps: int = 100_000):
+    print(f"{'input':<12} {'steps in':>9} {'steps out':>9} {'loops':>6} {'fold s':>7} {'size ratio':>10}")
+    for label, steps in (("data entry", data_entry_steps(n_steps)), ("random", random_steps(n_steps))):
+        variables = {}
+        folder = LoopFolder()
+        start = time.perf_counter()
+        folded = folder.fold(steps, variables)
+        elapsed = time.perf_counter() - start
+
+        assert len(expand_loops(folded, variables)) == len(steps)
+        ratio = workflow_bytes(folded, variables) / workflow_bytes(steps, {})
+        print(f"{label:<12} {len(steps):>9} {len(folded):>9} {folder.loops:>6} {elapsed:>7.2f} {ratio:>10.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
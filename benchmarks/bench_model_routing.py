@@ -0,0 +1,63 @@
+"""Estimated spend and latency of routed generation versus sending everything to Nova Pro.
+
+Sessions are drawn from a long-tailed size mix (most recordings are short).
+Latencies are each tier's expected_latency_seconds and spend is estimated from
+prompt tokens and the expected output, so this shows what routing buys before
+any escalation. The tier table is the one the API uses; pass --escalation to
+assume a share of small-model outputs fail validation. Run from the repository root:
+
+    python benchmarks/bench_model_routing.py --sessions 500 --escalation 0.1
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.routing import ModelRouter
+from benchmarks.synthetic import make_session_dict
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--escalation", type=float, default=0.0, help="Share of non-final attempts that fail validation")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    router = ModelRouter()
+    largest = router.tiers[-1]
+
+    routed_latency, routed_cost, pro_latency, pro_cost = [], [], [], []
+    served = {tier.model_id: 0 for tier in router.tiers}
+    for i in range(args.sessions):
+        # Long tail: median around 20 events, a few sessions in the hundreds
+        n_events = max(3, min(600, int(rng.lognormvariate(3.0, 1.0))))
+        session = make_session_dict(n_events, seed=i)
+        prompt_tokens = router.prompt_tokens(session)
+
+        latency = cost = 0.0
+        tiers = router.plan(session, [], prompt_tokens=prompt_tokens)
+        for index, tier in enumerate(tiers):
+            latency += tier.expected_latency_seconds
+            cost += router.estimate_cost(tier, prompt_tokens, n_events)
+            if index == len(tiers) - 1 or rng.random() >= args.escalation:
+                served[tier.model_id] += 1
+                break
+        routed_latency.append(latency)
+        routed_cost.append(cost)
+        pro_latency.append(largest.expected_latency_seconds)
+        pro_cost.append(router.estimate_cost(largest, prompt_tokens, n_events))
+
+    print(f"{args.sessions} sessions, {args.escalation:.0%} of small-model outputs escalated\n")
+    print(f"{'':<10} {'p50 s':>8} {'mean s':>8} {'spend $':>10}")
+    for name, latencies, costs in (("all Pro", pro_latency, pro_cost), ("routed", routed_latency, routed_cost)):
+        print(f"{name:<10} {statistics.median(latencies):>8.1f} {statistics.mean(latencies):>8.1f} {sum(costs):>10.4f}")
+    print("\nserved by: " + ", ".join(f"{model} {count}" for model, count in served.items()))
+
+
+if __name__ == "__main__":
+    main()
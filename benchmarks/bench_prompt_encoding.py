@@ -0,0 +1,56 @@
+"""Prompt size and encode latency per session encoding mode.
+
+Uses the login fixture from tests/test_workflow_generation.py, alone and
+repeated to larger sessions. Run from the repository root:
+
+    python benchmarks/bench_prompt_encoding.py
+"""
+import os
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from src.services.bedrock_client import build_workflow_body
+from src.services.prompt_templates import prompt_text as body_text
+from src.services.session_encoder import ENCODING_MODES, estimate_tokens
+from test_workflow_generation import create_mock_session
+
+
+def scaled_session(repeats: int):
+    session = create_mock_session()
+    template = list(session.events)
+    span = template[-1].timestamp - session.start_time
+    events = []
+    for i in range(repeats):
+        offset = (span + timedelta(seconds=1)) * i
+        events.extend(event.model_copy(update={"timestamp": event.timestamp + offset}) for event in template)
+    return session.model_copy(update={"events": events})
+
+
+def prompt_text(session_data: dict, mode: str) -> str:
+    return body_text(build_workflow_body(session_data, [], mode))
+
+
+def main(iterations: int = 20):
+    print(f"{'events':>7} {'mode':>9} {'chars':>9} {'~tokens':>9} {'vs pretty':>10} {'encode ms':>10}")
+    for repeats in (1, 10, 100):
+        session_data = scaled_session(repeats).model_dump(mode="json")
+        baseline = estimate_tokens(prompt_text(session_data, "pretty"))
+        for mode in ENCODING_MODES:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                text = prompt_text(session_data, mode)
+            elapsed_ms = (time.perf_counter() - start) * 1000 / iterations
+            tokens = estimate_tokens(text)
+            print(
+                f"{len(session_data['events']):>7} {mode:>9} {len(text):>9} {tokens:>9} "
+                f"{tokens / baseline:>9.0%} {elapsed_ms:>10.2f}"
+            )
+    print("\nModel latency scales with input tokens; measure it against a live or fake runtime.")
+
+
+if __name__ == "__main__":
+    main()
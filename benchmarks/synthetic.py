@@ -0,0 +1,87 @@
+"""Synthetic session recordings for benchmarks."""
+import random
+from datetime import datetime, timedelta
+from typing import Any, List, Optional
+
+from pydantic import BaseModel, Field
+
+from src.models.events import SessionTimeline, EventLog, EventType
+
+
+def make_event_dicts(n_events: int, seed: int = 7) -> list[dict]:
+    """Plausible mix of UI events as plain dicts (what a recorder would POST)"""
+
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 9, 0, 0)
+    events = []
+    t = start
+    for i in range(n_events):
+        t += timedelta(milliseconds=rng.randint(50, 2000))
+        roll = rng.random()
+        if roll < 0.35:
+            event_type, data = EventType.MOUSE_CLICK, {
+                "x": rng.randint(0, 1920), "y": rng.randint(0, 1080), "button": "left",
+                "element_text": rng.choice(["Save", "Next", "Submit", None]), "element_type": "button"
+            }
+        elif roll < 0.6:
+            event_type, data = EventType.TEXT_INPUT, {"text": rng.choice(["a", "hello", "42"]), "target_element": "field"}
+        elif roll < 0.75:
+            event_type, data = EventType.SCROLL, {"x": 900, "y": 500, "delta_x": 0, "delta_y": rng.choice([-3, 3])}
+        elif roll < 0.85:
+            event_type, data = EventType.KEY_PRESS, {"key": rng.choice(["Enter", "Tab"]), "modifiers": []}
+        elif roll < 0.9:
+            event_type, data = EventType.NAVIGATION, {"url": f"https://app.example.com/p/{i}", "title": "Page"}
+        elif roll < 0.95:
+            event_type, data = EventType.SCREENSHOT, {"s3_key": f"shots/{i}.png", "width": 1920, "height": 1080}
+        else:
+            event_type, data = EventType.MOUSE_DOUBLE_CLICK, {"x": rng.randint(0, 1920), "y": rng.randint(0, 1080)}
+        events.append({
+            "timestamp": t.isoformat(),
+            "event_type": event_type.value,
+            "data": data,
+            "screenshot_ref": f"shots/{i}.png" if event_type == EventType.MOUSE_CLICK else None
+        })
+    return events
+
+
+def make_session_dict(n_events: int, seed: int = 7) -> dict:
+    return {
+        "session_id": f"synthetic-{n_events}",
+        "user_id": "bench",
+        "start_time": datetime(2024, 1, 1, 9, 0, 0).isoformat(),
+        "application": "Chrome Browser",
+        "events": make_event_dicts(n_events, seed),
+        "metadata": {"recording_tool": "synthetic"}
+    }
+
+
+def make_session(n_events: int, seed: int = 7) -> SessionTimeline:
+    return SessionTimeline.model_validate(make_session_dict(n_events, seed))
+
+
+class LegacyEventLog(BaseModel):
+    """EventLog as it was before typed payloads: data is an untyped dict"""
+    timestamp: datetime
+    event_type: EventType
+    data: Any
+    screenshot_ref: Optional[str] = None
+
+    class Config:
+        use_enum_values = True
+
+
+class LegacySessionTimeline(BaseModel):
+    session_id: str
+    user_id: Optional[str] = None
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    application: str
+    events: List[LegacyEventLog] = Field(default_factory=list)
+    metadata: dict = Field(default_factory=dict)
+
+    class Config:
+        use_enum_values = True
+
+
+def make_legacy_session(n_events: int, seed: int = 7) -> LegacySessionTimeline:
+    return LegacySessionTimeline.model_validate(make_session_dict(n_events, seed))
@@ -1,17 +1,73 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional, List
 
 from src.models.events import SessionTimeline
-from src.models.workflow import WorkflowDefinition
-from src.core.workflow_generator import WorkflowGenerator
+from src.models.workflow import WorkflowDefinition, WorkflowStep, GenerationResult
+from src.core.workflow_generator import build_workflow_generator
+from src.core.ingestion import IngestionError
+from src.services.client_factory import pool_stats, warm_up
+from src.services.health import build_prober
+from src.services.metrics import HTTP_REQUEST_SECONDS, REGISTRY, STAGE_SECONDS, timed
+from src.core.jobs import JobWorker, WorkerPool, build_job_queue, check_webhook_url
+from src.core.routing import RoutingBudget
+
+
+# Initialize generator; job worker processes build theirs the same way
+generator = build_workflow_generator()
+bedrock = generator.bedrock
+circuit_breaker = generator.circuit_breaker
+prober = build_prober(bedrock, circuit_breaker)
+# Long generations run as jobs: POST /jobs, then poll GET /jobs/{id} or wait for the webhook
+job_queue = build_job_queue()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open Bedrock connections in the background so startup is not held up by the network
+    warmup = asyncio.create_task(asyncio.to_thread(
+        warm_up, bedrock.client, int(os.getenv("BEDROCK_WARMUP_CONNECTIONS", "2"))
+    ))
+    # Health endpoints answer from the prober's cached result instead of calling Bedrock
+    probing = asyncio.create_task(prober.run(float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "15"))))
+    # JOB_WORKER_PROCESSES > 0 runs jobs in worker processes; otherwise one thread here works the queue
+    worker_pool = WorkerPool(int(os.getenv("JOB_WORKER_PROCESSES", "0")))
+    stop_jobs = threading.Event()
+    job_thread = None
+    if worker_pool.processes > 0:
+        worker_pool.start()
+    else:
+        job_thread = threading.Thread(target=JobWorker(job_queue, generator).run, args=(stop_jobs,), daemon=True)
+        job_thread.start()
+    yield
+    stop_jobs.set()
+    if job_thread is not None:
+        await asyncio.to_thread(job_thread.join)
+    await asyncio.to_thread(worker_pool.stop)
+    probing.cancel()
+    with suppress(asyncio.CancelledError):
+        await probing
+    await warmup
+    await generator.async_bedrock.aclose()
+    generator.close()
 
 
 app = FastAPI(
     title="Bedrock Workflow Generator",
     description="AI-powered workflow generation from user session recordings",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -22,13 +78,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize generator
-generator = WorkflowGenerator()
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    request.state.started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - request.state.started,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status
+        )
 
 
 class GenerateRequest(BaseModel):
     session: SessionTimeline
     use_ai: bool = True
+    hybrid: bool = False  # with use_ai: rule-based skeleton, model only for ambiguous steps
+    budget: Optional[RoutingBudget] = None  # latency/cost bounds for the routed model
 
 
 class GenerateResponse(BaseModel):
@@ -37,8 +109,45 @@ class GenerateResponse(BaseModel):
     error: Optional[str] = None
 
 
+class BatchGenerateRequest(BaseModel):
+    sessions: List[SessionTimeline]
+    use_ai: bool = True
+    max_concurrency: Optional[int] = Field(None, ge=1, le=256)  # parallel generations; the generator's batch_concurrency if unset
+
+
+class JobRequest(BaseModel):
+    session: SessionTimeline
+    use_ai: bool = True
+    hybrid: bool = False
+    budget: Optional[RoutingBudget] = None
+    priority: int = 0  # higher runs first
+    webhook_url: Optional[str] = None  # POSTed the job status when it ends; public hosts or WEBHOOK_ALLOWED_HOSTS only
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    priority: int = 0
+    attempts: int = 0
+    result: Optional[WorkflowDefinition] = None
+    error: Optional[str] = None
+    created_at: Optional[float] = None
+    updated_at: Optional[float] = None
+
+
+class ExampleRequest(BaseModel):
+    session: SessionTimeline
+    workflow: WorkflowDefinition  # as accepted for the session, after any edits
+
+
+class BatchGenerateResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[GenerationResult]
+
+
 @app.get("/")
-def root():
+async def root():
     return {
         "service": "Bedrock Workflow Generator",
         "status": "running",
@@ -47,25 +156,99 @@ def root():
 
 
 @app.get("/health")
-def health_check():
-    # Test Bedrock connection
-    connected = generator.bedrock.test_connection()
+async def health_check():
+    # Cached connectivity from the background prober; no model call per request
+    probe = await run_in_threadpool(prober.status)
+    circuit = circuit_breaker.state
+    return {
+        "status": "healthy" if probe["connected"] and circuit == "closed" else "degraded",
+        "bedrock_connected": probe["connected"],
+        "model": generator.bedrock.model_id,
+        "circuit": circuit,
+        "probe": probe
+    }
+
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness: the process is serving requests. Never touches Bedrock."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness: the app can serve traffic. With Bedrock down it still can
+    (deterministically), so Bedrock only gates readiness when
+    HEALTH_READY_REQUIRES_BEDROCK is set; otherwise pods would flap with it."""
+    
+    probe = await run_in_threadpool(prober.status)
+    ready = probe["connected"] or os.getenv("HEALTH_READY_REQUIRES_BEDROCK", "false").lower() not in ("1", "true", "yes")
+    return JSONResponse(
+        {
+            "status": "ready" if ready else "not_ready",
+            "bedrock_connected": probe["connected"],
+            "circuit": circuit_breaker.stats()
+        },
+        status_code=200 if ready else 503
+    )
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    cache = generator.bedrock.cache
+    index = generator.bedrock.screenshot_index
     return {
-        "status": "healthy" if connected else "degraded",
-        "bedrock_connected": connected,
-        "model": generator.bedrock.model_id
+        "response_cache": cache.stats() if cache is not None else None,
+        "screenshot_index": index.stats() if index is not None else None,
+        "single_flight": generator.single_flight.stats()
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: per-stage latency, tokens, cache lookups and errors"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/pool/stats")
+async def connection_pool_stats():
+    """Connection reuse and pool saturation of the shared AWS clients"""
+    return pool_stats()
+
+
+@app.get("/router/stats")
+async def router_stats():
+    """Per-model attempts, validation failures, escalations, latency and estimated spend"""
+    if generator.router is None:
+        return {"enabled": False}
+    return {"enabled": True, "models": generator.router.stats()}
+
+
+@app.get("/rate-limit/stats")
+async def rate_limit_stats():
+    """Quota pacing: current rate factor after throttling, throttles seen and waiting requests per tenant"""
+    if bedrock.rate_limiter is None:
+        return {"enabled": False}
+    return {"enabled": True, **await run_in_threadpool(bedrock.rate_limiter.stats)}
+
+
 @app.post("/generate", response_model=GenerateResponse)
-def generate_workflow(request: GenerateRequest):
+async def generate_workflow(request: GenerateRequest, http_request: Request):
     """Generate a workflow definition from a recorded session"""
     
+    # Reading and validating the body happens before the handler runs
+    STAGE_SECONDS.observe(time.perf_counter() - http_request.state.started, stage="request_parse")
+    
     try:
-        if request.use_ai:
-            workflow = generator.generate_from_session(request.session)
+        if request.use_ai and request.hybrid:
+            with timed("generate.hybrid"):
+                workflow = await generator.generate_hybrid_async(request.session)
+        elif request.use_ai:
+            with timed("generate.ai"):
+                workflow = await generator.generate_from_session_async(request.session, request.budget)
         else:
-            workflow = generator.generate_from_events_only(request.session)
+            with timed("generate.deterministic"):
+                workflow = await generator.generate_from_events_only_async(request.session)
         
         return GenerateResponse(
             success=True,
@@ -79,17 +262,129 @@ def generate_workflow(request: GenerateRequest):
         )
 
 
+@app.post("/generate/stream")
+def generate_stream(session: SessionTimeline):
+    """Stream workflow steps as NDJSON while the model is still generating.
+    
+    Emits {"type": "step", ...} lines, then a final {"type": "workflow", ...}
+    line, or {"type": "error", ...} if generation fails part-way.
+    """
+    
+    def events():
+        try:
+            for item in generator.stream_from_session(session):
+                if isinstance(item, WorkflowStep):
+                    yield json.dumps({"type": "step", "step": item.model_dump(mode="json")}) + "\n"
+                else:
+                    yield json.dumps({"type": "workflow", "workflow": item.model_dump(mode="json")}) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "error": f"Workflow generation failed: {str(e)}"}) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/generate/batch", response_model=BatchGenerateResponse)
+async def generate_batch(request: BatchGenerateRequest):
+    """Generate workflows for many sessions with bounded parallelism"""
+    
+    results = await generator.generate_many_async(
+        request.sessions,
+        use_ai=request.use_ai,
+        max_concurrency=request.max_concurrency
+    )
+    succeeded = sum(1 for result in results if result.success)
+    
+    return BatchGenerateResponse(
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    )
+
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(request: JobRequest):
+    """Queue a generation and return at once; the job survives restarts"""
+    
+    if request.webhook_url is not None:
+        try:
+            await run_in_threadpool(check_webhook_url, request.webhook_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    job_id = await run_in_threadpool(
+        job_queue.submit,
+        {
+            "session": request.session.model_dump(mode="json"),
+            "use_ai": request.use_ai,
+            "hybrid": request.hybrid,
+            "budget": request.budget.model_dump() if request.budget is not None else None
+        },
+        request.priority,
+        request.webhook_url
+    )
+    return JobResponse(job_id=job_id, status="queued", priority=request.priority)
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Status of a job, with the workflow once it has completed"""
+    
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JobResponse(**job)
+
+
+@app.post("/examples", status_code=201)
+async def add_example(request: ExampleRequest):
+    """Record an accepted workflow; prompts for similar sessions use it as a few-shot example"""
+    
+    index = bedrock.example_index
+    if index is None:
+        raise HTTPException(status_code=409, detail="Few-shot examples are disabled (FEW_SHOT_EXAMPLES=0)")
+    example_id = await run_in_threadpool(index.add, request.session.model_dump(mode="json"), request.workflow)
+    return {"example_id": example_id, "examples": len(index)}
+
+
+@app.get("/examples/stats")
+async def example_stats():
+    """Stored examples and how often a prompt found similar ones"""
+    if bedrock.example_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **bedrock.example_index.stats()}
+
+
 @app.post("/generate/deterministic", response_model=GenerateResponse)
-def generate_deterministic(session: SessionTimeline):
+async def generate_deterministic(session: SessionTimeline):
     """Generate workflow without AI (faster, deterministic)"""
     
     try:
-        workflow = generator.generate_from_events_only(session)
+        workflow = await generator.generate_from_events_only_async(session)
         return GenerateResponse(success=True, workflow=workflow)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/generate/deterministic/ndjson", response_model=GenerateResponse)
+async def generate_deterministic_ndjson(request: Request):
+    """Generate workflow without AI from an NDJSON stream: a session header line,
+    then one EventLog per line. The body is never held in memory as a whole."""
+    
+    # Spool to disk past 8 MB; events are then parsed line by line in a worker thread
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        
+        try:
+            workflow = await run_in_threadpool(generator.generate_from_ndjson, spool)
+        except IngestionError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    return GenerateResponse(success=True, workflow=workflow)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,96 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from src.models.events import SessionTimeline, EventLog, EventType
+from src.models.workflow import WorkflowDefinition
+
+
+# Events that start a new screen or context and make good window boundaries
+BOUNDARY_EVENTS = {EventType.NAVIGATION.value, EventType.WINDOW_SWITCH.value}
+
+
+def split_session(
+    session: SessionTimeline,
+    max_events: int = 200,
+    min_events: Optional[int] = None,
+    idle_gap_seconds: float = 30.0
+) -> list[SessionTimeline]:
+    """Split a session into windows of at most max_events events.
+
+    A window is closed early at a natural boundary - before a NAVIGATION or
+    WINDOW_SWITCH event, or before an idle gap longer than idle_gap_seconds -
+    once it holds at least min_events events (default: a quarter of max_events).
+    """
+
+    if min_events is None:
+        min_events = max(1, max_events // 4)
+
+    windows: list[list[EventLog]] = []
+    current: list[EventLog] = []
+    previous: Optional[EventLog] = None
+
+    for event in session.events:
+        if current:
+            at_boundary = (
+                event.event_type in BOUNDARY_EVENTS
+                or (event.timestamp - previous.timestamp).total_seconds() > idle_gap_seconds
+            )
+            if len(current) >= max_events or (at_boundary and len(current) >= min_events):
+                windows.append(current)
+                current = []
+        current.append(event)
+        previous = event
+
+    if current:
+        windows.append(current)
+
+    return [
+        session.model_copy(update={
+            "session_id": f"{session.session_id}#part{index + 1}",
+            "start_time": window[0].timestamp,
+            "end_time": window[-1].timestamp,
+            "events": window,
+            "metadata": {
+                **session.metadata,
+                "chunk_index": index + 1,
+                "chunk_count": len(windows)
+            }
+        })
+        for index, window in enumerate(windows)
+    ]
+
+
+def merge_workflows(parts: list[WorkflowDefinition], session: SessionTimeline) -> WorkflowDefinition:
+    """Concatenate partial workflows in order, renumbering steps step_1..step_N"""
+
+    steps = []
+    variables = {}
+    preconditions = []
+
+    for part in parts:
+        for step in part.steps:
+            steps.append(step.model_copy(update={"step_id": f"step_{len(steps) + 1}"}))
+        for name, value in part.variables.items():
+            variables.setdefault(name, value)
+        for condition in part.preconditions:
+            if condition not in preconditions:
+                preconditions.append(condition)
+
+    first = parts[0] if parts else None
+
+    return WorkflowDefinition(
+        workflow_id=str(uuid.uuid4()),
+        name=first.name if first else f"Workflow from {session.session_id}",
+        description=first.description if first else "Auto-generated workflow from session recording",
+        application=session.application,
+        steps=steps,
+        variables=variables,
+        preconditions=preconditions,
+        metadata={
+            "source_session": session.session_id,
+            "generated_at": datetime.utcnow().isoformat(),
+            "event_count": len(session.events),
+            "chunk_count": len(parts)
+        }
+    )
@@ -0,0 +1,440 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, Optional, Union
+
+from src.models.events import (
+    EventLog, EventType, SessionHeader, SessionTimeline, PAYLOAD_MODELS,
+    ClickEventLog, DragEventLog, KeyPressEventLog, TextInputEventLog, ScrollEventLog,
+    NavigationEventLog, WindowSwitchEventLog, ScreenshotEventLog, FileOperationEventLog,
+)
+
+
+MAGIC = b"WFCS"
+FORMAT_VERSION = 2
+
+# magic, version, reserved, event count, header bytes, strings, string bytes
+_PRELUDE = struct.Struct("<4sHHIIII")
+
+# Columns in file order: (name, array typecode). Each holds one value per event.
+# Payload fields map onto the shared columns per event type:
+#   clicks          x, y; button; s1 element_text, s2 element_type
+#   MOUSE_DRAG      x, y start; dx, dy end; button
+#   SCROLL          x, y; dx, dy deltas
+#   SCREENSHOT      x, y width and height; s1 s3_key, s2 ocr_text
+#   key presses     s1 key, s2 modifiers joined by MODIFIER_SEPARATOR
+#   TEXT_INPUT      s1 text, s2 target_element
+#   NAVIGATION      s1 url, s2 title
+#   WINDOW_SWITCH   s1 window_title, s2 application
+#   FILE_OPERATION  s1 operation, s2 path, s3 destination
+# A payload that does not fit (an int beyond 32 bits, say) is stored whole as
+# JSON in the extra column instead. Bit i of unset marks the payload's i-th
+# field (model_fields order) as not set; UNSET_SCREENSHOT_REF marks the event's.
+COLUMNS = (
+    ("timestamp", "q"),  # wall-clock microseconds since 1970-01-01
+    ("utc_offset", "i"),  # seconds east of UTC, NAIVE for naive timestamps
+    ("event_type", "B"),
+    ("button", "B"),
+    ("x", "i"),
+    ("y", "i"),
+    ("dx", "i"),
+    ("dy", "i"),
+    ("screenshot_ref", "I"),  # string table index, 0 for None
+    ("s1", "I"),
+    ("s2", "I"),
+    ("s3", "I"),
+    ("extra", "I"),
+    ("unset", "B"),  # fields the recording left out, so they keep their defaults
+)
+
+NAIVE = -2 ** 31
+MODIFIER_SEPARATOR = "\x1f"
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_INT32 = (-2 ** 31, 2 ** 31)
+# event_type column codes index this list
+EVENT_TYPES = [event_type.value for event_type in EventType]
+_EVENT_CODES = {value: code for code, value in enumerate(EVENT_TYPES)}
+_BUTTONS = ["left", "right", "middle"]
+_BUTTON_CODES = {value: code for code, value in enumerate(_BUTTONS)}
+
+# Events decoded per column slice when streaming: few enough that a consumer
+# holds little at once. to_session decodes everything in one slice.
+STREAM_BATCH = 256
+
+# Fixed-offset zones by offset in seconds, shared by all readers
+_ZONES: dict[int, timezone] = {}
+
+UNSET_SCREENSHOT_REF = 0x80
+# Payload field names by event type, in unset bit order
+_PAYLOAD_FIELDS = {event_type: tuple(model.model_fields) for event_type, model in PAYLOAD_MODELS.items()}
+if any(len(names) >= 8 for names in _PAYLOAD_FIELDS.values()):
+    # Bit 7 of the unset byte is the screenshot reference flag
+    raise ValueError("a payload model has more fields than the unset bits can mark")
+# (event type, unset bits) -> payload fields to leave out
+_UNSET_NAMES: dict[tuple[str, int], tuple[str, ...]] = {}
+
+_CLICKS = {EventType.MOUSE_CLICK.value, EventType.MOUSE_DOUBLE_CLICK.value, EventType.MOUSE_RIGHT_CLICK.value}
+_KEYS = {EventType.KEY_PRESS.value, EventType.KEY_COMBINATION.value}
+
+# Model the session's events list holds for each event type
+EVENT_LOG_MODELS = {
+    EventType.SCREENSHOT.value: ScreenshotEventLog,
+    EventType.MOUSE_DRAG.value: DragEventLog,
+    EventType.KEY_PRESS.value: KeyPressEventLog,
+    EventType.KEY_COMBINATION.value: KeyPressEventLog,
+    EventType.TEXT_INPUT.value: TextInputEventLog,
+    EventType.SCROLL.value: ScrollEventLog,
+    EventType.NAVIGATION.value: NavigationEventLog,
+    EventType.WINDOW_SWITCH.value: WindowSwitchEventLog,
+    EventType.FILE_OPERATION.value: FileOperationEventLog,
+    **{value: ClickEventLog for value in _CLICKS},
+}
+
+
+class ColumnarFormatError(ValueError):
+    """A buffer is not a columnar session this version can read"""
+
+
+class _StringTable:
+    def __init__(self):
+        self.index = {}
+        self.blob = bytearray()
+        self.offsets = array("I", [0])
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        code = self.index.get(value)
+        if code is None:
+            self.blob += value.encode("utf-8")
+            self.offsets.append(len(self.blob))
+            code = self.index[value] = len(self.offsets) - 1
+        return code
+
+
+def encode_columnar(header: SessionHeader, events: Iterable[EventLog]) -> bytes:
+    """Serialize a session (header and events) to the columnar format"""
+
+    columns = {name: array(typecode) for name, typecode in COLUMNS}
+    strings = _StringTable()
+    for event in events:
+        _encode_event(event, columns, strings)
+
+    header_json = header.model_dump_json(exclude_unset=True).encode("utf-8")
+    parts = [
+        _PRELUDE.pack(
+            MAGIC, FORMAT_VERSION, 0, len(columns["timestamp"]),
+            len(header_json), len(strings.offsets) - 1, len(strings.blob)
+        ),
+        header_json,
+    ]
+    for name, _ in COLUMNS:
+        parts.append(_little_endian(columns[name]))
+    parts.append(_little_endian(strings.offsets))
+    parts.append(bytes(strings.blob))
+
+    # Every column starts on an 8-byte boundary
+    out = bytearray()
+    for part in parts:
+        out += part
+        out += b"\0" * (-len(out) % 8)
+    return bytes(out)
+
+
+def write_columnar(path: str, header: SessionHeader, events: Iterable[EventLog]) -> int:
+    """Write a session file; returns its size in bytes"""
+
+    data = encode_columnar(header, events)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def session_header(session: SessionTimeline) -> SessionHeader:
+    """The header fields of a session, without copying its events"""
+    return SessionHeader.model_construct(
+        _fields_set=session.model_fields_set & set(SessionHeader.model_fields),
+        **{name: getattr(session, name) for name in SessionHeader.model_fields}
+    )
+
+
+class ColumnarSession:
+    """Read side of the columnar format over any buffer (bytes, mmap).
+
+    Columns are memoryviews into the buffer, so opening a file maps it and
+    reads nothing until a column is touched. Codes are range-checked per
+    batch; damaged files raise ColumnarFormatError.
+    """
+
+    def __init__(self, buffer, owner=None):
+        self._buffer = memoryview(buffer)
+        self._owner = owner
+        if len(self._buffer) < _PRELUDE.size:
+            raise ColumnarFormatError("buffer too short for a columnar session")
+        magic, version, _, count, header_size, string_count, string_bytes = _PRELUDE.unpack_from(self._buffer)
+        if magic != MAGIC:
+            raise ColumnarFormatError("not a columnar session (bad magic)")
+        if version != FORMAT_VERSION:
+            raise ColumnarFormatError(f"unsupported columnar session version {version}")
+
+        offset = _aligned(_PRELUDE.size)
+        self.header = SessionHeader.model_validate_json(bytes(self._buffer[offset:offset + header_size]))
+        offset = _aligned(offset + header_size)
+
+        self.columns = {}
+        for name, typecode in COLUMNS:
+            self.columns[name], offset = self._column(offset, typecode, count)
+        self._string_offsets, offset = self._column(offset, "I", string_count + 1)
+        self._string_blob = self._buffer[offset:offset + string_bytes]
+        if len(self._string_blob) != string_bytes:
+            raise ColumnarFormatError("columnar session is truncated")
+        if self._string_offsets[0] != 0 or self._string_offsets[string_count] != string_bytes:
+            raise ColumnarFormatError("corrupt string table")
+        self._strings: list = [None] * (string_count + 1)
+        self._count = count
+
+    @classmethod
+    def open(cls, path: str) -> "ColumnarSession":
+        """Memory-map a session file"""
+
+        with open(path, "rb") as f:
+            # mmap refuses empty files with a bare ValueError
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ColumnarFormatError("buffer too short for a columnar session")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, owner=mapped)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[EventLog]:
+        return self.events()
+
+    def string(self, code: int) -> Optional[str]:
+        if code == 0:
+            return None
+        if not 0 < code < len(self._strings):
+            raise ColumnarFormatError(f"string code {code} is out of range")
+        value = self._strings[code]
+        if value is None:
+            offsets = self._string_offsets
+            start, end = offsets[code - 1], offsets[code]
+            if start > end:
+                raise ColumnarFormatError("corrupt string table")
+            try:
+                value = self._strings[code] = str(self._string_blob[start:end], "utf-8")
+            except UnicodeDecodeError as e:
+                raise ColumnarFormatError(f"string {code} is not UTF-8") from e
+        return value
+
+    def events(self, start: int = 0, stop: Optional[int] = None, batch_size: int = STREAM_BATCH) -> Iterator[EventLog]:
+        """Events in recorded order, as the session's typed event models,
+        decoded batch_size at a time"""
+
+        stop = self._count if stop is None else stop
+        for batch in range(start, stop, batch_size):
+            yield from self._batch(batch, min(batch + batch_size, stop))
+
+    def _batch(self, start: int, stop: int) -> list[EventLog]:
+        # Whole column slices convert to lists far faster than indexing views per event
+        columns = [self.columns[name][start:stop].tolist() for name, _ in COLUMNS]
+        if columns[0]:
+            if max(columns[2]) >= len(EVENT_TYPES) or max(columns[3]) >= len(_BUTTONS):
+                raise ColumnarFormatError("event type or button code out of range")
+            if max(max(column) for column in columns[8:13]) >= len(self._strings):
+                raise ColumnarFormatError("string code out of range")
+        string = self.string
+        zones = _ZONES
+        events = []
+        for timestamp, utc_offset, code, button, x, y, dx, dy, ref, s1, s2, s3, extra, unset in zip(*columns):
+            timestamp = _EPOCH + timedelta(microseconds=timestamp)
+            if utc_offset != NAIVE:
+                zone = zones.get(utc_offset)
+                if zone is None:
+                    try:
+                        zone = zones[utc_offset] = timezone(timedelta(seconds=utc_offset))
+                    except ValueError as e:
+                        raise ColumnarFormatError(f"bad UTC offset {utc_offset}") from e
+                timestamp = timestamp.replace(tzinfo=zone)
+
+            event_type = EVENT_TYPES[code]
+            model = PAYLOAD_MODELS[event_type]
+            if extra:
+                data = model.model_validate_json(string(extra))
+            else:
+                if event_type in _CLICKS:
+                    values = {
+                        "x": x, "y": y, "button": _BUTTONS[button],
+                        "element_text": string(s1), "element_type": string(s2)
+                    }
+                elif event_type == "TEXT_INPUT":
+                    values = {"text": string(s1), "target_element": string(s2)}
+                elif event_type in _KEYS:
+                    modifiers = string(s2)
+                    values = {
+                        "key": string(s1),
+                        "modifiers": modifiers.split(MODIFIER_SEPARATOR) if modifiers is not None else []
+                    }
+                elif event_type == "SCROLL":
+                    values = {"x": x, "y": y, "delta_x": dx, "delta_y": dy}
+                elif event_type == "MOUSE_DRAG":
+                    values = {"start_x": x, "start_y": y, "end_x": dx, "end_y": dy, "button": _BUTTONS[button]}
+                elif event_type == "NAVIGATION":
+                    values = {"url": string(s1), "title": string(s2)}
+                elif event_type == "SCREENSHOT":
+                    values = {"s3_key": string(s1), "width": x, "height": y, "ocr_text": string(s2)}
+                elif event_type == "WINDOW_SWITCH":
+                    values = {"window_title": string(s1), "application": string(s2)}
+                else:
+                    values = {"operation": string(s1), "path": string(s2), "destination": string(s3)}
+                if unset & ~UNSET_SCREENSHOT_REF:
+                    for name in _unset_names(event_type, unset):
+                        del values[name]
+                data = model(**values)
+
+            event = {"timestamp": timestamp, "event_type": event_type, "data": data}
+            if not unset & UNSET_SCREENSHOT_REF:
+                event["screenshot_ref"] = string(ref)
+            events.append(EVENT_LOG_MODELS[event_type](**event))
+        return events
+
+    def to_session(self) -> SessionTimeline:
+        """The full SessionTimeline, equal to the one that was written"""
+
+        header = self.header
+        fields = {name: getattr(header, name) for name in header.model_fields_set}
+        return SessionTimeline(**fields, events=list(self.events(batch_size=max(1, self._count))))
+
+    def close(self) -> None:
+        self.columns = {}
+        self._string_offsets = self._string_blob = None
+        self._buffer.release()
+        if self._owner is not None:
+            try:
+                self._owner.close()
+            except BufferError:
+                # An unfinished events() iterator still holds columns; the map goes with it
+                pass
+            self._owner = None
+
+    def __enter__(self) -> "ColumnarSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _column(self, offset: int, typecode: str, count: int) -> tuple[Union[memoryview, array], int]:
+        size = array(typecode).itemsize * count
+        raw = self._buffer[offset:offset + size]
+        if len(raw) != size:
+            raise ColumnarFormatError("columnar session is truncated")
+        if sys.byteorder == "little":
+            column = raw.cast(typecode)
+        else:
+            # Stored little-endian: big-endian hosts read a swapped copy
+            column = array(typecode, bytes(raw))
+            column.byteswap()
+        return column, _aligned(offset + size)
+
+
+def _encode_event(event: EventLog, columns: dict, strings: _StringTable) -> None:
+    timestamp = event.timestamp
+    utc_offset = timestamp.utcoffset()
+    if utc_offset is None:
+        offset_seconds = NAIVE
+    else:
+        if utc_offset % timedelta(seconds=1):
+            raise ValueError(f"UTC offset {utc_offset} has sub-second precision")
+        offset_seconds = int(utc_offset.total_seconds())
+    columns["timestamp"].append((timestamp.replace(tzinfo=None) - _EPOCH) // _MICROSECOND)
+    columns["utc_offset"].append(offset_seconds)
+
+    event_type = event.event_type.value if isinstance(event.event_type, EventType) else event.event_type
+    columns["event_type"].append(_EVENT_CODES[event_type])
+    columns["screenshot_ref"].append(strings.add(event.screenshot_ref))
+
+    unset = 0 if "screenshot_ref" in event.model_fields_set else UNSET_SCREENSHOT_REF
+    values = _payload_columns(event_type, event.data)
+    if values is None:
+        values = {"extra": strings.add(event.data.model_dump_json(exclude_unset=True))}
+    else:
+        fields_set = event.data.model_fields_set
+        for bit, name in enumerate(_PAYLOAD_FIELDS[event_type]):
+            if name not in fields_set:
+                unset |= 1 << bit
+    for name in ("button", "x", "y", "dx", "dy", "extra"):
+        columns[name].append(values.get(name, 0))
+    for name in ("s1", "s2", "s3"):
+        columns[name].append(strings.add(values.get(name)))
+    columns["unset"].append(unset)
+
+
+def _payload_columns(event_type: str, data) -> Optional[dict]:
+    """Column values for a payload, or None if it must be stored as JSON"""
+
+    if event_type in _CLICKS:
+        values = {"x": data.x, "y": data.y, "button": data.button, "s1": data.element_text, "s2": data.element_type}
+    elif event_type == "TEXT_INPUT":
+        values = {"s1": data.text, "s2": data.target_element}
+    elif event_type in _KEYS:
+        if any(MODIFIER_SEPARATOR in modifier for modifier in data.modifiers):
+            return None
+        values = {"s1": data.key, "s2": MODIFIER_SEPARATOR.join(data.modifiers) if data.modifiers else None}
+    elif event_type == "SCROLL":
+        values = {"x": data.x, "y": data.y, "dx": data.delta_x, "dy": data.delta_y}
+    elif event_type == "MOUSE_DRAG":
+        values = {"x": data.start_x, "y": data.start_y, "dx": data.end_x, "dy": data.end_y, "button": data.button}
+    elif event_type == "NAVIGATION":
+        values = {"s1": data.url, "s2": data.title}
+    elif event_type == "SCREENSHOT":
+        values = {"x": data.width, "y": data.height, "s1": data.s3_key, "s2": data.ocr_text}
+    elif event_type == "WINDOW_SWITCH":
+        values = {"s1": data.window_title, "s2": data.application}
+    else:
+        values = {"s1": data.operation, "s2": data.path, "s3": data.destination}
+
+    if "button" in values:
+        button = getattr(values["button"], "value", values["button"])
+        if button not in _BUTTON_CODES:
+            return None
+        values["button"] = _BUTTON_CODES[button]
+    for name in ("x", "y", "dx", "dy"):
+        value = values.get(name, 0)
+        if type(value) is not int or not _INT32[0] <= value < _INT32[1]:
+            return None
+    return values
+
+
+def _unset_names(event_type: str, unset: int) -> tuple[str, ...]:
+    names = _UNSET_NAMES.get((event_type, unset))
+    if names is None:
+        names = _UNSET_NAMES[(event_type, unset)] = tuple(
+            name for bit, name in enumerate(_PAYLOAD_FIELDS[event_type]) if unset & (1 << bit)
+        )
+    return names
+
+
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder == "little":
+        return column.tobytes()
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _aligned(offset: int) -> int:
+    return offset + (-offset % 8)
+
+
+if __name__ == "__main__":
+    # python -m src.core.columnar session.json session.wfcs
+    source, target = sys.argv[1:3]
+    with open(source, "rb") as f:
+        session = SessionTimeline.model_validate_json(f.read())
+    size = write_columnar(target, session_header(session), session.events)
+    print(f"{len(session.events)} events, {size} bytes -> {target}")
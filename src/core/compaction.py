@@ -0,0 +1,114 @@
+from typing import Iterable, Iterator, Optional
+
+from pydantic import BaseModel, Field
+
+from src.models.events import EventLog, EventType
+
+
+class CompactionConfig(BaseModel):
+    """Which redundant event patterns to collapse before step conversion"""
+    merge_text_input: bool = Field(True, description="Join consecutive TEXT_INPUT events into one")
+    text_input_window_seconds: float = Field(2.0, description="Max gap between keystrokes in one text entry")
+    merge_scroll: bool = Field(True, description="Sum consecutive SCROLL deltas")
+    scroll_window_seconds: float = Field(1.0, description="Max gap between scroll ticks in one scroll")
+    fold_double_clicks: bool = Field(True, description="Turn two quick clicks on one spot into a double-click")
+    double_click_seconds: float = Field(0.5, description="Max gap between the two clicks")
+    double_click_distance: int = Field(4, description="Max pixel distance between the two clicks")
+    drop_screenshots: bool = Field(True, description="Drop SCREENSHOT events, which produce no step")
+
+
+class CompactionStats:
+    def __init__(self):
+        self.input_events = 0
+        self.output_events = 0
+
+    @property
+    def compression_ratio(self) -> float:
+        """Input events per output event (1.0 means nothing was compacted)"""
+        return self.input_events / self.output_events if self.output_events else 1.0
+
+    def as_dict(self) -> dict:
+        return {
+            "input_events": self.input_events,
+            "output_events": self.output_events,
+            "compression_ratio": round(self.compression_ratio, 3)
+        }
+
+
+class EventCompactor:
+    """Streaming pass that coalesces redundant events.
+
+    Holds at most one pending event, so it runs in constant memory over
+    arbitrarily long event streams. Counts are final once the output
+    iterator is exhausted.
+    """
+
+    def __init__(self, config: Optional[CompactionConfig] = None):
+        self.config = config or CompactionConfig()
+        self.stats = CompactionStats()
+
+    def compact(self, events: Iterable[EventLog]) -> Iterator[EventLog]:
+        pending: Optional[EventLog] = None
+        pending_last_seen = None
+
+        for event in events:
+            self.stats.input_events += 1
+
+            if self.config.drop_screenshots and event.event_type == EventType.SCREENSHOT.value:
+                continue
+
+            if pending is not None:
+                merged = self._merge(pending, pending_last_seen, event)
+                if merged is not None:
+                    pending = merged
+                    pending_last_seen = event.timestamp
+                    continue
+                self.stats.output_events += 1
+                yield pending
+
+            pending = event
+            pending_last_seen = event.timestamp
+
+        if pending is not None:
+            self.stats.output_events += 1
+            yield pending
+
+    def _merge(self, pending: EventLog, last_seen, event: EventLog) -> Optional[EventLog]:
+        """Fold event into pending, or return None if they must stay separate"""
+
+        config = self.config
+        kind = pending.event_type
+        if event.event_type != kind:
+            return None
+
+        if kind == EventType.TEXT_INPUT.value and config.merge_text_input:
+            if pending.data.target_element != event.data.target_element:
+                return None
+            if (event.timestamp - last_seen).total_seconds() > config.text_input_window_seconds:
+                return None
+            return pending.model_copy(update={
+                "data": pending.data.model_copy(update={"text": pending.data.text + event.data.text})
+            })
+
+        if kind == EventType.SCROLL.value and config.merge_scroll:
+            if (event.timestamp - last_seen).total_seconds() > config.scroll_window_seconds:
+                return None
+            return pending.model_copy(update={
+                "data": pending.data.model_copy(update={
+                    "delta_x": pending.data.delta_x + event.data.delta_x,
+                    "delta_y": pending.data.delta_y + event.data.delta_y
+                })
+            })
+
+        if kind == EventType.MOUSE_CLICK.value and config.fold_double_clicks:
+            if (event.timestamp - pending.timestamp).total_seconds() > config.double_click_seconds:
+                return None
+            if pending.data.button != event.data.button:
+                return None
+            dx = abs(pending.data.x - event.data.x)
+            dy = abs(pending.data.y - event.data.y)
+            if max(dx, dy) > config.double_click_distance:
+                return None
+            return pending.model_copy(update={"event_type": EventType.MOUSE_DOUBLE_CLICK.value})
+
+        return None
@@ -0,0 +1,211 @@
+from typing import Callable, Optional
+
+from src.models.events import EventLog, EventType
+from src.models.workflow import WorkflowStep, ActionType, Selector
+
+
+EventConverter = Callable[[EventLog, int], Optional[WorkflowStep]]
+
+_CONVERTERS: dict[str, EventConverter] = {}
+
+
+def register_converter(event_type: EventType, converter: Optional[EventConverter] = None):
+    """Register the converter for an event type, replacing any existing one.
+
+    Usable directly or as a decorator:
+
+        @register_converter(EventType.FILE_OPERATION)
+        def file_operation_to_step(event, step_num): ...
+    """
+
+    def register(func: EventConverter) -> EventConverter:
+        _CONVERTERS[EventType(event_type).value] = func
+        return func
+
+    if converter is not None:
+        return register(converter)
+    return register
+
+
+def get_converter(event_type) -> Optional[EventConverter]:
+    return _CONVERTERS.get(EventType(event_type).value)
+
+
+def convert_event(event: EventLog, step_num: int) -> Optional[WorkflowStep]:
+    """Convert one event with its registered converter; unknown types yield no step"""
+
+    converter = _CONVERTERS.get(event.event_type)
+    if converter is None:
+        return None
+    return converter(event, step_num)
+
+
+def make_step(
+    step_num: int,
+    action: ActionType,
+    description: str,
+    selector: Optional[Selector] = None,
+    parameters: Optional[dict] = None,
+    screenshot_before: Optional[str] = None
+) -> WorkflowStep:
+    """Build a WorkflowStep with the fields converters set"""
+
+    return WorkflowStep(
+        step_id=f"step_{step_num}",
+        action=action,
+        description=description,
+        selector=selector,
+        parameters=parameters if parameters is not None else {},
+        screenshot_before=screenshot_before
+    )
+
+
+def coordinates(x, y) -> Selector:
+    return Selector(type="coordinates", value={"x": x, "y": y})
+
+
+@register_converter(EventType.MOUSE_CLICK)
+def click_to_step(event: EventLog, step_num: int) -> WorkflowStep:
+    data = event.data
+    return make_step(
+        step_num,
+        ActionType.CLICK,
+        f"Click at ({data.x}, {data.y})",
+        selector=coordinates(data.x, data.y),
+        parameters={"button": data.button},
+        screenshot_before=event.screenshot_ref
+    )
+
+
+@register_converter(EventType.MOUSE_DOUBLE_CLICK)
+def double_click_to_step(event: EventLog, step_num: int) -> WorkflowStep:
+    data = event.data
+    return make_step(
+        step_num,
+        ActionType.DOUBLE_CLICK,
+        f"Double-click at ({data.x}, {data.y})",
+        selector=coordinates(data.x, data.y)
+    )
+
+
+@register_converter(EventType.MOUSE_RIGHT_CLICK)
+def right_click_to_step(event: EventLog, step_num: int) -> WorkflowStep:
+    data = event.data
+    return make_step(
+        step_num,
+        ActionType.RIGHT_CLICK,
+        f"Right-click at ({data.x}, {data.y})",
+        selector=coordinates(data.x, data.y),
+        screenshot_before=event.screenshot_ref
+    )
+
+
+@register_converter(EventType.MOUSE_DRAG)
+def drag_to_step(event: EventLog, step_num: int) -> WorkflowStep:
+    data = event.data
+    start = (data.start_x, data.start_y)
+    end = (data.end_x, data.end_y)
+    return make_step(
+        step_num,
+        ActionType.DRAG,
+        f"Drag from {start} to {end}",
+        selector=coordinates(*start),
+        parameters={
+            "end": {"x": end[0], "y": end[1]},
+            "button": data.button
+        },
+        screenshot_before=event.screenshot_ref
+    )
+
+
+@register_converter(EventType.TEXT_INPUT)
+def text_input_to_step(event: EventLog, step_num: int) -> WorkflowStep:
+    data = event.data
+    return make_step(
+        step_num,
+        ActionType.TYPE_TEXT,
+        f"Type: {data.text[:50]}...",
+        parameters={"text": data.text}
+    )
+
+
+@register_converter(EventType.KEY_PRESS)
+def key_press_to_step(event: EventLog, step_num: int) -> WorkflowStep:
+    data = event.data
+    return make_step(
+        step_num,
+        ActionType.PRESS_KEY,
+        f"Press key: {data.key}",
+        parameters={
+            "key": data.key,
+            "modifiers": list(data.modifiers)
+        }
+    )
+
+
+@register_converter(EventType.KEY_COMBINATION)
+def key_combination_to_step(event: EventLog, step_num: int) -> WorkflowStep:
+    data = event.data
+    modifiers = list(data.modifiers)
+    return make_step(
+        step_num,
+        ActionType.KEY_COMBINATION,
+        f"Press {'+'.join([*modifiers, data.key])}",
+        parameters={
+            "key": data.key,
+            "modifiers": modifiers
+        }
+    )
+
+
+@register_converter(EventType.SCROLL)
+def scroll_to_step(event: EventLog, step_num: int) -> WorkflowStep:
+    data = event.data
+    return make_step(
+        step_num,
+        ActionType.SCROLL,
+        f"Scroll by ({data.delta_x}, {data.delta_y})",
+        selector=coordinates(data.x, data.y),
+        parameters={
+            "delta_x": data.delta_x,
+            "delta_y": data.delta_y
+        }
+    )
+
+
+@register_converter(EventType.NAVIGATION)
+def navigation_to_step(event: EventLog, step_num: int) -> WorkflowStep:
+    data = event.data
+    return make_step(
+        step_num,
+        ActionType.NAVIGATE,
+        f"Navigate to {data.url}",
+        parameters={"url": data.url}
+    )
+
+
+@register_converter(EventType.WINDOW_SWITCH)
+def window_switch_to_step(event: EventLog, step_num: int) -> WorkflowStep:
+    data = event.data
+    return make_step(
+        step_num,
+        ActionType.SWITCH_WINDOW,
+        f"Switch to window: {data.window_title}",
+        selector=Selector(type="text", value=data.window_title),
+        parameters={
+            "window_title": data.window_title,
+            "application": data.application
+        }
+    )
+
+
+@register_converter(EventType.SCREENSHOT)
+def screenshot_to_step(event: EventLog, step_num: int) -> None:
+    # Screenshots are reference points, not actions
+    return None
+
+
+@register_converter(EventType.FILE_OPERATION)
+def file_operation_to_step(event: EventLog, step_num: int) -> None:
+    # File operations happen outside the UI and have no replayable action
+    return None
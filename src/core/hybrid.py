@@ -0,0 +1,284 @@
+import json
+from typing import Iterable, Optional
+
+from src.models.events import EventLog, EventType
+from src.models.workflow import ActionType, Selector, WorkflowDefinition, WorkflowStep
+
+
+CLICK_ACTIONS = (ActionType.CLICK, ActionType.DOUBLE_CLICK, ActionType.RIGHT_CLICK)
+CLICK_EVENTS = (
+    EventType.MOUSE_CLICK.value,
+    EventType.MOUSE_DOUBLE_CLICK.value,
+    EventType.MOUSE_RIGHT_CLICK.value,
+)
+
+# OCR text beyond this adds tokens without helping pick a selector
+MAX_SCREEN_TEXT = 400
+
+
+class EnrichmentTask:
+    """One small model request: a task name, its JSON payload and the steps it may change.
+    aliases maps further step ids onto a requested step whose result they share."""
+
+    def __init__(self, kind: str, payload: dict, step_ids: list[str], aliases: Optional[dict] = None):
+        self.kind = kind
+        self.payload = payload
+        self.step_ids = step_ids
+        self.aliases = aliases or {}
+
+
+class HybridEnricher:
+    """Plans and merges AI enrichment of a deterministic workflow skeleton.
+
+    Only what the rules cannot resolve goes to the model: coordinate-only
+    clicks with no element text recorded, and the typed values (for variable
+    extraction). Clicks with recorded element text get a text selector
+    locally; repeat clicks on the same spot of the same page share one
+    answer. Nearby ambiguous clicks form segments with context_steps
+    neighbours on each side, packed max_targets_per_request to a request.
+    """
+
+    def __init__(self, context_steps: int = 1, max_targets_per_request: int = 16):
+        self.context_steps = context_steps
+        self.max_targets_per_request = max_targets_per_request
+
+    def plan(self, workflow: WorkflowDefinition, events: Iterable[EventLog]) -> list[EnrichmentTask]:
+        """Resolve what can be resolved locally (mutating workflow.steps) and
+        return the model requests for the rest"""
+
+        hints = click_hints(events)
+        steps = workflow.steps
+        locations = _locations(steps)
+        ambiguous = []
+        aliases = {}
+        targeted = {}
+        for index, step in enumerate(steps):
+            if not _is_coordinate_click(step):
+                continue
+            spot = _spot(locations[index], step)
+            hint = hints.get(spot, {})
+            if hint.get("element_text"):
+                steps[index] = _with_selector(step, Selector(type="text", value=hint["element_text"]))
+                continue
+            if spot in targeted:
+                aliases[step.step_id] = targeted[spot]
+            else:
+                targeted[spot] = step.step_id
+                ambiguous.append(index)
+
+        tasks = self._selector_tasks(workflow, ambiguous, hints, aliases, locations)
+
+        typed = sorted({
+            step.parameters["text"]
+            for step in steps
+            if step.action == ActionType.TYPE_TEXT and step.parameters.get("text")
+        })
+        if typed:
+            tasks.append(EnrichmentTask(
+                "variables",
+                {"application": workflow.application, "typed_text": typed},
+                [step.step_id for step in steps if step.action == ActionType.TYPE_TEXT]
+            ))
+        return tasks
+
+    def merge(self, workflow: WorkflowDefinition, tasks: list[EnrichmentTask], replies: list[Optional[dict]]) -> WorkflowDefinition:
+        """Apply model replies to the skeleton; a missing or malformed reply leaves its steps as they are"""
+
+        positions = {step.step_id: index for index, step in enumerate(workflow.steps)}
+        enriched = 0
+        variables = dict(workflow.variables)
+
+        for task, reply in zip(tasks, replies):
+            if not isinstance(reply, dict):
+                continue
+            if task.kind == "selectors":
+                enriched += _apply_selectors(workflow.steps, positions, task, reply)
+            elif task.kind == "variables":
+                enriched += _apply_variables(workflow.steps, positions, task, reply, variables)
+
+        workflow.variables = variables
+        workflow.metadata["hybrid"] = {
+            "model_requests": len(tasks),
+            "failed_requests": sum(1 for reply in replies if not isinstance(reply, dict)),
+            "enriched_steps": enriched,
+        }
+        return workflow
+
+    def _selector_tasks(
+        self,
+        workflow: WorkflowDefinition,
+        ambiguous: list[int],
+        hints: dict,
+        aliases: dict,
+        locations: list
+    ) -> list[EnrichmentTask]:
+        steps = workflow.steps
+
+        # Segments: ambiguous steps close enough to share their context window
+        segments = []
+        for index in ambiguous:
+            if segments and index - segments[-1][-1] <= 2 * self.context_steps + 1:
+                segments[-1].append(index)
+            else:
+                segments.append([index])
+
+        tasks = []
+        batch, targets = [], []
+        for segment in segments:
+            if batch and len(targets) + len(segment) > self.max_targets_per_request:
+                tasks.append(self._selector_task(workflow, batch, targets, aliases))
+                batch, targets = [], []
+            batch.append(self._segment(steps, segment, hints, locations))
+            targets.extend(steps[index].step_id for index in segment)
+        if batch:
+            tasks.append(self._selector_task(workflow, batch, targets, aliases))
+        return tasks
+
+    def _selector_task(self, workflow: WorkflowDefinition, segments: list[dict], targets: list[str], aliases: dict) -> EnrichmentTask:
+        wanted = set(targets)
+        return EnrichmentTask(
+            "selectors",
+            {"application": workflow.application, "segments": segments},
+            targets,
+            {alias: target for alias, target in aliases.items() if target in wanted}
+        )
+
+    def _segment(self, steps: list[WorkflowStep], indices: list[int], hints: dict, locations: list) -> dict:
+        start = max(0, indices[0] - self.context_steps)
+        end = min(len(steps), indices[-1] + self.context_steps + 1)
+        targets = set(indices)
+
+        listed = []
+        for index in range(start, end):
+            step = steps[index]
+            item = {"step_id": step.step_id, "description": step.description}
+            if index in targets:
+                item["resolve"] = True
+                item.update(hints.get(_spot(locations[index], step), {}))
+            listed.append(item)
+
+        segment = {"steps": listed}
+        if locations[start]:
+            segment["location"] = locations[start]
+        return segment
+
+
+def click_hints(events: Iterable[EventLog]) -> dict[tuple, dict]:
+    """Element type and on-screen text recorded for each clicked coordinate,
+    keyed by the page or window it was clicked on and the coordinates"""
+
+    screen_text = {}
+    clicks = []
+    location = None
+    for event in events:
+        if event.event_type == EventType.SCREENSHOT.value and event.data.ocr_text:
+            screen_text[event.data.s3_key] = event.data.ocr_text[:MAX_SCREEN_TEXT]
+        elif event.event_type in CLICK_EVENTS:
+            clicks.append((location, event))
+        elif event.event_type == EventType.NAVIGATION.value:
+            location = {"url": event.data.url}
+        elif event.event_type == EventType.WINDOW_SWITCH.value:
+            location = {"window_title": event.data.window_title}
+
+    hints = {}
+    for location, event in clicks:
+        hint = {}
+        if event.data.element_text:
+            hint["element_text"] = event.data.element_text
+        if event.data.element_type:
+            hint["element_type"] = event.data.element_type
+        if event.screenshot_ref in screen_text:
+            hint["screen_text"] = screen_text[event.screenshot_ref]
+        if hint:
+            key = (json.dumps(location, sort_keys=True), (event.data.x, event.data.y))
+            hints.setdefault(key, {}).update(hint)
+    return hints
+
+
+def _spot(location: Optional[dict], step: WorkflowStep) -> tuple:
+    """Where a click happened: its page or window and its coordinates"""
+    return json.dumps(location, sort_keys=True), _coordinates(step)
+
+
+def _is_coordinate_click(step: WorkflowStep) -> bool:
+    return step.action in CLICK_ACTIONS and step.selector is not None and step.selector.type == "coordinates"
+
+
+def _coordinates(step: WorkflowStep) -> Optional[tuple]:
+    value = step.selector.value if step.selector is not None else None
+    if isinstance(value, dict):
+        return value.get("x"), value.get("y")
+    return None
+
+
+def _with_selector(step: WorkflowStep, selector: Selector) -> WorkflowStep:
+    """Replace the selector, keeping the recorded coordinates as its fallback"""
+    return step.model_copy(update={"selector": selector.model_copy(update={"fallback": step.selector})})
+
+
+def _locations(steps: list[WorkflowStep]) -> list[Optional[dict]]:
+    """Page or window the user was on when each step ran"""
+
+    locations = []
+    current = None
+    for step in steps:
+        locations.append(current)
+        if step.action == ActionType.NAVIGATE:
+            current = {"url": step.parameters.get("url")}
+        elif step.action == ActionType.SWITCH_WINDOW:
+            current = {"window_title": step.parameters.get("window_title")}
+    return locations
+
+
+def _apply_selectors(steps: list[WorkflowStep], positions: dict, task: EnrichmentTask, reply: dict) -> int:
+    allowed = set(task.step_ids)
+    answered = {}
+    for item in reply.get("steps") or []:
+        if not isinstance(item, dict) or item.get("step_id") not in allowed:
+            continue
+        try:
+            selector = Selector.model_validate(item.get("selector"))
+        except ValueError:
+            continue
+        if selector.type != "coordinates":
+            answered[item["step_id"]] = (selector, item.get("description"))
+
+    applied = 0
+    for step_id in [*task.step_ids, *task.aliases]:
+        answer = answered.get(task.aliases.get(step_id, step_id))
+        if answer is None:
+            continue
+        selector, description = answer
+        index = positions[step_id]
+        step = _with_selector(steps[index], selector)
+        if isinstance(description, str) and description:
+            step = step.model_copy(update={"description": description})
+        steps[index] = step
+        applied += 1
+    return applied
+
+
+def _apply_variables(steps: list[WorkflowStep], positions: dict, task: EnrichmentTask, reply: dict, variables: dict) -> int:
+    proposed = reply.get("variables") or {}
+    if not isinstance(proposed, dict):
+        return 0
+
+    # The model names values; it does not get to change what was typed
+    names = {}
+    for name, value in proposed.items():
+        if isinstance(name, str) and isinstance(value, str):
+            names.setdefault(value, name)
+
+    applied = 0
+    for step_id in task.step_ids:
+        index = positions[step_id]
+        step = steps[index]
+        name = names.get(step.parameters.get("text"))
+        if name is None:
+            continue
+        variables[name] = step.parameters["text"]
+        steps[index] = step.model_copy(update={
+            "parameters": {**step.parameters, "text": "{{" + name + "}}"}
+        })
+        applied += 1
+    return applied
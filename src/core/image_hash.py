@@ -0,0 +1,57 @@
+import math
+
+from PIL import Image
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair of a
+    (hash_size + 1) x hash_size grayscale thumbnail"""
+
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    width = hash_size + 1
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * width
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+_DCT_SIZE = 32
+_DCT_COEFFICIENTS = 8
+
+# Rows of the DCT-II basis for the low frequencies kept by phash
+_DCT_BASIS = [
+    [math.cos(math.pi * k * (2 * n + 1) / (2 * _DCT_SIZE)) for n in range(_DCT_SIZE)]
+    for k in range(_DCT_COEFFICIENTS)
+]
+
+
+def phash(image: Image.Image) -> int:
+    """Perceptual hash: sign of the 8x8 lowest DCT frequencies of a 32x32
+    grayscale thumbnail relative to their median (DC term excluded from the median).
+    More robust than dhash to rescaling, recompression and small UI changes."""
+
+    small = image.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    rows = [pixels[r * _DCT_SIZE:(r + 1) * _DCT_SIZE] for r in range(_DCT_SIZE)]
+
+    # Separable 2-D DCT, computing only the frequencies that are kept
+    row_freqs = [[sum(b * p for b, p in zip(basis, row)) for basis in _DCT_BASIS] for row in rows]
+    coefficients = [
+        sum(basis[n] * row_freqs[n][u] for n in range(_DCT_SIZE))
+        for basis in _DCT_BASIS
+        for u in range(_DCT_COEFFICIENTS)
+    ]
+
+    median = sorted(coefficients[1:])[len(coefficients) // 2 - 1]
+    value = 0
+    for coefficient in coefficients:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
@@ -0,0 +1,62 @@
+from typing import Iterable, Iterator, Union
+
+from pydantic import TypeAdapter, ValidationError
+
+from src.models.events import SessionHeader, EventLog, TypedEventLog
+
+
+# Dispatches on event_type inside pydantic-core, straight into the payload model
+_EVENT_ADAPTER = TypeAdapter(TypedEventLog)
+
+
+class IngestionError(ValueError):
+    """A line of an NDJSON session stream could not be parsed or validated"""
+
+    def __init__(self, line_number: int, message: str):
+        super().__init__(f"line {line_number}: {message}")
+        self.line_number = line_number
+
+
+def read_ndjson_session(lines: Iterable[Union[str, bytes]]) -> tuple[SessionHeader, Iterator[EventLog]]:
+    """Parse an NDJSON session: a SessionHeader line, then one EventLog per line.
+
+    The header is parsed eagerly; events are validated lazily as the returned
+    iterator is consumed, so only one line is held in memory at a time.
+    Blank lines are skipped.
+    """
+
+    numbered = _non_blank(lines)
+    try:
+        line_number, first = next(numbered)
+    except StopIteration:
+        raise IngestionError(0, "empty stream, expected a session header line")
+
+    try:
+        header = SessionHeader.model_validate_json(first)
+    except ValidationError as e:
+        raise IngestionError(line_number, f"invalid session header: {e}")
+
+    return header, _events(numbered)
+
+
+def _non_blank(lines: Iterable[Union[str, bytes]]) -> Iterator[tuple[int, Union[str, bytes]]]:
+    for line_number, line in enumerate(lines, start=1):
+        if line.strip():
+            yield line_number, line
+
+
+def _events(numbered: Iterator[tuple[int, Union[str, bytes]]]) -> Iterator[EventLog]:
+    for line_number, line in numbered:
+        try:
+            yield _EVENT_ADAPTER.validate_json(line)
+        except ValidationError as e:
+            raise IngestionError(line_number, f"invalid event: {e}")
+
+
+def write_ndjson_session(header: SessionHeader, events: Iterable[EventLog]) -> Iterator[str]:
+    """Inverse of read_ndjson_session: yields the header line, then one line per event"""
+
+    yield header.model_dump_json() + "\n"
+    for event in events:
+        yield event.model_dump_json() + "\n"
+
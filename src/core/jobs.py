@@ -0,0 +1,487 @@
+import ipaddress
+import json
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Collection, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from src.models.events import SessionTimeline
+from src.core.routing import RoutingBudget
+from src.core.workflow_generator import WorkflowGenerator, build_workflow_generator
+from src.services.health import build_prober, is_outage
+from src.services.metrics import JOB_OUTCOMES, WEBHOOK_DELIVERIES
+from src.services.rate_limiter import is_throttle
+
+
+# Durable only if it lives on a volume that outlives the pod: set JOB_QUEUE_PATH in production
+DEFAULT_QUEUE_PATH = os.path.join(tempfile.gettempdir(), "workflow-jobs.sqlite3")
+
+LOST_JOB_ERROR = "Worker lost while running the job"
+
+logger = logging.getLogger(__name__)
+
+
+def webhook_allowed_hosts() -> set[str]:
+    """Hosts from WEBHOOK_ALLOWED_HOSTS (comma-separated) that may resolve to private addresses"""
+    return {host.strip().lower() for host in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()}
+
+
+def check_webhook_url(url: str, allowed_hosts: Optional[Collection[str]] = None) -> Optional[str]:
+    """Raise ValueError unless url is http(s) and its host resolves only to public
+    addresses, so a webhook cannot reach loopback, private, link-local (cloud
+    metadata) or other internal addresses. Returns the checked address to
+    connect to. Hosts in allowed_hosts (default WEBHOOK_ALLOWED_HOSTS) skip the
+    address check, for receivers inside the network, and return None."""
+
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("Webhook URL must be an http or https URL with a host")
+    host = parts.hostname.lower()
+    if host in (webhook_allowed_hosts() if allowed_hosts is None else allowed_hosts):
+        return None
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)}
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Webhook host {host} cannot be resolved: {e}")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"Webhook host {host} resolves to non-public address {ip}")
+    return sorted(addresses)[0]
+
+
+def pinned_request(client: httpx.Client, url: str, address: Optional[str], payload: dict) -> httpx.Request:
+    """POST of payload to url over a connection to address, the one check_webhook_url
+    resolved, so the host cannot be re-resolved to another. The Host header and
+    TLS server name (and so certificate checks) still use the URL's host."""
+
+    if address is None:
+        return client.build_request("POST", url, json=payload)
+    parts = urlsplit(url)
+    userinfo, _, authority = parts.netloc.rpartition("@")
+    netloc = f"[{address}]" if ":" in address else address
+    if parts.port is not None:
+        netloc += f":{parts.port}"
+    if userinfo:
+        netloc = f"{userinfo}@{netloc}"
+    return client.build_request(
+        "POST",
+        parts._replace(netloc=netloc).geturl(),
+        json=payload,
+        headers={"Host": authority},
+        extensions={"sni_hostname": parts.hostname}
+    )
+
+
+class JobQueue:
+    """Durable generation jobs in SQLite, shared by the API and any number of worker processes.
+
+    Workers claim the highest-priority job that is due and hold a lease on it
+    while they work, renewing it as they go. A job whose lease runs out (its
+    worker crashed or the pod restarted) is claimed again by the next worker,
+    so nothing submitted is lost.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 120.0,
+        max_attempts: int = 5,
+        clock: Callable[[], float] = time.time
+    ):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._clock = clock
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Claims take a write lock up front; other processes wait on it rather than failing
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                request TEXT NOT NULL,
+                webhook_url TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_until REAL,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, priority DESC, available_at)")
+        self._lock = threading.Lock()
+
+    def submit(self, request: dict, priority: int = 0, webhook_url: Optional[str] = None) -> str:
+        """Queue a generation request ({"session": ..., "use_ai": ..., "hybrid": ...}); returns the job id"""
+
+        job_id = uuid.uuid4().hex
+        now = self._clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, priority, request, webhook_url, available_at, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+                (job_id, priority, json.dumps(request), webhook_url, now, now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, priority, attempts, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "status": row[1],
+            "priority": row[2],
+            "attempts": row[3],
+            "result": json.loads(row[4]) if row[4] is not None else None,
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+        }
+
+    def claim(self, worker: str) -> Optional[dict]:
+        """Lease the next due job to worker: highest priority first, then oldest.
+        Returns {"job_id", "request", "webhook_url", "attempts"} or None."""
+
+        now = self._clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Lost jobs with no attempts left are left for expire
+                row = self._conn.execute(
+                    "SELECT id, request, webhook_url, attempts FROM jobs "
+                    "WHERE (status = 'queued' AND available_at <= ?) "
+                    "OR (status = 'running' AND lease_until < ? AND attempts < ?) "
+                    "ORDER BY priority DESC, available_at ASC LIMIT 1",
+                    (now, now, self.max_attempts),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, worker = ?, "
+                        "updated_at = ? WHERE id = ?",
+                        (now + self.lease_seconds, worker, now, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"job_id": row[0], "request": json.loads(row[1]), "webhook_url": row[2], "attempts": row[3] + 1}
+
+    def expire(self) -> list[dict]:
+        """Fail jobs whose worker died mid-run and that have no attempts left.
+        Returns {"job_id", "webhook_url", "error"} for each, so the caller can be told."""
+
+        now = self._clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, webhook_url FROM jobs WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                    (now, self.max_attempts),
+                ).fetchall()
+                for job_id, _ in rows:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                        (LOST_JOB_ERROR, now, job_id),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [{"job_id": job_id, "webhook_url": url, "error": LOST_JOB_ERROR} for job_id, url in rows]
+
+    def renew(self, job_id: str, worker: str) -> bool:
+        """Extend a running job's lease; False if the job is no longer this worker's"""
+
+        now = self._clock()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (now + self.lease_seconds, now, job_id, worker),
+            ).rowcount
+        return updated == 1
+
+    def complete(self, job_id: str, worker: str, result: dict) -> None:
+        self._finish(job_id, worker, "completed", result=json.dumps(result))
+
+    def fail(self, job_id: str, worker: str, error: str) -> None:
+        self._finish(job_id, worker, "failed", error=error)
+
+    def retry(self, job_id: str, worker: str, error: str, delay: float) -> None:
+        """Put a job back in the queue, due again after delay seconds"""
+
+        now = self._clock()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', error = ?, available_at = ?, lease_until = NULL, worker = NULL, "
+                "updated_at = ? WHERE id = ? AND worker = ?",
+                (error, now + delay, now, job_id, worker),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        stats = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+        stats.update(dict(rows))
+        return stats
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _finish(self, job_id: str, worker: str, status: str, result: Optional[str] = None, error: Optional[str] = None) -> None:
+        now = self._clock()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ?",
+                (status, result, error, now, job_id, worker),
+            )
+
+
+class JobWorker:
+    """Runs queued jobs through a WorkflowGenerator, one at a time.
+
+    Bedrock outages and throttling put the job back with exponential backoff
+    and jitter until the queue's max_attempts is spent; other errors fail the
+    job at once. A deterministic fallback served while the circuit breaker is
+    open counts as an outage too, since a job can afford to wait for the AI
+    result. The webhook, if any, is called once the job completes or fails,
+    including when it fails because its worker was lost on the last attempt.
+    Webhooks are delivered by a small thread pool so a slow receiver does not
+    hold up the next job.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        generator: WorkflowGenerator,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        poll_interval: float = 0.5,
+        webhook_timeout: float = 10.0,
+        webhook_threads: int = 4
+    ):
+        self.queue = queue
+        self.generator = generator
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+        self.webhook_timeout = webhook_timeout
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._webhooks = ThreadPoolExecutor(max_workers=webhook_threads, thread_name_prefix="webhook")
+        self._http = httpx.Client(timeout=webhook_timeout)
+
+    def run(self, stop: threading.Event) -> None:
+        """Work until stop is set, polling when the queue is empty; pending
+        webhooks are delivered before it returns"""
+
+        try:
+            while not stop.is_set():
+                try:
+                    worked = self.run_once()
+                except Exception as e:
+                    logger.exception("Job worker %s error: %s", self.worker_id, e)
+                    worked = False
+                if not worked:
+                    stop.wait(self.poll_interval)
+        finally:
+            self.close()
+
+    def run_once(self) -> bool:
+        """Claim and run one job; False if none was due"""
+
+        for lost in self.queue.expire():
+            JOB_OUTCOMES.inc(outcome="failed")
+            self._notify(lost, {"job_id": lost["job_id"], "status": "failed", "error": lost["error"]})
+
+        job = self.queue.claim(self.worker_id)
+        if job is None:
+            return False
+
+        job_id = job["job_id"]
+        stop_renewing = threading.Event()
+        renewer = threading.Thread(target=self._renew_lease, args=(job_id, stop_renewing), daemon=True)
+        renewer.start()
+        try:
+            workflow = self._generate(job["request"])
+        except Exception as e:
+            self._failed(job, f"{type(e).__name__}: {e}", retryable=is_outage(e) or is_throttle(e))
+            return True
+        finally:
+            stop_renewing.set()
+            renewer.join()
+
+        if workflow.metadata.get("fallback") and job["attempts"] < self.queue.max_attempts:
+            self._failed(job, "Bedrock unavailable", retryable=True)
+            return True
+
+        result = workflow.model_dump(mode="json")
+        self.queue.complete(job_id, self.worker_id, result)
+        JOB_OUTCOMES.inc(outcome="completed")
+        self._notify(job, {"job_id": job_id, "status": "completed", "result": result})
+        return True
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds to wait before retry number attempts: full jitter over a doubling cap"""
+
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)))
+
+    def _generate(self, request: dict):
+        session = SessionTimeline.model_validate(request["session"])
+        if not request.get("use_ai", True):
+            return self.generator.generate_from_events_only(session)
+        if request.get("hybrid"):
+            return self.generator.generate_hybrid(session)
+        budget = request.get("budget")
+        return self.generator.generate_from_session(session, RoutingBudget(**budget) if budget else None)
+
+    def _failed(self, job: dict, error: str, retryable: bool) -> None:
+        if retryable and job["attempts"] < self.queue.max_attempts:
+            delay = self.backoff(job["attempts"])
+            logger.info("Job %s attempt %d failed (%s); retrying in %.1fs", job["job_id"], job["attempts"], error, delay)
+            self.queue.retry(job["job_id"], self.worker_id, error, delay)
+            JOB_OUTCOMES.inc(outcome="retried")
+            return
+        self.queue.fail(job["job_id"], self.worker_id, error)
+        JOB_OUTCOMES.inc(outcome="failed")
+        self._notify(job, {"job_id": job["job_id"], "status": "failed", "error": error})
+
+    def _renew_lease(self, job_id: str, stop: threading.Event) -> None:
+        while not stop.wait(self.queue.lease_seconds / 3):
+            self.queue.renew(job_id, self.worker_id)
+
+    def close(self) -> None:
+        """Wait for webhook deliveries in progress, then release the HTTP client"""
+        self._webhooks.shutdown(wait=True)
+        self._http.close()
+
+    def _notify(self, job: dict, payload: dict) -> None:
+        if job["webhook_url"]:
+            self._webhooks.submit(self._deliver, job["job_id"], job["webhook_url"], payload)
+
+    def _deliver(self, job_id: str, url: str, payload: dict) -> None:
+        """POST payload to the webhook, retrying server errors with backoff"""
+
+        # Checked again at delivery, and the connection goes to the address checked
+        try:
+            address = check_webhook_url(url)
+        except ValueError as e:
+            logger.warning("Not calling webhook for job %s: %s", job_id, e)
+            WEBHOOK_DELIVERIES.inc(outcome="rejected")
+            return
+        for attempt in range(3):
+            try:
+                response = self._http.send(pinned_request(self._http, url, address, payload))
+                if response.status_code < 500:
+                    WEBHOOK_DELIVERIES.inc(outcome="delivered")
+                    return
+            except httpx.HTTPError as e:
+                logger.warning("Webhook for job %s failed: %s", job_id, e)
+            time.sleep(2 ** attempt)
+        logger.warning("Giving up on webhook for job %s", job_id)
+        WEBHOOK_DELIVERIES.inc(outcome="failed")
+
+
+def build_job_queue() -> JobQueue:
+    """Job queue from JOB_QUEUE_PATH / JOB_LEASE_SECONDS / JOB_MAX_ATTEMPTS"""
+
+    return JobQueue(
+        os.getenv("JOB_QUEUE_PATH", DEFAULT_QUEUE_PATH),
+        lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "120")),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "5")),
+    )
+
+
+def run_worker_process() -> None:
+    """Entry point of a worker process: work until SIGTERM or SIGINT"""
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    queue = build_job_queue()
+    generator = build_workflow_generator()
+    # Probes count failures against this process's breaker like the API's prober does
+    prober = build_prober(generator.bedrock, generator.circuit_breaker)
+    threading.Thread(
+        target=prober.watch,
+        args=(stop, float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "15"))),
+        daemon=True
+    ).start()
+    try:
+        JobWorker(queue, generator).run(stop)
+    finally:
+        generator.close()
+        queue.close()
+
+
+class WorkerPool:
+    """Worker processes, each with its own generator and Bedrock connections"""
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: list = []
+
+    def start(self) -> None:
+        for _ in range(self.processes):
+            process = self._context.Process(target=run_worker_process, daemon=True)
+            process.start()
+            self._workers.append(process)
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Ask workers to finish their current job; anything cut short is resumed from its lease"""
+
+        for process in self._workers:
+            process.terminate()
+        for process in self._workers:
+            process.join(timeout)
+        self._workers.clear()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Workflow generation job workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    pool = WorkerPool(args.workers)
+    pool.start()
+    logger.info("Started %d job workers on %s", args.workers, os.getenv("JOB_QUEUE_PATH", DEFAULT_QUEUE_PATH))
+    while not stop.wait(1.0):
+        pass
+    pool.stop()
@@ -0,0 +1,205 @@
+import json
+from typing import Optional
+
+
+# Python literals models sometimes write in place of JSON ones
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+# Opening brackets tried before giving up on an output (prose may contain braces)
+MAX_CANDIDATES = 8
+
+
+class JSONExtraction:
+    """Outcome of reading a JSON object out of model output.
+
+    value is None when nothing usable was found. truncated means the output
+    stopped before the object closed; value then holds every element that
+    was complete. repairs names the defects that were fixed on the way.
+    """
+
+    def __init__(self, value: Optional[dict], truncated: bool, repairs: list[str], error: Optional[str] = None):
+        self.value = value
+        self.truncated = truncated
+        self.repairs = repairs
+        self.error = error
+
+
+def scan_json(text: str, max_open_depth: int = 2) -> JSONExtraction:
+    """Find and parse the JSON object in model output: code fences and
+    surrounding prose are ignored, common defects repaired, and a truncated
+    object is cut back to its last complete element.
+
+    Only containers up to max_open_depth deep may be left half-written when
+    cutting (for a workflow: the top-level object and its steps list), so a
+    step that was still being written is dropped rather than half-kept.
+    """
+
+    fence = text.find("```json")
+    offset = fence + 7 if fence != -1 else 0
+
+    failure = JSONExtraction(None, False, [], "No JSON object in model output")
+    start = text.find("{", offset)
+    for candidate in range(MAX_CANDIDATES):
+        if start == -1:
+            break
+        scanned, end = _scan(text, start, max_open_depth)
+        if scanned.value is not None:
+            return scanned
+        if candidate == 0 or scanned.truncated:
+            failure = scanned
+        # Braces inside a candidate that failed are part of it, not new candidates
+        start = text.find("{", end)
+    return failure
+
+
+def extract_json(text: str) -> dict:
+    """The JSON object in model output; raises ValueError when there is none"""
+
+    extraction = scan_json(text)
+    if extraction.value is None:
+        raise ValueError(extraction.error)
+    return extraction.value
+
+
+def _scan(text: str, start: int, max_open_depth: int) -> tuple[JSONExtraction, int]:
+    """Parse the object opening at start; also returns where scanning stopped"""
+
+    out = []
+    stack = []
+    repairs = set()
+    cut = None
+    n = len(text)
+    index = start
+
+    while index < n:
+        char = text[index]
+
+        if char == '"':
+            end = _string_end(text, index)
+            if end == -1:
+                break
+            if out and _ends_value(out[-1]):
+                out.append(",")
+                repairs.add("missing comma")
+            out.append(text[index:end])
+            index = end
+            continue
+
+        if char in "{[":
+            if out and _ends_value(out[-1]):
+                out.append(",")
+                repairs.add("missing comma")
+            stack.append(char)
+            out.append(char)
+        elif char in "}]":
+            expected = "}" if stack[-1] == "{" else "]"
+            if char != expected:
+                repairs.add("mismatched bracket")
+            if out[-1] == ",":
+                out.pop()
+                repairs.add("trailing comma")
+            stack.pop()
+            out.append(expected)
+            if not stack:
+                return _parse("".join(out), repairs, truncated=False), index + 1
+            if len(stack) <= max_open_depth:
+                cut = (len(out), tuple(stack))
+        elif char == ",":
+            if out[-1] in "{[,":
+                repairs.add("stray comma")
+            else:
+                if len(stack) <= max_open_depth:
+                    cut = (len(out), tuple(stack))
+                out.append(char)
+        elif char == "/" and text.startswith("//", index):
+            end = text.find("\n", index)
+            index = n if end == -1 else end
+            repairs.add("comment")
+            continue
+        elif char == "/" and text.startswith("/*", index):
+            end = text.find("*/", index + 2)
+            index = n if end == -1 else end + 2
+            repairs.add("comment")
+            continue
+        elif char.isdigit() or char == "-":
+            end = index + 1
+            while end < n and (text[end].isdigit() or text[end] in ".eE+-"):
+                end += 1
+            if out and _ends_value(out[-1]):
+                out.append(",")
+                repairs.add("missing comma")
+            out.append(text[index:end])
+            index = end
+            continue
+        elif char.isalpha() or char == "_":
+            end = index + 1
+            while end < n and (text[end].isalnum() or text[end] == "_"):
+                end += 1
+            word = text[index:end]
+            if out and _ends_value(out[-1]):
+                out.append(",")
+                repairs.add("missing comma")
+            if _next_char(text, end) == ":" and stack and stack[-1] == "{":
+                word = json.dumps(word)
+                repairs.add("unquoted key")
+            elif word in _LITERALS:
+                word = _LITERALS[word]
+                repairs.add("python literal")
+            out.append(word)
+            index = end
+            continue
+        elif not char.isspace():
+            out.append(char)
+        index += 1
+
+    # The output ended with the object still open
+    if cut is None:
+        return JSONExtraction(None, True, sorted(repairs), "Model output ended before any complete element"), n
+    length, open_brackets = cut
+    closers = "".join("}" if bracket == "{" else "]" for bracket in reversed(open_brackets))
+    return _parse("".join(out[:length]) + closers, repairs, truncated=True), n
+
+
+def _parse(cleaned: str, repairs: set, truncated: bool) -> JSONExtraction:
+    try:
+        value = json.loads(cleaned)
+    except json.JSONDecodeError:
+        try:
+            value = json.loads(cleaned, strict=False)
+            repairs.add("control characters in strings")
+        except json.JSONDecodeError as e:
+            return JSONExtraction(None, truncated, sorted(repairs), str(e))
+    if not isinstance(value, dict):
+        return JSONExtraction(None, truncated, sorted(repairs), "Model output JSON is not an object")
+    return JSONExtraction(value, truncated, sorted(repairs))
+
+
+def _string_end(text: str, start: int) -> int:
+    """Index just past the closing quote of the string opening at start, or -1"""
+
+    index = start + 1
+    while True:
+        quote = text.find('"', index)
+        if quote == -1:
+            return -1
+        backslashes = 0
+        while text[quote - 1 - backslashes] == "\\":
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return quote + 1
+        index = quote + 1
+
+
+def _ends_value(token: str) -> bool:
+    """Whether a value may have just ended, so another value needs a comma first"""
+    return (
+        token in ("}", "]", "true", "false", "null")
+        or (len(token) > 1 and token[0] == '"')
+        or token[-1].isdigit()
+    )
+
+
+def _next_char(text: str, index: int) -> str:
+    while index < len(text) and text[index].isspace():
+        index += 1
+    return text[index] if index < len(text) else ""
@@ -0,0 +1,277 @@
+import re
+from typing import Any, Optional
+
+from pydantic import BaseModel, Field
+
+from src.core.converters import make_step
+from src.models.workflow import ActionType, WorkflowStep
+
+
+class LoopDetectionConfig(BaseModel):
+    """How aggressively repeated step sequences are folded into LOOP steps"""
+    min_iterations: int = Field(3, description="Fewest back-to-back repeats that make a loop")
+    max_period: int = Field(50, description="Longest loop body, in steps")
+
+
+# Parameter values that identify what a step does rather than what it acts on
+STRUCTURAL_PARAMETERS = ("key", "modifiers", "button")
+
+_HASH_MODULUS = (1 << 61) - 1
+_HASH_BASE = 1_000_003
+
+
+class LoopFolder:
+    """Folds back-to-back repeats of a step sequence into LOOP steps.
+
+    Steps are reduced to signatures (action, selector kind, parameter shape
+    and structural values such as keys), so iterations that differ only in
+    coordinates, typed text or URLs still match. Tandem repeats are found
+    with rolling hashes over the signature sequence, only trying periods at
+    which the current signature recurs, which keeps the scan near-linear.
+    Whatever differs between iterations becomes a per-iteration variable.
+    """
+
+    def __init__(self, config: Optional[LoopDetectionConfig] = None):
+        self.config = config or LoopDetectionConfig()
+        self.loops = 0
+        self.folded_steps = 0
+
+    def fold(self, steps: list[WorkflowStep], variables: dict) -> list[WorkflowStep]:
+        """Return the steps with repeats folded, adding loop item lists to variables"""
+
+        tokens = _intern([_signature(step) for step in steps])
+        n = len(tokens)
+        prefix, powers = _prefix_hashes(tokens)
+        max_period = self.config.max_period
+        min_iterations = self.config.min_iterations
+
+        next_same = [-1] * n
+        last_seen = {}
+        for index in range(n - 1, -1, -1):
+            next_same[index] = last_seen.get(tokens[index], -1)
+            last_seen[tokens[index]] = index
+
+        folded = []
+        index = 0
+        while index < n:
+            best = None
+            candidate = next_same[index]
+            while candidate != -1 and candidate - index <= max_period:
+                period = candidate - index
+                power = powers[period]
+                first = (prefix[candidate] - prefix[index] * power) % _HASH_MODULUS
+                iterations = 1
+                start = candidate
+                end = candidate + period
+                # Cheap last-token check first; equal hashes are confirmed by comparing tokens
+                while (end <= n
+                       and tokens[end - 1] == tokens[candidate - 1]
+                       and (prefix[end] - prefix[start] * power) % _HASH_MODULUS == first
+                       and tokens[index:candidate] == tokens[start:end]):
+                    iterations += 1
+                    start = end
+                    end += period
+                if iterations >= min_iterations and (best is None or period * iterations > best[0] * best[1]):
+                    best = (period, iterations)
+                candidate = next_same[candidate]
+
+            if best is None:
+                folded.append(steps[index])
+                index += 1
+                continue
+
+            period, iterations = best
+            folded.append(self._loop(steps[index:index + period * iterations], period, iterations, variables))
+            index += period * iterations
+
+        return _renumber(folded)
+
+    def stats(self) -> dict:
+        return {"loops": self.loops, "folded_steps": self.folded_steps}
+
+    def _loop(self, steps: list[WorkflowStep], period: int, iterations: int, variables: dict) -> WorkflowStep:
+        self.loops += 1
+        self.folded_steps += len(steps)
+        items_name = f"loop_{self.loops}"
+
+        items = [{} for _ in range(iterations)]
+        body = []
+        for position in range(period):
+            occurrences = [steps[i * period + position] for i in range(iterations)]
+            leaves = [dict(_leaves(step)) for step in occurrences]
+
+            template = occurrences[0].model_dump(mode="json")
+            template["step_id"] = f"{items_name}_step_{position + 1}"
+            replacements = []
+            used = set()
+            for path, value in leaves[0].items():
+                values = [leaf[path] for leaf in leaves]
+                if all(v == value for v in values):
+                    continue
+                name = _variable_name(position, path, used)
+                placeholder = "{{item." + name + "}}"
+                _set_path(template, path, placeholder)
+                if isinstance(value, (str, int, float)) and len(str(value)) > 1:
+                    replacements.append((str(value), placeholder))
+                for item, v in zip(items, values):
+                    item[name] = v
+
+            descriptions = [step.description for step in occurrences]
+            if any(description != descriptions[0] for description in descriptions):
+                description = _description_template(descriptions[0], replacements)
+                # Kept only if it gives back every iteration's own description
+                if any(_fill(description, item) != text for item, text in zip(items, descriptions)):
+                    name = _variable_name(position, ("description",), used)
+                    description = "{{item." + name + "}}"
+                    for item, text in zip(items, descriptions):
+                        item[name] = text
+                template["description"] = description
+            body.append(template)
+
+        parameters = {"iterations": iterations, "steps": body}
+        if items[0]:
+            variables[items_name] = items
+            parameters["items"] = items_name
+
+        summary = ", ".join(step["description"] for step in body[:3])
+        return make_step(0, ActionType.LOOP, f"Repeat {iterations} times: {summary}", parameters=parameters)
+
+
+def expand_loops(steps: list[WorkflowStep], variables: dict) -> list[WorkflowStep]:
+    """Inverse of LoopFolder.fold: one flat step per iteration, placeholders filled in"""
+
+    expanded = []
+    for step in steps:
+        if step.action != ActionType.LOOP:
+            expanded.append(step)
+            continue
+        items = variables.get(step.parameters.get("items"), [{}] * step.parameters["iterations"])
+        for item in items:
+            for template in step.parameters["steps"]:
+                expanded.append(WorkflowStep.model_validate(_fill(template, item)))
+    return _renumber(expanded)
+
+
+def _signature(step: WorkflowStep) -> tuple:
+    selector = step.selector
+    selector_key = None
+    if selector is not None:
+        value = selector.value
+        if isinstance(value, dict):
+            selector_key = (selector.type, _shape(value))
+        else:
+            selector_key = (selector.type, value if isinstance(value, str) else None)
+
+    parameters = step.parameters
+    structural = []
+    for name in STRUCTURAL_PARAMETERS:
+        if name in parameters:
+            value = parameters[name]
+            structural.append(_freeze(value))
+    return (
+        step.action, selector_key, _shape(parameters), tuple(structural),
+        step.wait_after, step.retry_count, step.on_failure
+    )
+
+
+def _shape(value: dict) -> tuple:
+    """Nested key structure of a dict, ignoring the values"""
+    shape = []
+    for key, item in value.items():
+        shape.append((key, _shape(item) if isinstance(item, dict) else None))
+    shape.sort()
+    return tuple(shape)
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def _intern(signatures: list[tuple]) -> list[int]:
+    ids = {}
+    return [ids.setdefault(signature, len(ids) + 1) for signature in signatures]
+
+
+def _prefix_hashes(tokens: list[int]) -> tuple[list[int], list[int]]:
+    prefix = [0] * (len(tokens) + 1)
+    powers = [1] * (len(tokens) + 1)
+    for index, token in enumerate(tokens):
+        prefix[index + 1] = (prefix[index] * _HASH_BASE + token) % _HASH_MODULUS
+        powers[index + 1] = (powers[index] * _HASH_BASE) % _HASH_MODULUS
+    return prefix, powers
+
+
+def _leaves(step: WorkflowStep):
+    """(path, value) for every field that may differ between loop iterations"""
+
+    if step.selector is not None:
+        value = step.selector.value
+        if isinstance(value, dict):
+            yield from _dict_leaves(("selector", "value"), value)
+        else:
+            yield ("selector", "value"), value
+    yield from _dict_leaves(("parameters",), step.parameters)
+    yield ("screenshot_before",), step.screenshot_before
+    yield ("screenshot_after",), step.screenshot_after
+
+
+def _dict_leaves(prefix: tuple, value: dict):
+    for key, item in value.items():
+        if isinstance(item, dict):
+            yield from _dict_leaves(prefix + (key,), item)
+        else:
+            yield prefix + (key,), item
+
+
+def _variable_name(position: int, path: tuple, used: set) -> str:
+    name = f"step{position + 1}_{path[-1]}"
+    if name in used:
+        name = f"step{position + 1}_{'_'.join(path)}"
+    used.add(name)
+    return name
+
+
+def _description_template(description: str, replacements: list[tuple[str, str]]) -> str:
+    """The description with each per-iteration value, where it appears as a
+    whole token, replaced by its placeholder (longest values first)"""
+
+    for text, placeholder in sorted(replacements, key=lambda r: -len(r[0])):
+        pattern = r"(?<!\w)" + re.escape(text) + r"(?!\w)"
+        description = re.sub(pattern, lambda _: placeholder, description)
+    return description
+
+
+def _set_path(target: dict, path: tuple, value: Any) -> None:
+    for key in path[:-1]:
+        target = target[key]
+    target[path[-1]] = value
+
+
+def _fill(template: Any, item: dict) -> Any:
+    """Substitute {{item.name}} placeholders; a placeholder that is the whole value keeps the item's type"""
+
+    if isinstance(template, dict):
+        return {key: _fill(value, item) for key, value in template.items()}
+    if isinstance(template, list):
+        return [_fill(value, item) for value in template]
+    if isinstance(template, str) and "{{item." in template:
+        for name, value in item.items():
+            placeholder = "{{item." + name + "}}"
+            if template == placeholder:
+                return value
+            template = template.replace(placeholder, str(value))
+    return template
+
+
+def _renumber(steps: list[WorkflowStep]) -> list[WorkflowStep]:
+    renumbered = []
+    for number, step in enumerate(steps, start=1):
+        step_id = f"step_{number}"
+        if step.step_id != step_id:
+            step = step.model_copy(update={"step_id": step_id})
+        renumbered.append(step)
+    return renumbered
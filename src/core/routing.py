@@ -0,0 +1,202 @@
+import json
+import os
+import statistics
+import threading
+from collections import deque
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from src.services.async_bedrock_client import AsyncBedrockClient
+from src.services.bedrock_client import BedrockClient, WORKFLOW_INFERENCE_CONFIG
+from src.services.metrics import MODEL_ESCALATIONS, MODEL_ROUTES
+from src.services.session_encoder import encode_session, estimate_tokens
+
+
+class ModelTier(BaseModel):
+    """A model the router may send workflow generation to, and what it can handle"""
+    model_id: str
+    max_events: Optional[int] = Field(None, description="Largest session, in events, it handles well; None: any")
+    max_prompt_tokens: Optional[int] = Field(None, description="Largest prompt it handles well; None: any")
+    vision: bool = Field(True, description="Whether it accepts screenshots")
+    input_price: float = Field(..., description="USD per 1,000 input tokens")
+    output_price: float = Field(..., description="USD per 1,000 output tokens")
+    expected_latency_seconds: float = Field(..., description="Latency assumed until enough calls are observed")
+
+
+class RoutingBudget(BaseModel):
+    """Per-request limits the chosen model should fit within"""
+    latency_seconds: Optional[float] = Field(None, description="Median latency the model may have")
+    cost_usd: Optional[float] = Field(None, description="Estimated spend the first attempt may have")
+
+
+# Smallest first. Nova Micro reads text only; the size limits are where quality was seen to hold.
+DEFAULT_TIERS = [
+    ModelTier(
+        model_id="amazon.nova-micro-v1:0", max_events=40, max_prompt_tokens=6000, vision=False,
+        input_price=0.000035, output_price=0.00014, expected_latency_seconds=3.0
+    ),
+    ModelTier(
+        model_id="amazon.nova-lite-v1:0", max_events=150, max_prompt_tokens=30000,
+        input_price=0.00006, output_price=0.00024, expected_latency_seconds=8.0
+    ),
+    ModelTier(
+        model_id="amazon.nova-pro-v1:0",
+        input_price=0.0008, output_price=0.0032, expected_latency_seconds=30.0
+    ),
+]
+
+# Observed latencies stand in for the prior once a model has this many calls
+MIN_LATENCY_SAMPLES = 5
+
+# Output tokens assumed per step when estimating cost before the call
+TOKENS_PER_STEP = 60
+
+
+class _ModelStats:
+    def __init__(self, window: int):
+        self.requests = 0
+        self.successes = 0
+        self.validation_failures = 0
+        self.errors = 0
+        self.escalations = 0
+        self.cache_hits = 0
+        self.cost_usd = 0.0
+        self.latencies: deque = deque(maxlen=window)
+
+
+class ModelRouter:
+    """Picks the model for each workflow generation.
+
+    Tiers are tried smallest first: the first that can take the session
+    (event count, estimated prompt tokens, screenshots) and fits the
+    request's budget answers it. Output that does not validate as a
+    WorkflowDefinition escalates to the next larger capable tier. When no
+    tier fits the budget, the smallest capable one is used anyway.
+    """
+
+    def __init__(self, tiers: Optional[list[ModelTier]] = None, latency_window: int = 200):
+        self.tiers = tiers or DEFAULT_TIERS
+        self._stats = {tier.model_id: _ModelStats(latency_window) for tier in self.tiers}
+        self._clients: dict[str, tuple[BedrockClient, AsyncBedrockClient]] = {}
+        self.prompt_encoding = "compact"
+        self._lock = threading.Lock()
+
+    def bind(self, bedrock: BedrockClient, async_bedrock: AsyncBedrockClient) -> None:
+        """Create a client pair per tier sharing the given clients' settings, connection
+        pools and concurrency limit"""
+
+        self.prompt_encoding = bedrock.prompt_encoding
+        for tier in self.tiers:
+            if tier.model_id == bedrock.model_id:
+                self._clients[tier.model_id] = (bedrock, async_bedrock)
+                continue
+            self._clients[tier.model_id] = (bedrock.for_model(tier.model_id), async_bedrock.for_model(tier.model_id))
+
+    def clients(self, model_id: str) -> tuple[BedrockClient, AsyncBedrockClient]:
+        return self._clients[model_id]
+
+    def plan(
+        self,
+        session_dict: dict,
+        screenshots: list[str],
+        budget: Optional[RoutingBudget] = None,
+        prompt_tokens: Optional[int] = None
+    ) -> list[ModelTier]:
+        """Tiers to try in order: the chosen model, then the larger ones to escalate to"""
+
+        n_events = len(session_dict.get("events", []))
+        if prompt_tokens is None:
+            prompt_tokens = self.prompt_tokens(session_dict)
+        capable = [
+            tier for tier in self.tiers
+            if (tier.max_events is None or n_events <= tier.max_events)
+            and (tier.max_prompt_tokens is None or prompt_tokens <= tier.max_prompt_tokens)
+            and (tier.vision or not screenshots)
+        ]
+        if not capable:
+            capable = self.tiers[-1:]
+        if budget is None:
+            return capable
+
+        for index, tier in enumerate(capable):
+            if budget.latency_seconds is not None and self.median_latency(tier) > budget.latency_seconds:
+                continue
+            if budget.cost_usd is not None and self.estimate_cost(tier, prompt_tokens, n_events) > budget.cost_usd:
+                continue
+            return capable[index:]
+        return capable
+
+    def prompt_tokens(self, session_dict: dict) -> int:
+        return estimate_tokens(encode_session(session_dict, self.prompt_encoding))
+
+    def estimate_cost(self, tier: ModelTier, prompt_tokens: int, n_events: int) -> float:
+        output_tokens = min(WORKFLOW_INFERENCE_CONFIG["maxTokens"], TOKENS_PER_STEP * max(1, n_events))
+        return prompt_tokens / 1000 * tier.input_price + output_tokens / 1000 * tier.output_price
+
+    def median_latency(self, tier: ModelTier) -> float:
+        stats = self._stats[tier.model_id]
+        with self._lock:
+            latencies = list(stats.latencies)
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return tier.expected_latency_seconds
+        return statistics.median(latencies)
+
+    def record(self, tier: ModelTier, outcome: str, latency: float, input_tokens: int = 0, output_tokens: int = 0) -> None:
+        """Record one attempt: outcome is success, invalid (output failed validation) or error"""
+
+        cost = input_tokens / 1000 * tier.input_price + output_tokens / 1000 * tier.output_price
+        stats = self._stats[tier.model_id]
+        with self._lock:
+            stats.requests += 1
+            stats.cost_usd += cost
+            stats.latencies.append(latency)
+            if outcome == "success":
+                stats.successes += 1
+            elif outcome == "invalid":
+                stats.validation_failures += 1
+            else:
+                stats.errors += 1
+        MODEL_ROUTES.inc(model=tier.model_id, outcome=outcome)
+
+    def record_cache_hit(self, tier: ModelTier) -> None:
+        """Count a request the tier's response cache answered. Kept apart from
+        record so replayed output does not pull down latency or add cost."""
+        with self._lock:
+            self._stats[tier.model_id].cache_hits += 1
+        MODEL_ROUTES.inc(model=tier.model_id, outcome="cache_hit")
+
+    def record_escalation(self, tier: ModelTier) -> None:
+        with self._lock:
+            self._stats[tier.model_id].escalations += 1
+        MODEL_ESCALATIONS.inc(model=tier.model_id)
+
+    def stats(self) -> dict:
+        result = {}
+        for tier in self.tiers:
+            stats = self._stats[tier.model_id]
+            with self._lock:
+                latencies = sorted(stats.latencies)
+                result[tier.model_id] = {
+                    "requests": stats.requests,
+                    "successes": stats.successes,
+                    "validation_failures": stats.validation_failures,
+                    "errors": stats.errors,
+                    "escalations": stats.escalations,
+                    "cache_hits": stats.cache_hits,
+                    "success_rate": stats.successes / stats.requests if stats.requests else None,
+                    "p50_latency_seconds": statistics.median(latencies) if latencies else None,
+                    "p95_latency_seconds": latencies[int(len(latencies) * 0.95)] if latencies else None,
+                    "estimated_cost_usd": round(stats.cost_usd, 6),
+                }
+        return result
+
+
+def build_model_router() -> Optional[ModelRouter]:
+    """Router from MODEL_ROUTING (off unless 1/true/yes); MODEL_TIERS may hold a
+    JSON list of ModelTier objects, smallest first, to replace DEFAULT_TIERS"""
+
+    if os.getenv("MODEL_ROUTING", "false").lower() not in ("1", "true", "yes"):
+        return None
+    tiers = os.getenv("MODEL_TIERS")
+    return ModelRouter([ModelTier(**tier) for tier in json.loads(tiers)] if tiers else None)
@@ -0,0 +1,113 @@
+import base64
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from PIL import Image
+
+from src.core.image_hash import dhash, hamming_distance
+from src.models.events import EventLog, EventType, SessionTimeline
+from src.services.metrics import STAGE_ERRORS
+from src.services.screenshot_store import ScreenshotStore
+
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Approximate vision tokens for an image, roughly one token per 750 pixels"""
+    return max(1, (width * height) // 750)
+
+
+def screenshot_keys(events: Iterable[EventLog]) -> list[str]:
+    """Screenshot keys referenced by a session, in first-seen order"""
+
+    keys = {}
+    for event in events:
+        if event.event_type == EventType.SCREENSHOT.value:
+            keys.setdefault(event.data.s3_key, None)
+        if event.screenshot_ref:
+            keys.setdefault(event.screenshot_ref, None)
+    return list(keys)
+
+
+class ScreenshotPipeline:
+    """Turns a session's screenshot references into a few prompt-ready images.
+
+    Frames are fetched concurrently from the store and downscaled to
+    image_token_budget as they are decoded. Near-duplicates (by dHash
+    distance to an already kept frame) are dropped as results arrive, at
+    most max_images are kept, spread evenly over the session, and each
+    survivor is re-encoded as base64 PNG.
+    """
+
+    def __init__(
+        self,
+        store: ScreenshotStore,
+        max_images: int = 6,
+        image_token_budget: int = 1200,
+        duplicate_distance: int = 6,
+        max_workers: int = 16
+    ):
+        self.store = store
+        self.max_images = max_images
+        self.image_token_budget = image_token_budget
+        self.duplicate_distance = duplicate_distance
+        self.max_workers = max_workers
+
+    def collect(self, session: SessionTimeline) -> list[str]:
+        keys = screenshot_keys(session.events)
+        if not keys or self.max_images <= 0:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(keys))) as pool:
+            kept = []
+            for frame in pool.map(self._load, keys):
+                if frame is None:
+                    continue
+                fingerprint = frame[1]
+                if any(hamming_distance(fingerprint, other) <= self.duplicate_distance for _, other in kept):
+                    continue
+                kept.append(frame)
+
+            frames = self._spread([image for image, _ in kept])
+            return list(pool.map(self._encode, frames))
+
+    def _load(self, key: str) -> Optional[tuple[Image.Image, int]]:
+        """A frame downscaled to the token budget, and its dHash; None if it cannot be read"""
+        try:
+            image = Image.open(io.BytesIO(self.store.get(key)))
+            size = self._target_size(*image.size)
+            # JPEG frames decode straight to a reduced scale instead of full resolution
+            image.draft("RGB", size)
+            image = image.convert("RGB")
+            if image.size != size:
+                image = image.resize(size, Image.Resampling.LANCZOS)
+        except Exception as e:
+            STAGE_ERRORS.inc(stage="screenshot_load", error=type(e).__name__)
+            logger.warning("Skipping screenshot %s: %s", key, e)
+            return None
+        return image, dhash(image)
+
+    def _target_size(self, width: int, height: int) -> tuple[int, int]:
+        tokens = estimate_image_tokens(width, height)
+        if tokens <= self.image_token_budget:
+            return width, height
+        scale = (self.image_token_budget / tokens) ** 0.5
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def _spread(self, frames: list) -> list:
+        """Keep at most max_images frames, evenly spaced and including the first and last"""
+
+        if len(frames) <= self.max_images:
+            return frames
+        if self.max_images == 1:
+            return frames[:1]
+        step = (len(frames) - 1) / (self.max_images - 1)
+        return [frames[round(i * step)] for i in range(self.max_images)]
+
+    def _encode(self, image: Image.Image) -> str:
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
@@ -0,0 +1,196 @@
+import asyncio
+import fcntl
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from src.services.metrics import COALESCED_REQUESTS
+
+
+T = TypeVar("T")
+
+
+class FileLockCoordinator:
+    """Serializes identical calls across worker processes with flock()ed lock files.
+
+    Each key gets its own lock file, so unrelated calls never wait on each
+    other, and the holder deletes it on release, so the directory only holds
+    keys in flight. A worker that waited on the lock finds the leader's
+    result in the shared response cache (the SQLite tier) instead of calling
+    the model again.
+    """
+
+    def __init__(self, directory: str, poll_interval: float = 0.02, max_poll_interval: float = 0.25):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        os.makedirs(directory, exist_ok=True)
+
+    def acquire(self, key: str):
+        """Block until this process holds the key's lock"""
+
+        while True:
+            handle = self._lock(key, fcntl.LOCK_EX)
+            if handle is not None:
+                return handle
+
+    def try_acquire(self, key: str):
+        """The key's lock if no other holder has it, else None"""
+
+        while True:
+            try:
+                handle = self._lock(key, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            if handle is not None:
+                return handle
+
+    async def acquire_async(self, key: str):
+        """Wait for the key's lock by polling, so no executor thread is parked
+        while another worker holds it"""
+
+        delay = self.poll_interval
+        while True:
+            handle = self.try_acquire(key)
+            if handle is not None:
+                return handle
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll_interval)
+
+    def release(self, handle) -> None:
+        try:
+            # Unlinked while still locked: a waiter that then gets this lock sees a stale file and retries
+            os.unlink(handle.name)
+        except FileNotFoundError:
+            pass
+        finally:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            finally:
+                handle.close()
+
+    @contextmanager
+    def hold(self, key: str):
+        handle = self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release(handle)
+
+    def _lock(self, key: str, operation: int):
+        """Locked handle on the key's current lock file; None if the file was
+        removed by its previous holder while this one waited"""
+
+        # Stable across processes, unlike hash()
+        path = os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + ".lock")
+        handle = open(path, "a+")
+        try:
+            fcntl.flock(handle, operation)
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                current = None
+            opened = os.fstat(handle.fileno())
+            if current is not None and (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino):
+                return handle
+        except BaseException:
+            handle.close()
+            raise
+        handle.close()
+        return None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait and receive the same result or exception. Nothing is
+    remembered once the call completes - repeat requests are the response
+    cache's job.
+    """
+
+    def __init__(self, coordinator: Optional[FileLockCoordinator] = None):
+        self.coordinator = coordinator
+        self.leaders = 0
+        self.followers = 0
+        self._calls: dict[str, _Call] = {}
+        self._async_calls: dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+                COALESCED_REQUESTS.inc()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.coordinator is not None:
+                with self.coordinator.hold(key):
+                    call.result = func()
+            else:
+                call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        task = self._async_calls.get(key)
+        if task is not None:
+            self.followers += 1
+            COALESCED_REQUESTS.inc()
+        else:
+            task = asyncio.ensure_future(self._lead_async(key, func))
+            self._async_calls[key] = task
+            self.leaders += 1
+            # Retrieve the error if every caller was cancelled before it finished
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        # Shielded so a cancelled caller, the first one included, does not cancel the shared call
+        return await asyncio.shield(task)
+
+    async def _lead_async(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        try:
+            if self.coordinator is None:
+                return await func()
+            handle = await self.coordinator.acquire_async(key)
+            try:
+                return await func()
+            finally:
+                self.coordinator.release(handle)
+        finally:
+            del self._async_calls[key]
+
+    def stats(self) -> dict:
+        total = self.leaders + self.followers
+        return {
+            "calls": self.leaders,
+            "coalesced": self.followers,
+            "coalesced_rate": self.followers / total if total else 0.0,
+            "in_flight": len(self._calls) + len(self._async_calls),
+            "cross_worker": self.coordinator is not None,
+        }
+
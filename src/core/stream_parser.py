@@ -0,0 +1,77 @@
+import json
+from typing import Optional
+
+
+class IncrementalStepParser:
+    """Scans workflow JSON as it is generated and emits each step once its object closes.
+
+    Text is fed in arbitrary fragments. The parser tracks string/escape state and
+    bracket nesting, so it never has to re-scan earlier output; only the text of the
+    step currently being written is buffered.
+    """
+
+    def __init__(self):
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_chars: list[str] = []
+        self._last_key: Optional[str] = None
+        self._steps_depth: Optional[int] = None
+        self._step_chars: Optional[list[str]] = None
+        self.steps_emitted = 0
+
+    def feed(self, text: str) -> list[dict]:
+        """Consume a fragment of model output and return the steps completed by it"""
+
+        completed = []
+
+        for char in text:
+            if self._step_chars is not None:
+                self._step_chars.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_key = "".join(self._string_chars)
+                else:
+                    self._string_chars.append(char)
+                continue
+
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._string_chars = []
+            elif char in "{[":
+                if not self._stack and char == "[":
+                    # Only the top-level workflow object is tracked
+                    continue
+                if char == "[" and len(self._stack) == 1 and self._last_key == "steps":
+                    self._steps_depth = 2
+                elif char == "{" and self._steps_depth is not None and len(self._stack) == self._steps_depth:
+                    self._step_chars = ["{"]
+                self._stack.append(char)
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                if self._step_chars is not None and len(self._stack) == self._steps_depth:
+                    step = self._close_step()
+                    if step is not None:
+                        completed.append(step)
+                elif char == "]" and self._steps_depth is not None and len(self._stack) == 1:
+                    self._steps_depth = None
+
+        return completed
+
+    def _close_step(self) -> Optional[dict]:
+        raw = "".join(self._step_chars)
+        self._step_chars = None
+        try:
+            step = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+        self.steps_emitted += 1
+        return step
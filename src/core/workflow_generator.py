@@ -1,156 +1,769 @@
+import asyncio
+import contextvars
+import hashlib
 import json
+import logging
+import multiprocessing
+import os
+import time
 import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Union
 
-from src.models.events import SessionTimeline, EventType
-from src.models.workflow import WorkflowDefinition, WorkflowStep, ActionType, Selector
-from src.services.bedrock_client import BedrockClient
+from src.models.events import SessionTimeline, SessionHeader, EventLog
+from src.models.workflow import WorkflowDefinition, WorkflowStep, GenerationResult
+from src.core.chunking import split_session, merge_workflows
+from src.core.columnar import ColumnarSession
+from src.core.compaction import CompactionConfig, EventCompactor
+from src.core.converters import convert_event
+from src.core.json_repair import extract_json, scan_json
+from src.core.hybrid import HybridEnricher, EnrichmentTask
+from src.core.loops import LoopDetectionConfig, LoopFolder
+from src.core.routing import ModelRouter, ModelTier, RoutingBudget, build_model_router
+from src.core.screenshots import ScreenshotPipeline
+from src.core.single_flight import FileLockCoordinator, SingleFlight
+from src.core.ingestion import read_ndjson_session
+from src.core.stream_parser import IncrementalStepParser
+from src.services.bedrock_client import BedrockClient, WORKFLOW_INFERENCE_CONFIG
+from src.services.async_bedrock_client import AsyncBedrockClient
+from src.services.client_factory import ClientPoolConfig
+from src.services.example_index import build_example_index
+from src.services.health import CircuitBreaker, build_circuit_breaker, is_outage
+from src.services.metrics import STAGE_ERRORS, TRUNCATED_OUTPUTS, timed
+from src.services.rate_limiter import build_rate_limiter, tenant_scope
+from src.services.response_cache import build_response_cache
+from src.services.screenshot_index import build_screenshot_index
+from src.services.screenshot_store import build_screenshot_store
+from src.services.session_encoder import estimate_tokens
+
+
+logger = logging.getLogger(__name__)
 
 
 class WorkflowGenerator:
-    def __init__(self, bedrock_client: Optional[BedrockClient] = None):
+    def __init__(
+        self,
+        bedrock_client: Optional[BedrockClient] = None,
+        async_bedrock_client: Optional[AsyncBedrockClient] = None,
+        batch_concurrency: int = 8,
+        deterministic_workers: Optional[int] = None,
+        process_pool_min_batch: int = 32,
+        chunk_threshold: Optional[int] = 300,
+        chunk_size: int = 200,
+        compaction: Optional[CompactionConfig] = CompactionConfig(),
+        screenshot_pipeline: Optional[ScreenshotPipeline] = None,
+        single_flight: Optional[SingleFlight] = None,
+        hybrid: Optional[HybridEnricher] = None,
+        loop_detection: Optional[LoopDetectionConfig] = LoopDetectionConfig(),
+        max_continuations: int = 2,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        router: Optional[ModelRouter] = None
+    ):
         self.bedrock = bedrock_client or BedrockClient()
+        self.async_bedrock = async_bedrock_client or AsyncBedrockClient(
+            region=self.bedrock.region,
+            model_id=self.bedrock.model_id,
+            cache=self.bedrock.cache,
+            prompt_encoding=self.bedrock.prompt_encoding,
+            screenshot_index=self.bedrock.screenshot_index,
+            endpoint_url=self.bedrock.endpoint_url,
+            rate_limiter=self.bedrock.rate_limiter,
+            example_index=self.bedrock.example_index,
+            prompt_caching=self.bedrock.prompt_caching
+        )
+        self.batch_concurrency = batch_concurrency
+        self.deterministic_workers = deterministic_workers or os.cpu_count() or 1
+        self.process_pool_min_batch = process_pool_min_batch
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self.chunk_threshold = chunk_threshold
+        self.chunk_size = chunk_size
+        self.compaction = compaction
+        self.screenshot_pipeline = screenshot_pipeline
+        self.single_flight = single_flight or SingleFlight()
+        self.hybrid = hybrid or HybridEnricher()
+        self.loop_detection = loop_detection
+        self.max_continuations = max_continuations
+        self.circuit_breaker = circuit_breaker
+        self.router = router
+        if router is not None:
+            router.bind(self.bedrock, self.async_bedrock)
     
-    def generate_from_session(self, session: SessionTimeline) -> WorkflowDefinition:
-        """Generate a workflow definition from a recorded session"""
+    def generate_from_session(self, session: SessionTimeline, budget: Optional[RoutingBudget] = None) -> WorkflowDefinition:
+        """Generate a workflow definition from a recorded session. With a router,
+        budget bounds the latency and cost of the model it picks."""
         
-        # Convert session to dict for Bedrock
-        session_dict = session.model_dump(mode="json")
+        with self._admission() as admitted:
+            if not admitted:
+                return self._fallback(session)
+            
+            if self._should_chunk(session):
+                return self.generate_chunked(session, budget)
+            
+            # Convert session to dict for Bedrock
+            session_dict = session.model_dump(mode="json")
+            
+            if self.router is not None:
+                workflow = self.single_flight.do(
+                    self._flight_key(session_dict, budget),
+                    lambda: self._routed_workflow(session_dict, self._screenshots(session), budget)
+                )
+                # Callers that shared the flight each get their own copy
+                return workflow.model_copy(deep=True)
+            
+            # Get AI-generated workflow; identical concurrent requests share one model call
+            workflow = self.single_flight.do(
+                self._flight_key(session_dict),
+                lambda: self._generated_workflow(session_dict, self._screenshots(session))
+            )
+            return workflow.model_copy(deep=True)
+    
+    def stream_from_session(self, session: SessionTimeline) -> Iterator[Union[WorkflowStep, WorkflowDefinition]]:
+        """Stream a workflow: yields each WorkflowStep as soon as the model closes it,
+        then the validated WorkflowDefinition once the output is complete"""
+        
+        with self._admission() as admitted:
+            if not admitted:
+                workflow = self._fallback(session)
+                yield from workflow.steps
+                yield workflow
+                return
+            
+            session_dict = session.model_dump(mode="json")
+            screenshots = self._screenshots(session)
+            parser = IncrementalStepParser()
+            fragments = []
+            
+            def emit(text: str) -> Iterator[WorkflowStep]:
+                fragments.append(text)
+                for step_json in parser.feed(text):
+                    try:
+                        yield WorkflowStep(**step_json)
+                    except ValueError:
+                        # Invalid steps surface when the full definition is validated
+                        continue
+            
+            with self._guarded():
+                for text in self.bedrock.generate_workflow_stream(session_dict, screenshots):
+                    yield from emit(text)
+            
+                # Output cut off at maxTokens: the tail continues the same parse
+                for _ in range(self.max_continuations):
+                    output = "".join(fragments)
+                    if not scan_json(output).truncated:
+                        break
+                    fragments = [output.rstrip()]
+                    yield from emit(self.bedrock.continue_workflow(session_dict, screenshots, output))
+            
+            yield self._accepted(self.bedrock, session_dict, screenshots, "".join(fragments))
+    
+    async def generate_from_session_async(self, session: SessionTimeline, budget: Optional[RoutingBudget] = None) -> WorkflowDefinition:
+        """Async variant of generate_from_session; does not block the event loop on Bedrock"""
         
-        # Get AI-generated workflow
-        ai_response = self.bedrock.generate_workflow(session_dict, [])
+        with self._admission() as admitted:
+            if not admitted:
+                return await asyncio.to_thread(self._fallback, session)
+            
+            if self._should_chunk(session):
+                return await self.generate_chunked_async(session, budget)
+            
+            session_dict = session.model_dump(mode="json")
+            
+            if self.router is not None:
+                async def routed() -> WorkflowDefinition:
+                    screenshots = await asyncio.to_thread(self._screenshots, session)
+                    return await self._routed_workflow_async(session_dict, screenshots, budget)
+            
+                workflow = await self.single_flight.do_async(self._flight_key(session_dict, budget), routed)
+                return workflow.model_copy(deep=True)
+            
+            async def generate() -> WorkflowDefinition:
+                screenshots = await asyncio.to_thread(self._screenshots, session)
+                return await self._generated_workflow_async(session_dict, screenshots)
+            
+            workflow = await self.single_flight.do_async(self._flight_key(session_dict), generate)
+            return workflow.model_copy(deep=True)
+    
+    def generate_chunked(self, session: SessionTimeline, budget: Optional[RoutingBudget] = None) -> WorkflowDefinition:
+        """Map-reduce generation: split the session at natural boundaries, generate
+        each window in parallel and merge the partial workflows"""
+        
+        windows = split_session(session, max_events=self.chunk_size)
+        
+        def generate_window(window: SessionTimeline) -> WorkflowDefinition:
+            if self.router is not None:
+                return self._routed_workflow(window.model_dump(mode="json"), self._screenshots(window), budget)
+            return self._generated_workflow(window.model_dump(mode="json"), self._screenshots(window))
+        
+        with ThreadPoolExecutor(max_workers=self.batch_concurrency) as pool:
+            parts = list(pool.map(generate_window, windows))
+        
+        return merge_workflows(parts, session)
+    
+    async def generate_chunked_async(self, session: SessionTimeline, budget: Optional[RoutingBudget] = None) -> WorkflowDefinition:
+        """Async variant of generate_chunked"""
         
-        # Parse and validate the response
-        workflow_json = self._extract_json(ai_response)
-        workflow = WorkflowDefinition(**workflow_json)
+        windows = split_session(session, max_events=self.chunk_size)
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        
+        async def generate_window(window: SessionTimeline) -> WorkflowDefinition:
+            async with semaphore:
+                screenshots = await asyncio.to_thread(self._screenshots, window)
+                if self.router is not None:
+                    return await self._routed_workflow_async(window.model_dump(mode="json"), screenshots, budget)
+                return await self._generated_workflow_async(window.model_dump(mode="json"), screenshots)
+        
+        parts = await asyncio.gather(*(generate_window(window) for window in windows))
+        return merge_workflows(list(parts), session)
+    
+    def generate_hybrid(self, session: SessionTimeline) -> WorkflowDefinition:
+        """Deterministic skeleton, with only the spans the rules cannot resolve
+        (coordinate-only clicks, typed values that look like variables) sent
+        to the model as small parallel requests"""
+        
+        with self._admission() as admitted:
+            if not admitted:
+                return self._fallback(session)
+            
+            # Folded later: clicks and typed text inside a loop body would never be enriched
+            workflow = self.generate_from_events_only(session, fold_loops=False)
+            tasks = self.hybrid.plan(workflow, session.events)
+            if not tasks:
+                return self._fold_loops(self.hybrid.merge(workflow, tasks, []))
+            
+            # Enrichment calls queue for rate-limit capacity as the session's user
+            with tenant_scope(session.user_id), ThreadPoolExecutor(max_workers=self.batch_concurrency) as pool:
+                futures = [pool.submit(contextvars.copy_context().run, self._run_enrichment, task) for task in tasks]
+                replies = [future.result() for future in futures]
+            
+            return self._fold_loops(self.hybrid.merge(workflow, tasks, replies))
+    
+    async def generate_hybrid_async(self, session: SessionTimeline) -> WorkflowDefinition:
+        """Async variant of generate_hybrid"""
+        
+        with self._admission() as admitted:
+            if not admitted:
+                return await asyncio.to_thread(self._fallback, session)
+            
+            workflow = await asyncio.to_thread(self.generate_from_events_only, session, False)
+            tasks = self.hybrid.plan(workflow, session.events)
+            semaphore = asyncio.Semaphore(self.batch_concurrency)
+            
+            async def run(task: EnrichmentTask) -> Optional[dict]:
+                async with semaphore:
+                    try:
+                        with self._guarded():
+                            reply = await self.async_bedrock.enrich_workflow(task.kind, task.payload)
+                        return self._extract_json(reply)
+                    except Exception as e:
+                        self._enrichment_failed(task, e)
+                        return None
+            
+            with tenant_scope(session.user_id):
+                replies = await asyncio.gather(*(run(task) for task in tasks))
+            return self._fold_loops(self.hybrid.merge(workflow, tasks, list(replies)))
+    
+    def _run_enrichment(self, task: EnrichmentTask) -> Optional[dict]:
+        """Model reply for one enrichment task; failures leave that span deterministic"""
+        try:
+            with self._guarded():
+                reply = self.bedrock.enrich_workflow(task.kind, task.payload)
+            return self._extract_json(reply)
+        except Exception as e:
+            self._enrichment_failed(task, e)
+            return None
+    
+    @staticmethod
+    def _enrichment_failed(task: EnrichmentTask, error: Exception) -> None:
+        STAGE_ERRORS.inc(stage=f"enrich_{task.kind}", error=type(error).__name__)
+        logger.warning("Hybrid %s enrichment failed: %s", task.kind, error)
+    
+    def _generated_workflow(self, session_dict: dict, screenshots: list[str]) -> WorkflowDefinition:
+        """Validated workflow from the default model"""
+        text = self._generate_text(session_dict, screenshots)
+        return self._accepted(self.bedrock, session_dict, screenshots, text)
+    
+    async def _generated_workflow_async(self, session_dict: dict, screenshots: list[str]) -> WorkflowDefinition:
+        """Async variant of _generated_workflow"""
+        text = await self._generate_text_async(session_dict, screenshots)
+        return self._accepted(self.async_bedrock, session_dict, screenshots, text)
+    
+    def _generate_text(
+        self,
+        session_dict: dict,
+        screenshots: list[str],
+        bedrock: Optional[BedrockClient] = None,
+        use_cache: bool = True
+    ) -> str:
+        """Model output for a session. Output cut off at maxTokens is continued
+        (up to max_continuations times) rather than regenerated from scratch."""
         
+        bedrock = bedrock or self.bedrock
+        with self._guarded():
+            text = bedrock.generate_workflow(session_dict, screenshots, use_cache=use_cache)
+            for _ in range(self.max_continuations):
+                if not scan_json(text).truncated:
+                    break
+                text = text.rstrip() + bedrock.continue_workflow(session_dict, screenshots, text)
+        return text
+    
+    async def _generate_text_async(
+        self,
+        session_dict: dict,
+        screenshots: list[str],
+        async_bedrock: Optional[AsyncBedrockClient] = None,
+        use_cache: bool = True
+    ) -> str:
+        """Async variant of _generate_text"""
+        
+        async_bedrock = async_bedrock or self.async_bedrock
+        with self._guarded():
+            text = await async_bedrock.generate_workflow(session_dict, screenshots, use_cache=use_cache)
+            for _ in range(self.max_continuations):
+                if not scan_json(text).truncated:
+                    break
+                text = text.rstrip() + await async_bedrock.continue_workflow(session_dict, screenshots, text)
+        return text
+    
+    def _routed_workflow(self, session_dict: dict, screenshots: list[str], budget: Optional[RoutingBudget]) -> WorkflowDefinition:
+        """Workflow from the first model in the router's plan whose output validates"""
+        
+        prompt_tokens = self.router.prompt_tokens(session_dict)
+        tiers = self.router.plan(session_dict, screenshots, budget, prompt_tokens)
+        if not tiers:
+            raise ValueError("The model router has no tiers to try")
+        for index, tier in enumerate(tiers):
+            started = time.perf_counter()
+            client = self.router.clients(tier.model_id)[0]
+            cached = client.cached_workflow(session_dict, screenshots)
+            if cached is not None:
+                workflow = self._routed_attempt(tiers, index, cached, None, prompt_tokens)
+                if workflow is not None:
+                    return workflow
+                continue
+            try:
+                text = self._generate_text(session_dict, screenshots, client, use_cache=False)
+            except Exception:
+                self.router.record(tier, "error", time.perf_counter() - started, prompt_tokens)
+                raise
+            workflow = self._routed_attempt(tiers, index, text, time.perf_counter() - started, prompt_tokens)
+            if workflow is not None:
+                self._remember(client, session_dict, screenshots, text, workflow)
+                return workflow
+    
+    async def _routed_workflow_async(
+        self,
+        session_dict: dict,
+        screenshots: list[str],
+        budget: Optional[RoutingBudget]
+    ) -> WorkflowDefinition:
+        """Async variant of _routed_workflow"""
+        
+        prompt_tokens = await asyncio.to_thread(self.router.prompt_tokens, session_dict)
+        tiers = self.router.plan(session_dict, screenshots, budget, prompt_tokens)
+        if not tiers:
+            raise ValueError("The model router has no tiers to try")
+        for index, tier in enumerate(tiers):
+            started = time.perf_counter()
+            client = self.router.clients(tier.model_id)[1]
+            cached = client.cached_workflow(session_dict, screenshots)
+            if cached is not None:
+                workflow = self._routed_attempt(tiers, index, cached, None, prompt_tokens)
+                if workflow is not None:
+                    return workflow
+                continue
+            try:
+                text = await self._generate_text_async(session_dict, screenshots, client, use_cache=False)
+            except Exception:
+                self.router.record(tier, "error", time.perf_counter() - started, prompt_tokens)
+                raise
+            workflow = self._routed_attempt(tiers, index, text, time.perf_counter() - started, prompt_tokens)
+            if workflow is not None:
+                self._remember(client, session_dict, screenshots, text, workflow)
+                return workflow
+    
+    def _routed_attempt(
+        self,
+        tiers: list[ModelTier],
+        index: int,
+        text: str,
+        latency: Optional[float],
+        prompt_tokens: int
+    ) -> Optional[WorkflowDefinition]:
+        """Validate one tier's output; None if it failed and a larger tier is left to try.
+        latency is None for output replayed from the response cache, which is
+        counted as a cache hit rather than as a model call."""
+        
+        tier = tiers[index]
+        output_tokens = estimate_tokens(text)
+        try:
+            workflow = self._workflow_from_output(text)
+        except ValueError as e:
+            if latency is not None:
+                self.router.record(tier, "invalid", latency, prompt_tokens, output_tokens)
+            if index == len(tiers) - 1:
+                raise
+            self.router.record_escalation(tier)
+            logger.info("%s output failed validation (%s); escalating to %s", tier.model_id, e, tiers[index + 1].model_id)
+            return None
+        
+        if latency is None:
+            self.router.record_cache_hit(tier)
+        else:
+            self.router.record(tier, "success", latency, prompt_tokens, output_tokens)
+        workflow.metadata["model_id"] = tier.model_id
+        if index > 0:
+            workflow.metadata["escalated_from"] = [skipped.model_id for skipped in tiers[:index]]
+        return workflow
+    
+    @contextmanager
+    def _admission(self) -> Iterator[bool]:
+        """Yields whether AI traffic may go ahead (False while Bedrock is failing).
+        A half-open trial this call took but never reported on, because it
+        returned early, raised before the model call or was abandoned, is
+        released on exit so the breaker does not shed forever."""
+        
+        if self.circuit_breaker is None:
+            yield True
+            return
+        grant = self.circuit_breaker.acquire()
+        try:
+            yield grant is not None
+        finally:
+            if grant:
+                self.circuit_breaker.release()
+    
+    def _fallback(self, session: SessionTimeline) -> WorkflowDefinition:
+        """Deterministic workflow served in place of an AI one while the circuit is open"""
+        
+        workflow = self.generate_from_events_only(session)
+        workflow.metadata["fallback"] = "bedrock_unavailable"
+        return workflow
+    
+    @contextmanager
+    def _guarded(self) -> Iterator[None]:
+        """Report the outcome of model calls to the circuit breaker. Errors
+        that are not outages (bad requests) still show Bedrock is answering."""
+        
+        if self.circuit_breaker is None:
+            yield
+            return
+        try:
+            yield
+        except Exception as e:
+            if is_outage(e):
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+            raise
+        self.circuit_breaker.record_success()
+    
+    def _accepted(self, client, session_dict: dict, screenshots: list[str], text: str) -> WorkflowDefinition:
+        """Validated workflow from a client's output, cached for repeats of the session"""
+        
+        workflow = self._workflow_from_output(text)
+        self._remember(client, session_dict, screenshots, text, workflow)
         return workflow
     
-    def generate_from_events_only(self, session: SessionTimeline) -> WorkflowDefinition:
+    def _remember(self, client, session_dict: dict, screenshots: list[str], text: str, workflow: WorkflowDefinition) -> None:
+        """Cache output only once it has validated; output still truncated after
+        continuing is left out so a retry can do better"""
+        
+        if not workflow.metadata.get("output_repair", {}).get("truncated"):
+            client.remember_workflow(session_dict, screenshots, text)
+    
+    def _workflow_from_output(self, text: str) -> WorkflowDefinition:
+        """Validated workflow from model output. Repaired defects, and output
+        that is still truncated after continuing, are noted in the metadata."""
+        
+        with timed("json_extract"):
+            extraction = scan_json(text)
+            if extraction.value is None:
+                raise ValueError(f"No workflow in model output: {extraction.error}")
+        
+        with timed("validation"):
+            workflow = WorkflowDefinition(**extraction.value)
+        if extraction.repairs or extraction.truncated:
+            workflow.metadata["output_repair"] = {
+                "repairs": extraction.repairs,
+                "truncated": extraction.truncated
+            }
+        if extraction.truncated:
+            TRUNCATED_OUTPUTS.inc()
+            logger.warning("Model output truncated; kept %d complete steps", len(workflow.steps))
+        return workflow
+    
+    def _flight_key(self, session_dict: dict, budget: Optional[RoutingBudget] = None) -> str:
+        """Requests with equal keys send the same prompt, so they can share a call.
+        Unlike the response cache key, identity fields count: they are in the prompt."""
+        payload = {
+            "model_id": "routed" if self.router is not None else self.bedrock.model_id,
+            "budget": budget.model_dump() if budget is not None else None,
+            "inference_config": WORKFLOW_INFERENCE_CONFIG,
+            "prompt_encoding": self.bedrock.prompt_encoding,
+            "screenshots": self.screenshot_pipeline is not None,
+            "session": session_dict
+        }
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    
+    def _screenshots(self, session: SessionTimeline) -> list[str]:
+        """Prompt images for a session; none unless a screenshot pipeline is configured"""
+        if self.screenshot_pipeline is None:
+            return []
+        return self.screenshot_pipeline.collect(session)
+    
+    def _should_chunk(self, session: SessionTimeline) -> bool:
+        return self.chunk_threshold is not None and len(session.events) > self.chunk_threshold
+    
+    def generate_from_events_only(self, session: SessionTimeline, fold_loops: bool = True) -> WorkflowDefinition:
         """Generate workflow using only event logs (no AI, deterministic)"""
         
+        header = SessionHeader.model_construct(**{
+            name: getattr(session, name) for name in SessionHeader.model_fields
+        })
+        return self.generate_from_event_stream(header, session.events, fold_loops)
+    
+    def generate_from_event_stream(
+        self,
+        header: SessionHeader,
+        events: Iterable[EventLog],
+        fold_loops: bool = True
+    ) -> WorkflowDefinition:
+        """Deterministic generation over an event iterator.
+        
+        Events are consumed one at a time, so memory is bounded by the
+        steps produced rather than by the length of the recording. With
+        fold_loops=False repeats are left flat for a caller to fold later.
+        """
+        
         steps = []
         step_counter = 1
+        event_count = 0
+        
+        def counted(source: Iterable[EventLog]) -> Iterator[EventLog]:
+            nonlocal event_count
+            for event in source:
+                event_count += 1
+                yield event
+        
+        events = counted(events)
+        compactor = None
+        if self.compaction is not None:
+            compactor = EventCompactor(self.compaction)
+            events = compactor.compact(events)
+        
+        with timed("event_conversion"):
+            for event in events:
+                step = self._event_to_step(event, step_counter)
+                if step:
+                    steps.append(step)
+                    step_counter += 1
         
-        for event in session.events:
-            step = self._event_to_step(event, step_counter)
-            if step:
-                steps.append(step)
-                step_counter += 1
+        metadata = {
+            "source_session": header.session_id,
+            "generated_at": datetime.utcnow().isoformat(),
+            "event_count": event_count
+        }
+        if compactor is not None:
+            metadata["compaction"] = compactor.stats.as_dict()
         
         workflow = WorkflowDefinition(
             workflow_id=str(uuid.uuid4()),
-            name=f"Workflow from {session.session_id}",
+            name=f"Workflow from {header.session_id}",
             description=f"Auto-generated workflow from session recording",
-            application=session.application,
+            application=header.application,
             steps=steps,
-            metadata={
-                "source_session": session.session_id,
-                "generated_at": datetime.utcnow().isoformat(),
-                "event_count": len(session.events)
-            }
+            variables={},
+            metadata=metadata
         )
         
+        return self._fold_loops(workflow) if fold_loops else workflow
+    
+    def _fold_loops(self, workflow: WorkflowDefinition) -> WorkflowDefinition:
+        """Fold repeated step sequences into LOOP steps (in place), unless loop detection is off"""
+        
+        if self.loop_detection is None:
+            return workflow
+        folder = LoopFolder(self.loop_detection)
+        with timed("loop_detection"):
+            workflow.steps = folder.fold(workflow.steps, workflow.variables)
+        workflow.metadata["loops"] = folder.stats()
         return workflow
     
-    def _event_to_step(self, event, step_num: int) -> Optional[WorkflowStep]:
-        """Convert a single event log to a workflow step"""
+    def generate_from_ndjson(self, lines: Iterable[Union[str, bytes]]) -> WorkflowDefinition:
+        """Deterministic generation from an NDJSON session stream (header line, then events)"""
         
-        event_type = event.event_type
-        data = event.data
-        
-        if event_type == EventType.MOUSE_CLICK:
-            return WorkflowStep(
-                step_id=f"step_{step_num}",
-                action=ActionType.CLICK,
-                description=f"Click at ({data.get('x')}, {data.get('y')})",
-                selector=Selector(
-                    type="coordinates",
-                    value={"x": data.get("x"), "y": data.get("y")}
-                ),
-                parameters={"button": data.get("button", "left")},
-                screenshot_before=event.screenshot_ref
-            )
+        header, events = read_ndjson_session(lines)
+        return self.generate_from_event_stream(header, events)
+    
+    def generate_from_columnar(self, source: Union[str, ColumnarSession]) -> WorkflowDefinition:
+        """Deterministic generation from a columnar session file (or an open one),
+        read through the memory map without building the SessionTimeline"""
         
-        elif event_type == EventType.MOUSE_DOUBLE_CLICK:
-            return WorkflowStep(
-                step_id=f"step_{step_num}",
-                action=ActionType.DOUBLE_CLICK,
-                description=f"Double-click at ({data.get('x')}, {data.get('y')})",
-                selector=Selector(
-                    type="coordinates",
-                    value={"x": data.get("x"), "y": data.get("y")}
-                ),
-                parameters={}
-            )
+        if isinstance(source, ColumnarSession):
+            return self.generate_from_event_stream(source.header, source.events())
+        with ColumnarSession.open(source) as columnar:
+            return self.generate_from_event_stream(columnar.header, columnar.events())
+    
+    async def generate_from_events_only_async(self, session: SessionTimeline) -> WorkflowDefinition:
+        """Async variant of generate_from_events_only; conversion runs in a worker thread"""
         
-        elif event_type == EventType.TEXT_INPUT:
-            return WorkflowStep(
-                step_id=f"step_{step_num}",
-                action=ActionType.TYPE_TEXT,
-                description=f"Type: {data.get('text', '')[:50]}...",
-                selector=None,
-                parameters={"text": data.get("text", "")}
-            )
+        return await asyncio.to_thread(self.generate_from_events_only, session)
+    
+    def generate_many(
+        self,
+        sessions: list[SessionTimeline],
+        use_ai: bool = True,
+        max_concurrency: Optional[int] = None
+    ) -> list[GenerationResult]:
+        """Generate workflows for many sessions, reporting success or error per item.
         
-        elif event_type == EventType.KEY_PRESS:
-            return WorkflowStep(
-                step_id=f"step_{step_num}",
-                action=ActionType.PRESS_KEY,
-                description=f"Press key: {data.get('key')}",
-                selector=None,
-                parameters={
-                    "key": data.get("key"),
-                    "modifiers": data.get("modifiers", [])
-                }
-            )
+        AI generations fan out over up to max_concurrency threads; deterministic
+        generations of large batches are spread over a process pool.
+        """
         
-        elif event_type == EventType.SCROLL:
-            return WorkflowStep(
-                step_id=f"step_{step_num}",
-                action=ActionType.SCROLL,
-                description=f"Scroll by ({data.get('delta_x', 0)}, {data.get('delta_y', 0)})",
-                selector=Selector(
-                    type="coordinates",
-                    value={"x": data.get("x"), "y": data.get("y")}
-                ),
-                parameters={
-                    "delta_x": data.get("delta_x", 0),
-                    "delta_y": data.get("delta_y", 0)
-                }
-            )
+        if not use_ai:
+            return self._generate_deterministic_many(sessions)
+        
+        with ThreadPoolExecutor(max_workers=max_concurrency or self.batch_concurrency) as pool:
+            return list(pool.map(
+                lambda item: self._generate_result(item[0], item[1], use_ai=True),
+                enumerate(sessions)
+            ))
+    
+    async def generate_many_async(
+        self,
+        sessions: list[SessionTimeline],
+        use_ai: bool = True,
+        max_concurrency: Optional[int] = None
+    ) -> list[GenerationResult]:
+        """Async variant of generate_many with at most max_concurrency in-flight model calls"""
+        
+        if not use_ai:
+            return await asyncio.to_thread(self._generate_deterministic_many, sessions)
+        
+        semaphore = asyncio.Semaphore(max_concurrency or self.batch_concurrency)
+        
+        async def run(index: int, session: SessionTimeline) -> GenerationResult:
+            async with semaphore:
+                try:
+                    workflow = await self.generate_from_session_async(session)
+                    return GenerationResult(index=index, session_id=session.session_id, success=True, workflow=workflow)
+                except Exception as e:
+                    return GenerationResult(index=index, session_id=session.session_id, success=False, error=str(e))
         
-        elif event_type == EventType.NAVIGATION:
-            return WorkflowStep(
-                step_id=f"step_{step_num}",
-                action=ActionType.NAVIGATE,
-                description=f"Navigate to {data.get('url', '')}",
-                selector=None,
-                parameters={"url": data.get("url", "")}
+        return list(await asyncio.gather(*(run(i, s) for i, s in enumerate(sessions))))
+    
+    def close(self) -> None:
+        """Shut down the deterministic process pool, if one was started"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(cancel_futures=True)
+            self._process_pool = None
+    
+    def _generate_result(self, index: int, session: SessionTimeline, use_ai: bool) -> GenerationResult:
+        try:
+            if use_ai:
+                workflow = self.generate_from_session(session)
+            else:
+                workflow = self.generate_from_events_only(session)
+            return GenerationResult(index=index, session_id=session.session_id, success=True, workflow=workflow)
+        except Exception as e:
+            return GenerationResult(index=index, session_id=session.session_id, success=False, error=str(e))
+    
+    def _generate_deterministic_many(self, sessions: list[SessionTimeline]) -> list[GenerationResult]:
+        # Small batches are cheaper inline than shipping sessions to other processes
+        if len(sessions) < self.process_pool_min_batch or self.deterministic_workers <= 1:
+            return [self._generate_result(i, s, use_ai=False) for i, s in enumerate(sessions)]
+        
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.deterministic_workers,
+                mp_context=multiprocessing.get_context("spawn")
             )
         
-        elif event_type == EventType.SCREENSHOT:
-            # Screenshots are reference points, not actions
-            return None
+        chunksize = max(1, len(sessions) // (self.deterministic_workers * 4))
+        options = [self._deterministic_options()] * len(sessions)
+        return list(self._process_pool.map(
+            _deterministic_result, range(len(sessions)), sessions, options, chunksize=chunksize
+        ))
+    
+    def _deterministic_options(self) -> dict:
+        """Constructor arguments that shape deterministic output, for pool workers"""
+        return {"compaction": self.compaction, "loop_detection": self.loop_detection}
+    
+    def _event_to_step(self, event, step_num: int) -> Optional[WorkflowStep]:
+        """Convert a single event log to a workflow step"""
         
-        return None
+        return convert_event(event, step_num)
     
     def _extract_json(self, text: str) -> dict:
-        """Extract JSON from AI response text"""
-        
-        # Try to find JSON in the response
-        text = text.strip()
-        
-        # If wrapped in code blocks, extract
-        if "```json" in text:
-            start = text.find("```json") + 7
-            end = text.find("```", start)
-            text = text[start:end].strip()
-        elif "```" in text:
-            start = text.find("```") + 3
-            end = text.find("```", start)
-            text = text[start:end].strip()
-        
-        # Parse JSON
-        return json.loads(text)
\ No newline at end of file
+        """Extract JSON from AI response text, tolerating prose, fences and common defects"""
+        
+        return extract_json(text)
+
+
+# Per-process generator used by the deterministic batch pool
+_worker_generator: Optional[WorkflowGenerator] = None
+_worker_options: Optional[dict] = None
+
+
+def _deterministic_result(index: int, session: SessionTimeline, options: dict) -> GenerationResult:
+    global _worker_generator, _worker_options
+    if _worker_generator is None or options != _worker_options:
+        _worker_generator = WorkflowGenerator(**options)
+        _worker_options = options
+    return _worker_generator._generate_result(index, session, use_ai=False)
+
+
+def build_workflow_generator(circuit_breaker: Optional[CircuitBreaker] = None) -> WorkflowGenerator:
+    """Generator configured from the environment; the API and job worker processes
+    both build theirs here. A circuit breaker is built from the environment too
+    unless one is given."""
+
+    pool_config = ClientPoolConfig.from_env()
+    screenshot_store = build_screenshot_store(pool_config)
+    bedrock = BedrockClient(
+        # Repeat sessions are served from the response cache
+        cache=build_response_cache(),
+        prompt_encoding=os.getenv("PROMPT_ENCODING", "compact"),
+        screenshot_index=build_screenshot_index(),
+        # Accepted workflows (POST /examples) of similar sessions are added to the prompt as examples
+        example_index=build_example_index(),
+        # Marks the static prompt prefix for Bedrock prompt caching
+        prompt_caching=os.getenv("PROMPT_CACHING", "true").lower() in ("1", "true", "yes"),
+        pool_config=pool_config,
+        # Point at a local stand-in (python -m src.services.fake_bedrock) to run without AWS
+        endpoint_url=os.getenv("BEDROCK_ENDPOINT_URL"),
+        # Paces calls to the account's RPM/TPM quota, shared across workers via RATE_LIMIT_PATH
+        rate_limiter=build_rate_limiter()
+    )
+    return WorkflowGenerator(
+        bedrock,
+        AsyncBedrockClient(
+            region=bedrock.region,
+            model_id=bedrock.model_id,
+            cache=bedrock.cache,
+            prompt_encoding=bedrock.prompt_encoding,
+            screenshot_index=bedrock.screenshot_index,
+            max_concurrency=int(os.getenv("BEDROCK_MAX_CONCURRENCY", "64")),
+            endpoint_url=bedrock.endpoint_url,
+            rate_limiter=bedrock.rate_limiter,
+            example_index=bedrock.example_index,
+            prompt_caching=bedrock.prompt_caching
+        ),
+        screenshot_pipeline=ScreenshotPipeline(
+            screenshot_store,
+            max_images=int(os.getenv("SCREENSHOT_MAX_IMAGES", "6"))
+        ) if screenshot_store is not None else None,
+        # With SINGLE_FLIGHT_LOCK_DIR, workers also wait on each other and share the SQLite cache tier
+        single_flight=SingleFlight(
+            FileLockCoordinator(os.environ["SINGLE_FLIGHT_LOCK_DIR"]) if os.getenv("SINGLE_FLIGHT_LOCK_DIR") else None
+        ),
+        # Bedrock failures open the breaker and AI requests are served deterministically until it recovers
+        circuit_breaker=circuit_breaker or build_circuit_breaker(),
+        # With MODEL_ROUTING, small sessions go to smaller, faster models and escalate if the output is invalid
+        router=build_model_router()
+    )
+
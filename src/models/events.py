@@ -1,6 +1,6 @@
 from enum import Enum
-from typing import Optional, List, Any
-from pydantic import BaseModel, Field
+from typing import Optional, List, Any, Literal, Union, Annotated
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
 
 
@@ -31,6 +31,9 @@ class ClickEvent(BaseModel):
     button: MouseButton = MouseButton.LEFT
     element_text: Optional[str] = Field(None, description="Text of clicked element if available")
     element_type: Optional[str] = Field(None, description="Type of element (button, link, input, etc)")
+    
+    class Config:
+        use_enum_values = True
 
 
 class DragEvent(BaseModel):
@@ -39,6 +42,9 @@ class DragEvent(BaseModel):
     end_x: int
     end_y: int
     button: MouseButton = MouseButton.LEFT
+    
+    class Config:
+        use_enum_values = True
 
 
 class KeyPressEvent(BaseModel):
@@ -75,7 +81,35 @@ class ScreenshotEvent(BaseModel):
     ocr_text: Optional[str] = Field(None, description="Extracted text from screenshot")
 
 
-class EventLog(BaseModel):
+class FileOperationEvent(BaseModel):
+    operation: str = Field(..., description="Operation performed (open, save, copy, move, delete)")
+    path: Optional[str] = Field(None, description="File the operation acted on")
+    destination: Optional[str] = Field(None, description="Target path for copy/move")
+
+
+EventPayload = Union[
+    ClickEvent, DragEvent, KeyPressEvent, TextInputEvent, ScrollEvent,
+    NavigationEvent, WindowSwitchEvent, ScreenshotEvent, FileOperationEvent
+]
+
+# Payload model for each event type
+PAYLOAD_MODELS: dict[str, type[BaseModel]] = {
+    EventType.SCREENSHOT.value: ScreenshotEvent,
+    EventType.MOUSE_CLICK.value: ClickEvent,
+    EventType.MOUSE_DOUBLE_CLICK.value: ClickEvent,
+    EventType.MOUSE_RIGHT_CLICK.value: ClickEvent,
+    EventType.MOUSE_DRAG.value: DragEvent,
+    EventType.KEY_PRESS.value: KeyPressEvent,
+    EventType.KEY_COMBINATION.value: KeyPressEvent,
+    EventType.TEXT_INPUT.value: TextInputEvent,
+    EventType.SCROLL.value: ScrollEvent,
+    EventType.NAVIGATION.value: NavigationEvent,
+    EventType.WINDOW_SWITCH.value: WindowSwitchEvent,
+    EventType.FILE_OPERATION.value: FileOperationEvent,
+}
+
+
+class BaseEventLog(BaseModel):
     timestamp: datetime
     event_type: EventType
     data: Any = Field(..., description="Event-specific data")
@@ -83,6 +117,91 @@ class EventLog(BaseModel):
     
     class Config:
         use_enum_values = True
+        from_attributes = True
+
+
+class EventLog(BaseEventLog):
+    """An event of any type. data is parsed into the payload model for event_type.
+    
+    Convenient for building single events; bulk parsing goes through the
+    TypedEventLog union, which pydantic-core dispatches without Python code.
+    """
+    data: EventPayload = Field(..., description="Event-specific data")
+    
+    @model_validator(mode="before")
+    @classmethod
+    def _parse_payload(cls, values: Any) -> Any:
+        if isinstance(values, dict):
+            event_type = values.get("event_type")
+            model = PAYLOAD_MODELS.get(getattr(event_type, "value", event_type))
+            data = values.get("data")
+            if model is not None and not isinstance(data, model):
+                values = {**values, "data": model.model_validate(data)}
+        return values
+
+
+class ScreenshotEventLog(BaseEventLog):
+    event_type: Literal[EventType.SCREENSHOT]
+    data: ScreenshotEvent
+
+
+class ClickEventLog(BaseEventLog):
+    event_type: Literal[EventType.MOUSE_CLICK, EventType.MOUSE_DOUBLE_CLICK, EventType.MOUSE_RIGHT_CLICK]
+    data: ClickEvent
+
+
+class DragEventLog(BaseEventLog):
+    event_type: Literal[EventType.MOUSE_DRAG]
+    data: DragEvent
+
+
+class KeyPressEventLog(BaseEventLog):
+    event_type: Literal[EventType.KEY_PRESS, EventType.KEY_COMBINATION]
+    data: KeyPressEvent
+
+
+class TextInputEventLog(BaseEventLog):
+    event_type: Literal[EventType.TEXT_INPUT]
+    data: TextInputEvent
+
+
+class ScrollEventLog(BaseEventLog):
+    event_type: Literal[EventType.SCROLL]
+    data: ScrollEvent
+
+
+class NavigationEventLog(BaseEventLog):
+    event_type: Literal[EventType.NAVIGATION]
+    data: NavigationEvent
+
+
+class WindowSwitchEventLog(BaseEventLog):
+    event_type: Literal[EventType.WINDOW_SWITCH]
+    data: WindowSwitchEvent
+
+
+class FileOperationEventLog(BaseEventLog):
+    event_type: Literal[EventType.FILE_OPERATION]
+    data: FileOperationEvent
+
+
+TypedEventLog = Annotated[
+    Union[
+        ScreenshotEventLog, ClickEventLog, DragEventLog, KeyPressEventLog, TextInputEventLog,
+        ScrollEventLog, NavigationEventLog, WindowSwitchEventLog, FileOperationEventLog
+    ],
+    Field(discriminator="event_type")
+]
+
+
+class SessionHeader(BaseModel):
+    """Session fields other than events; the first line of an NDJSON session stream"""
+    session_id: str
+    user_id: Optional[str] = None
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    application: str = Field(..., description="Primary application being recorded")
+    metadata: dict = Field(default_factory=dict)
 
 
 class SessionTimeline(BaseModel):
@@ -91,7 +210,7 @@ class SessionTimeline(BaseModel):
     start_time: datetime
     end_time: Optional[datetime] = None
     application: str = Field(..., description="Primary application being recorded")
-    events: List[EventLog] = Field(default_factory=list)
+    events: List[TypedEventLog] = Field(default_factory=list)
     metadata: dict = Field(default_factory=dict)
     
     class Config:
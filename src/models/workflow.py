@@ -52,4 +52,12 @@ class WorkflowDefinition(BaseModel):
 
 
 # Fix forward reference
-Selector.model_rebuild()
\ No newline at end of file
+Selector.model_rebuild()
+
+class GenerationResult(BaseModel):
+    """Outcome of generating one session in a batch"""
+    index: int = Field(..., description="Position of the session in the request")
+    session_id: str
+    success: bool
+    workflow: Optional[WorkflowDefinition] = None
+    error: Optional[str] = None
@@ -0,0 +1,261 @@
+import asyncio
+import copy
+import json
+import logging
+from typing import Optional
+from urllib.parse import quote
+
+import boto3
+import httpx
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.credentials import Credentials
+from botocore.exceptions import ClientError, NoCredentialsError
+
+from src.services.bedrock_client import (
+    ENRICHMENT_INFERENCE_CONFIG,
+    CONNECTION_TEST_BODY,
+    build_continuation_body,
+    build_enrichment_body,
+    build_screenshot_body,
+    build_workflow_body,
+    extract_response_text,
+    workflow_cache_key,
+)
+from src.services.example_index import ExampleIndex
+from src.services.metrics import bedrock_call, record_usage, timed
+from src.services.rate_limiter import RateLimiter, estimate_body_tokens, tenant_scope
+from src.services.response_cache import ResponseCache, make_cache_key
+from src.services.screenshot_index import ScreenshotIndex, screenshot_hash
+
+
+logger = logging.getLogger(__name__)
+
+class AsyncBedrockClient:
+    """Non-blocking Bedrock runtime client: httpx transport with SigV4 signing.
+
+    Mirrors the BedrockClient surface with coroutine methods. A semaphore caps
+    the number of in-flight model calls per client, counting the clients made
+    from it with for_model.
+    """
+
+    def __init__(
+        self,
+        region: str = "us-east-1",
+        model_id: str = "amazon.nova-pro-v1:0",
+        cache: Optional[ResponseCache] = None,
+        prompt_encoding: str = "compact",
+        screenshot_index: Optional[ScreenshotIndex] = None,
+        max_concurrency: int = 64,
+        timeout: float = 120.0,
+        credentials: Optional[Credentials] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        endpoint_url: Optional[str] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        example_index: Optional[ExampleIndex] = None,
+        prompt_caching: bool = True
+    ):
+        self.region = region
+        self.model_id = model_id
+        self.cache = cache
+        self.prompt_encoding = prompt_encoding
+        self.screenshot_index = screenshot_index
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.endpoint = endpoint_url or f"https://bedrock-runtime.{region}.amazonaws.com"
+        self.rate_limiter = rate_limiter
+        self.example_index = example_index
+        self.prompt_caching = prompt_caching
+        self._credentials = credentials or boto3.Session(region_name=region).get_credentials()
+        self._http = http_client
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # The client owning the httpx pool; for_model copies share it
+        self._base = self
+
+    def for_model(self, model_id: str) -> "AsyncBedrockClient":
+        """Client for another model sharing this one's settings, credentials,
+        semaphore and connection pool, so max_concurrency stays one limit"""
+        client = copy.copy(self)
+        client.model_id = model_id
+        return client
+
+    async def analyze_screenshot(self, image_base64: str, prompt: str) -> str:
+        """Analyze a screenshot with Nova Pro vision capabilities.
+        Near-identical screens are answered from the screenshot index."""
+
+        image_hash = None
+        if self.screenshot_index is not None:
+            image_hash = await asyncio.to_thread(screenshot_hash, image_base64)
+            if image_hash is not None:
+                cached = self.screenshot_index.get(image_hash, prompt)
+                if cached is not None:
+                    return cached
+
+        with bedrock_call("analyze_screenshot", self.model_id):
+            analysis = await self._invoke(build_screenshot_body(image_base64, prompt))
+
+        if image_hash is not None:
+            self.screenshot_index.set(image_hash, prompt, analysis)
+
+        return analysis
+
+    async def generate_workflow(self, session_data: dict, screenshots: list[str], use_cache: bool = True) -> str:
+        """Generate workflow definition from session timeline and screenshots.
+        Answered from the response cache when remember_workflow stored one,
+        unless use_cache is False (the caller already looked)."""
+
+        if use_cache:
+            cached = self.cached_workflow(session_data, screenshots)
+            if cached is not None:
+                return cached
+
+        examples = await self._examples(session_data)
+        with timed("prompt_build"):
+            body = build_workflow_body(session_data, screenshots, self.prompt_encoding, examples, self.prompt_caching)
+        with bedrock_call("generate_workflow", self.model_id), tenant_scope(session_data.get("user_id")):
+            text = await self._invoke(body)
+
+        return text
+
+    async def continue_workflow(self, session_data: dict, screenshots: list[str], partial: str) -> str:
+        """Tail of a workflow definition whose output stopped at maxTokens.
+        Not cached: the completed output is, once it validates."""
+
+        examples = await self._examples(session_data)
+        with timed("prompt_build"):
+            body = build_continuation_body(
+                session_data, screenshots, partial, self.prompt_encoding, examples, self.prompt_caching
+            )
+        with bedrock_call("continue_workflow", self.model_id), tenant_scope(session_data.get("user_id")):
+            text = await self._invoke(body)
+
+        return text
+
+    async def enrich_workflow(self, task: str, payload: dict) -> str:
+        """Run one hybrid-mode enrichment task (see ENRICHMENT_PROMPTS)"""
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_cache_key(self.model_id, {**ENRICHMENT_INFERENCE_CONFIG, "task": task}, payload)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        with bedrock_call("enrich_workflow", self.model_id):
+            text = await self._invoke(build_enrichment_body(task, payload))
+
+        if cache_key is not None:
+            self.cache.set(cache_key, text)
+
+        return text
+
+    def cached_workflow(self, session_data: dict, screenshots: list[str]) -> Optional[str]:
+        """Workflow output remember_workflow stored for the session, if any"""
+        if self.cache is None:
+            return None
+        return self.cache.get(self._workflow_cache_key(session_data, screenshots))
+
+    def remember_workflow(self, session_data: dict, screenshots: list[str], text: str) -> None:
+        """Cache workflow output for the session; callers store only output that validated"""
+        if self.cache is not None:
+            self.cache.set(self._workflow_cache_key(session_data, screenshots), text)
+
+    def _workflow_cache_key(self, session_data: dict, screenshots: list[str]) -> str:
+        return workflow_cache_key(
+            self.model_id, session_data, screenshots, self.prompt_encoding, self.example_index is not None
+        )
+
+    async def test_connection(self) -> bool:
+        """Test if Bedrock connection works"""
+        try:
+            await self._invoke(CONNECTION_TEST_BODY)
+            return True
+        except Exception as e:
+            logger.warning("Connection test failed: %s", e)
+            return False
+
+    async def aclose(self) -> None:
+        if self._base is not self:
+            return
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _examples(self, session_data: dict) -> list[str]:
+        """Few-shot examples for the prompt (see BedrockClient._examples)"""
+        if self.example_index is None:
+            return []
+        return await asyncio.to_thread(self.example_index.retrieve, session_data)
+
+    async def _invoke(self, body: dict) -> str:
+        """Sign and send an InvokeModel request, returning the first content block text.
+        With a rate limiter the call first waits for quota, fairly by tenant."""
+
+        if self.rate_limiter is None:
+            response_body = await self._send(body)
+        else:
+            response_body = await self.rate_limiter.run_async(lambda: self._send(body), estimate_body_tokens(body))
+
+        record_usage(self.model_id, response_body.get("usage"))
+        return extract_response_text(response_body)
+
+    async def _send(self, body: dict) -> dict:
+        url = f"{self.endpoint}/model/{quote(self.model_id, safe='')}/invoke"
+        payload = json.dumps(body)
+
+        # Signed once a slot is free: SigV4 signatures expire, and a request can queue here for a while
+        async with self._semaphore:
+            response = await self._client().post(url, content=payload, headers=self._sign(url, payload))
+
+        if response.status_code >= 400:
+            raise self._client_error(response)
+
+        return response.json()
+
+    def _sign(self, url: str, payload: str) -> dict:
+        if self._credentials is None:
+            raise NoCredentialsError()
+
+        credentials = self._credentials
+        if hasattr(credentials, "get_frozen_credentials"):
+            credentials = credentials.get_frozen_credentials()
+
+        request = AWSRequest(
+            method="POST",
+            url=url,
+            data=payload,
+            headers={"Content-Type": "application/json", "Accept": "application/json"}
+        )
+        SigV4Auth(credentials, "bedrock", self.region).add_auth(request)
+        return dict(request.headers.items())
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._base is not self:
+            return self._base._client()
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                )
+            )
+        return self._http
+
+    @staticmethod
+    def _client_error(response: httpx.Response) -> ClientError:
+        """Translate an HTTP error into the ClientError boto3 would have raised"""
+
+        code = response.headers.get("x-amzn-ErrorType", "").split(":")[0] or str(response.status_code)
+        try:
+            message = response.json().get("message", response.text)
+        except ValueError:
+            message = response.text
+
+        return ClientError(
+            {
+                "Error": {"Code": code, "Message": message},
+                "ResponseMetadata": {"HTTPStatusCode": response.status_code}
+            },
+            "InvokeModel"
+        )
@@ -1,147 +1,376 @@
+import copy
 import json
-import boto3
 import base64
-from typing import Optional
-from botocore.config import Config
+import logging
+from typing import Iterator, Optional, Sequence
 
+from src.services.client_factory import ClientPoolConfig, get_client
+from src.services.example_index import ExampleIndex
+from src.services.metrics import bedrock_call, record_usage, timed
+from src.services.rate_limiter import RateLimiter, estimate_body_tokens, is_throttle, tenant_scope
+from src.services.response_cache import ResponseCache, make_cache_key
+from src.services.screenshot_index import ScreenshotIndex, screenshot_hash
+from src.services.prompt_templates import workflow_template
 
-class BedrockClient:
-    def __init__(self, region: str = "us-east-1", model_id: str = "amazon.nova-pro-v1:0"):
-        self.region = region
-        self.model_id = model_id
-        self.client = boto3.client(
-            service_name="bedrock-runtime",
-            region_name=region,
-            config=Config(retries={"max_attempts": 3, "mode": "adaptive"})
-        )
-    
-    def analyze_screenshot(self, image_base64: str, prompt: str) -> str:
-        """Analyze a screenshot with Nova Pro vision capabilities"""
-        
-        body = {
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "image": {
-                                "format": "png",
-                                "source": {
-                                    "bytes": image_base64
-                                }
+
+logger = logging.getLogger(__name__)
+
+WORKFLOW_INFERENCE_CONFIG = {
+    "maxTokens": 8192,
+    "temperature": 0.1,
+    "topP": 0.9
+}
+
+
+def build_screenshot_body(image_base64: str, prompt: str) -> dict:
+    """Request body for a single-image vision analysis"""
+
+    return {
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "image": {
+                            "format": "png",
+                            "source": {
+                                "bytes": image_base64
                             }
-                        },
-                        {
-                            "text": prompt
                         }
-                    ]
-                }
-            ],
-            "inferenceConfig": {
-                "maxTokens": 4096,
-                "temperature": 0.1,
-                "topP": 0.9
+                    },
+                    {
+                        "text": prompt
+                    }
+                ]
             }
+        ],
+        "inferenceConfig": {
+            "maxTokens": 4096,
+            "temperature": 0.1,
+            "topP": 0.9
         }
-        
-        response = self.client.invoke_model(
-            modelId=self.model_id,
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(body)
-        )
-        
-        response_body = json.loads(response["body"].read())
-        return response_body["output"]["message"]["content"][0]["text"]
-    
-    def generate_workflow(self, session_data: dict, screenshots: list[str]) -> str:
-        """Generate workflow definition from session timeline and screenshots"""
-        
-        prompt = f"""Analyze this user session recording and generate a structured workflow definition.
-
-SESSION DATA:
-{json.dumps(session_data, indent=2, default=str)}
-
-Based on the event logs and screenshots provided, create a JSON workflow definition that can replay these actions.
-
-Output ONLY valid JSON matching this schema:
-{{
-    "workflow_id": "string",
-    "name": "string", 
-    "description": "string",
-    "version": "1.0.0",
-    "application": "string",
-    "steps": [
-        {{
-            "step_id": "string",
-            "action": "CLICK|TYPE_TEXT|PRESS_KEY|etc",
-            "description": "string",
-            "selector": {{
-                "type": "coordinates|text|xpath",
-                "value": "selector value"
-            }},
-            "parameters": {{}},
-            "wait_after": 0.5,
-            "retry_count": 3,
-            "on_failure": "stop"
-        }}
-    ],
-    "variables": {{}},
-    "preconditions": [],
-    "metadata": {{}}
-}}
-
-Generate the workflow JSON:"""
-
-        # For now, text-only analysis (we'll add vision in next iteration)
-        body = {
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [{"text": prompt}]
-                }
-            ],
-            "inferenceConfig": {
-                "maxTokens": 8192,
-                "temperature": 0.1,
-                "topP": 0.9
+    }
+
+
+def build_workflow_body(
+    session_data: dict,
+    screenshots: list[str],
+    encoding: str = "pretty",
+    examples: Sequence[str] = (),
+    caching: bool = True
+) -> dict:
+    """Request body asking the model for a workflow definition"""
+
+    body = workflow_template(encoding, caching).render(session_data, screenshots, examples)
+    body["inferenceConfig"] = WORKFLOW_INFERENCE_CONFIG
+    return body
+
+
+def workflow_cache_key(
+    model_id: str,
+    session_data: dict,
+    screenshots: list[str],
+    encoding: str = "pretty",
+    tenant_scoped: bool = False
+) -> str:
+    """Response cache key of the body build_workflow_body makes for the session.
+    tenant_scoped is for prompts that held the tenant's own examples: those are
+    never replayed to another tenant."""
+
+    config = {**WORKFLOW_INFERENCE_CONFIG, "prompt_encoding": encoding}
+    if tenant_scoped:
+        config["tenant"] = session_data.get("user_id")
+    return make_cache_key(model_id, config, session_data, screenshots)
+
+
+def build_continuation_body(
+    session_data: dict,
+    screenshots: list[str],
+    partial: str,
+    encoding: str = "pretty",
+    examples: Sequence[str] = (),
+    caching: bool = True
+) -> dict:
+    """The workflow request with the truncated output as the start of the
+    assistant turn, so the model writes only the missing tail"""
+
+    body = build_workflow_body(session_data, screenshots, encoding, examples, caching)
+    body["messages"].append({"role": "assistant", "content": [{"text": partial.rstrip()}]})
+    return body
+
+
+ENRICHMENT_INFERENCE_CONFIG = {
+    "maxTokens": 1024,
+    "temperature": 0.1,
+    "topP": 0.9
+}
+
+# Instructions for each hybrid-mode enrichment task; the payload JSON follows
+ENRICHMENT_PROMPTS = {
+    "selectors": """These step segments come from a recorded {application} session. Steps marked "resolve" \
+were recorded only as screen coordinates. Using the neighbouring steps, the segment location and any \
+element or screen text given, propose a robust selector and a clearer description for each "resolve" step.
+
+Output ONLY valid JSON:
+{{"steps": [{{"step_id": "string", "description": "string", "selector": {{"type": "text|xpath|css", "value": "string"}}}}]}}
+Omit a step if you cannot do better than its coordinates.""",
+    "variables": """These values were typed during a recorded {application} session. Pick the ones that \
+should become workflow variables because they would change between runs (names, emails, search terms, \
+ids, dates). Use snake_case names and copy each value exactly.
+
+Output ONLY valid JSON:
+{{"variables": {{"name": "value as typed"}}}}""",
+}
+
+
+def build_enrichment_body(task: str, payload: dict) -> dict:
+    """Request body for one hybrid-mode enrichment task"""
+
+    instructions = ENRICHMENT_PROMPTS[task].format(application=payload.get("application", "application"))
+    prompt = f"{instructions}\n\nINPUT:\n{json.dumps(payload, separators=(',', ':'), ensure_ascii=False)}"
+    return {
+        "messages": [
+            {
+                "role": "user",
+                "content": [{"text": prompt}]
             }
+        ],
+        "inferenceConfig": ENRICHMENT_INFERENCE_CONFIG
+    }
+
+
+CONNECTION_TEST_BODY = {
+    "messages": [
+        {
+            "role": "user",
+            "content": [{"text": "Say 'connected' if you receive this."}]
         }
-        
+    ],
+    "inferenceConfig": {
+        "maxTokens": 10,
+        "temperature": 0
+    }
+}
+
+
+def extract_response_text(response_body: dict) -> str:
+    """Text of the first content block of an invoke_model response"""
+    return response_body["output"]["message"]["content"][0]["text"]
+
+
+class BedrockClient:
+    def __init__(
+        self,
+        region: str = "us-east-1",
+        model_id: str = "amazon.nova-pro-v1:0",
+        cache: Optional[ResponseCache] = None,
+        prompt_encoding: str = "compact",
+        screenshot_index: Optional[ScreenshotIndex] = None,
+        pool_config: Optional[ClientPoolConfig] = None,
+        endpoint_url: Optional[str] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        example_index: Optional[ExampleIndex] = None,
+        prompt_caching: bool = True
+    ):
+        self.region = region
+        self.model_id = model_id
+        self.cache = cache
+        self.prompt_encoding = prompt_encoding
+        self.screenshot_index = screenshot_index
+        self.pool_config = pool_config
+        self.endpoint_url = endpoint_url
+        self.rate_limiter = rate_limiter
+        self.example_index = example_index
+        self.prompt_caching = prompt_caching
+        # Shared per process: every BedrockClient in a worker uses one connection pool
+        self.client = get_client("bedrock-runtime", region, pool_config, endpoint_url)
+
+    def for_model(self, model_id: str) -> "BedrockClient":
+        """Client for another model with this one's settings and shared boto3 client"""
+        client = copy.copy(self)
+        client.model_id = model_id
+        return client
+
+    def analyze_screenshot(self, image_base64: str, prompt: str) -> str:
+        """Analyze a screenshot with Nova Pro vision capabilities.
+        Near-identical screens are answered from the screenshot index."""
+
+        image_hash = None
+        if self.screenshot_index is not None:
+            image_hash = screenshot_hash(image_base64)
+            if image_hash is not None:
+                cached = self.screenshot_index.get(image_hash, prompt)
+                if cached is not None:
+                    return cached
+
+        with bedrock_call("analyze_screenshot", self.model_id):
+            analysis = self._invoke(build_screenshot_body(image_base64, prompt))
+
+        if image_hash is not None:
+            self.screenshot_index.set(image_hash, prompt, analysis)
+
+        return analysis
+
+    def generate_workflow(self, session_data: dict, screenshots: list[str], use_cache: bool = True) -> str:
+        """Generate workflow definition from session timeline and screenshots.
+        Answered from the response cache when remember_workflow stored one,
+        unless use_cache is False (the caller already looked)."""
+
+        if use_cache:
+            cached = self.cached_workflow(session_data, screenshots)
+            if cached is not None:
+                return cached
+
+        with timed("prompt_build"):
+            body = self._workflow_body(session_data, screenshots)
+        with bedrock_call("generate_workflow", self.model_id), tenant_scope(session_data.get("user_id")):
+            text = self._invoke(body)
+
+        return text
+
+    def continue_workflow(self, session_data: dict, screenshots: list[str], partial: str) -> str:
+        """Tail of a workflow definition whose output stopped at maxTokens.
+        Not cached: the completed output is, once it validates."""
+
+        with timed("prompt_build"):
+            body = build_continuation_body(
+                session_data, screenshots, partial, self.prompt_encoding,
+                self._examples(session_data), self.prompt_caching
+            )
+        with bedrock_call("continue_workflow", self.model_id), tenant_scope(session_data.get("user_id")):
+            text = self._invoke(body)
+
+        return text
+
+    def enrich_workflow(self, task: str, payload: dict) -> str:
+        """Run one hybrid-mode enrichment task (see ENRICHMENT_PROMPTS)"""
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_cache_key(self.model_id, {**ENRICHMENT_INFERENCE_CONFIG, "task": task}, payload)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        with bedrock_call("enrich_workflow", self.model_id):
+            text = self._invoke(build_enrichment_body(task, payload))
+
+        if cache_key is not None:
+            self.cache.set(cache_key, text)
+
+        return text
+
+    def generate_workflow_stream(self, session_data: dict, screenshots: list[str]) -> Iterator[str]:
+        """Generate a workflow definition, yielding text fragments as the model writes them"""
+
+        cached = self.cached_workflow(session_data, screenshots)
+        if cached is not None:
+            yield cached
+            return
+
+        with timed("prompt_build"):
+            body = self._workflow_body(session_data, screenshots)
+
+        reserved = estimate_body_tokens(body) if self.rate_limiter is not None else 0
+        # Times the whole stream, from request to the last fragment
+        with bedrock_call("generate_workflow_stream", self.model_id):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(reserved, session_data.get("user_id"))
+            try:
+                response = self.client.invoke_model_with_response_stream(
+                    modelId=self.model_id,
+                    contentType="application/json",
+                    accept="application/json",
+                    body=json.dumps(body)
+                )
+            except Exception as e:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.settle(reserved, 0)
+                    if is_throttle(e):
+                        self.rate_limiter.on_throttle()
+                raise
+
+            settled = False
+            try:
+                for event in response["body"]:
+                    chunk = event.get("chunk")
+                    if not chunk:
+                        continue
+                    payload = json.loads(chunk["bytes"])
+                    if "metadata" in payload:
+                        record_usage(self.model_id, payload["metadata"].get("usage"))
+                        if self.rate_limiter is not None:
+                            self.rate_limiter.record_usage(reserved, payload["metadata"].get("usage"))
+                            settled = True
+                    text = payload.get("contentBlockDelta", {}).get("delta", {}).get("text")
+                    if text:
+                        yield text
+            finally:
+                # A stream that failed, was abandoned or sent no usage returns its reservation
+                if self.rate_limiter is not None and not settled:
+                    self.rate_limiter.settle(reserved, 0)
+
+    def cached_workflow(self, session_data: dict, screenshots: list[str]) -> Optional[str]:
+        """Workflow output remember_workflow stored for the session, if any"""
+        if self.cache is None:
+            return None
+        return self.cache.get(self._workflow_cache_key(session_data, screenshots))
+
+    def remember_workflow(self, session_data: dict, screenshots: list[str], text: str) -> None:
+        """Cache workflow output for the session. Callers store only output that
+        validated, so a malformed answer is never replayed to a retry."""
+        if self.cache is not None:
+            self.cache.set(self._workflow_cache_key(session_data, screenshots), text)
+
+    def _workflow_body(self, session_data: dict, screenshots: list[str]) -> dict:
+        return build_workflow_body(
+            session_data, screenshots, self.prompt_encoding, self._examples(session_data), self.prompt_caching
+        )
+
+    def _examples(self, session_data: dict) -> list[str]:
+        """Few-shot examples for the prompt: the tenant's accepted workflows of similar
+        sessions. Only the tenant is in the cache key; any answer it accepted will do."""
+        if self.example_index is None:
+            return []
+        return self.example_index.retrieve(session_data)
+
+    def _workflow_cache_key(self, session_data: dict, screenshots: list[str]) -> str:
+        return workflow_cache_key(
+            self.model_id, session_data, screenshots, self.prompt_encoding, self.example_index is not None
+        )
+
+    def _invoke(self, body: dict) -> str:
+        """Invoke the model and return the text of the first content block.
+        With a rate limiter the call first waits for quota, fairly by tenant."""
+
+        if self.rate_limiter is None:
+            response_body = self._send(body)
+        else:
+            response_body = self.rate_limiter.run(lambda: self._send(body), estimate_body_tokens(body))
+
+        record_usage(self.model_id, response_body.get("usage"))
+        return extract_response_text(response_body)
+
+    def _send(self, body: dict) -> dict:
         response = self.client.invoke_model(
             modelId=self.model_id,
             contentType="application/json",
             accept="application/json",
             body=json.dumps(body)
         )
-        
-        response_body = json.loads(response["body"].read())
-        return response_body["output"]["message"]["content"][0]["text"]
-    
+        return json.loads(response["body"].read())
+
     def test_connection(self) -> bool:
         """Test if Bedrock connection works"""
         try:
-            body = {
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [{"text": "Say 'connected' if you receive this."}]
-                    }
-                ],
-                "inferenceConfig": {
-                    "maxTokens": 10,
-                    "temperature": 0
-                }
-            }
-            
             response = self.client.invoke_model(
                 modelId=self.model_id,
                 contentType="application/json",
                 accept="application/json",
-                body=json.dumps(body)
+                body=json.dumps(CONNECTION_TEST_BODY)
             )
-            
+
             return True
         except Exception as e:
-            print(f"Connection test failed: {e}")
+            logger.warning("Connection test failed: %s", e)
             return False
\ No newline at end of file
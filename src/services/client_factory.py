@@ -0,0 +1,224 @@
+import logging
+import os
+import threading
+from typing import Optional
+
+import boto3
+import httpx
+from botocore.config import Config
+from pydantic import BaseModel, Field
+
+from src.services.metrics import (
+    POOL_CONNECTIONS_IDLE, POOL_CONNECTIONS_IN_USE, POOL_CONNECTIONS_MAX, POOL_FULL_DISCARDS, REGISTRY
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class ClientPoolConfig(BaseModel):
+    """Connection pool and timeout settings shared by AWS clients"""
+    max_pool_connections: int = Field(50, description="Connections kept per endpoint; size to peak concurrency")
+    tcp_keepalive: bool = Field(True, description="Send TCP keep-alives on idle pooled connections")
+    connect_timeout: float = Field(5.0, description="Seconds to establish a connection")
+    read_timeout: float = Field(120.0, description="Seconds to wait for response bytes")
+    max_attempts: int = Field(3, description="Retries after the first attempt (botocore counts them this way)")
+    retry_mode: str = Field("adaptive", description="botocore retry mode")
+
+    class Config:
+        frozen = True
+
+    @classmethod
+    def from_env(cls) -> "ClientPoolConfig":
+        defaults = cls()
+        return cls(
+            max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", defaults.max_pool_connections)),
+            tcp_keepalive=os.getenv("AWS_TCP_KEEPALIVE", "true").lower() in ("1", "true", "yes"),
+            connect_timeout=float(os.getenv("AWS_CONNECT_TIMEOUT", defaults.connect_timeout)),
+            read_timeout=float(os.getenv("AWS_READ_TIMEOUT", defaults.read_timeout)),
+            max_attempts=int(os.getenv("AWS_MAX_ATTEMPTS", defaults.max_attempts)),
+            retry_mode=os.getenv("AWS_RETRY_MODE", defaults.retry_mode),
+        )
+
+    def botocore_config(self) -> Config:
+        return Config(
+            max_pool_connections=self.max_pool_connections,
+            tcp_keepalive=self.tcp_keepalive,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            retries={"max_attempts": self.max_attempts, "mode": self.retry_mode}
+        )
+
+
+class _PoolFullCounter(logging.Handler):
+    """Counts urllib3 "Connection pool is full" warnings: a request found every
+    pooled connection busy, opened an extra one and threw it away afterwards"""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if str(record.msg).startswith("Connection pool is full"):
+            self.count += 1
+            POOL_FULL_DISCARDS.inc()
+
+
+_clients: dict[tuple, object] = {}
+# Shared client -> the boto3 session it was created from, for its credentials
+_sessions: dict[object, boto3.session.Session] = {}
+_clients_lock = threading.Lock()
+_pool_full = _PoolFullCounter()
+logging.getLogger("urllib3.connectionpool").addHandler(_pool_full)
+
+
+def get_client(
+    service_name: str,
+    region: str = "us-east-1",
+    config: Optional[ClientPoolConfig] = None,
+    endpoint_url: Optional[str] = None
+):
+    """Process-wide boto3 client for (service, region, config, endpoint).
+
+    boto3 clients are thread-safe once created, so every BedrockClient and
+    worker thread in a process shares one client and its connection pool.
+    Creation is serialized because boto3 sessions are not thread-safe.
+    """
+
+    config = config or ClientPoolConfig()
+    key = (service_name, region, config, endpoint_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            session = boto3.session.Session(region_name=region)
+            client = session.client(
+                service_name,
+                region_name=region,
+                endpoint_url=endpoint_url,
+                config=config.botocore_config()
+            )
+            _sessions[client] = session
+            _clients[key] = client
+    return client
+
+
+def warm_up(client, connections: int = 2) -> int:
+    """Resolve credentials and open up to `connections` TLS connections to the
+    client's endpoint so the first requests skip the handshakes. Returns the
+    number of connections opened; failures are reported and skipped."""
+
+    try:
+        credentials = _credentials(client)
+        if credentials is not None:
+            credentials.get_frozen_credentials()
+    except Exception as e:
+        logger.warning("Credential warm-up failed: %s", e)
+
+    pool = _endpoint_pool(client)
+    if pool is None:
+        return 0
+    opened = []
+    try:
+        for _ in range(min(connections, pool.pool.maxsize)):
+            conn = pool._get_conn()
+            opened.append(conn)
+            if conn.sock is None:
+                conn.connect()
+    except Exception as e:
+        logger.warning("Connection warm-up failed: %s", e)
+    finally:
+        for conn in opened:
+            try:
+                pool._put_conn(conn)
+            except Exception:
+                conn.close()
+    return sum(1 for conn in opened if getattr(conn, "sock", None) is not None)
+
+
+def check_endpoint(client, timeout: float = 2.0) -> int:
+    """Resolve the client's credentials and send one unsigned GET to its
+    endpoint over the shared pool (a new connection if the pool cannot be
+    reached), returning the HTTP status. Costs no inference; raises if
+    credentials are missing or the endpoint is unreachable."""
+
+    credentials = _credentials(client)
+    if credentials is None:
+        raise RuntimeError("No AWS credentials found")
+    credentials.get_frozen_credentials()
+
+    pool = _endpoint_pool(client)
+    if pool is None:
+        return httpx.get(client.meta.endpoint_url, timeout=timeout).status_code
+    response = pool.urlopen("GET", "/", retries=False, timeout=timeout)
+    return response.status
+
+
+def pool_stats() -> dict:
+    """Connection reuse and saturation for every shared client's endpoint pool.
+    Pool counters are left out for a client whose pool cannot be inspected."""
+
+    clients = []
+    for (service_name, region, config, _), client in list(_clients.items()):
+        entry = {
+            "service": service_name,
+            "region": region,
+            "endpoint": client.meta.endpoint_url,
+            "max_pool_connections": config.max_pool_connections,
+        }
+        pool = _endpoint_pool(client)
+        if pool is not None:
+            try:
+                requests = pool.num_requests
+                opened = pool.num_connections
+                entry.update({
+                    "requests": requests,
+                    "connections_opened": opened,
+                    "reuse_rate": max(0.0, 1 - opened / requests) if requests else 0.0,
+                    "idle_connections": sum(1 for conn in list(pool.pool.queue) if conn is not None),
+                    "in_use": max(0, pool.pool.maxsize - pool.pool.qsize()),
+                })
+            except Exception as e:
+                logger.debug("Pool stats unavailable for %s: %s", service_name, e)
+        clients.append(entry)
+    return {"clients": clients, "pool_full_discards": _pool_full.count}
+
+
+def _export_pool_gauges() -> None:
+    """Set the pool saturation gauges from pool_stats before /metrics renders"""
+
+    for entry in pool_stats()["clients"]:
+        labels = {"service": entry["service"], "region": entry["region"], "endpoint": entry["endpoint"]}
+        POOL_CONNECTIONS_MAX.set(entry["max_pool_connections"], **labels)
+        if "in_use" in entry:
+            POOL_CONNECTIONS_IN_USE.set(entry["in_use"], **labels)
+            POOL_CONNECTIONS_IDLE.set(entry["idle_connections"], **labels)
+
+
+REGISTRY.add_collector(_export_pool_gauges)
+
+
+def _credentials(client):
+    """Credentials of the session a shared client was created from; a client made
+    elsewhere gets the default chain. None if there are none."""
+
+    session = _sessions.get(client)
+    if session is None:
+        session = boto3.session.Session(region_name=client.meta.region_name)
+    return session.get_credentials()
+
+
+def _endpoint_pool(client):
+    """urllib3 connection pool behind a boto3 client's endpoint, or None when
+    botocore's internals differ from what this expects"""
+
+    try:
+        manager = client._endpoint.http_session._manager
+        return manager.connection_from_url(client.meta.endpoint_url)
+    except Exception as e:
+        # Called on every stats read, so kept out of the default log level
+        logger.debug("Connection pool of %s unavailable: %s", client.meta.endpoint_url, e)
+        return None
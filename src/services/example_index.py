@@ -0,0 +1,357 @@
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from src.models.workflow import WorkflowDefinition
+from src.services.metrics import CACHE_REQUESTS
+from src.services.session_encoder import estimate_tokens
+
+
+# Step fields left out of a rendered example when they hold the model defaults
+EXAMPLE_STEP_DEFAULTS = {
+    "wait_after": 0.5,
+    "retry_count": 3,
+    "on_failure": "stop",
+}
+
+# Workflow fields that say nothing about how the session was turned into steps
+EXAMPLE_OMITTED_FIELDS = ("workflow_id", "version", "metadata")
+
+# A value that is already a variable reference, e.g. {{email}} or {{item.step2_text}}
+PLACEHOLDER = re.compile(r"\{\{[\w.]+\}\}")
+
+
+def event_types(session_data: dict) -> list[str]:
+    return [str(event.get("event_type")) for event in session_data.get("events", [])]
+
+
+def type_ngrams(types: list[str], sizes: tuple[int, ...] = (1, 2, 3)) -> Counter:
+    """Counts of the event-type n-grams of a session"""
+
+    grams = Counter()
+    for n in sizes:
+        for i in range(len(types) - n + 1):
+            grams[">".join(types[i:i + n])] += 1
+    return grams
+
+
+def render_example(application: str, types: list[str], workflow: dict, max_steps: int) -> str:
+    """A stored workflow as a compact few-shot example: the session's event
+    types (runs collapsed) and the workflow JSON with default fields dropped.
+    Variable values and typed text are replaced by {{name}} placeholders."""
+
+    runs = []
+    for event_type in types:
+        if runs and runs[-1][0] == event_type:
+            runs[-1][1] += 1
+        else:
+            runs.append([event_type, 1])
+    events = ", ".join(f"{event_type} x{count}" if count > 1 else event_type for event_type, count in runs)
+
+    steps = workflow.get("steps", [])[:max_steps]
+    variables = workflow.get("variables", {})
+    placeholders = {
+        value: f"{{{{{name}}}}}" for name, value in variables.items() if isinstance(value, str) and value
+    }
+    shown = {key: value for key, value in workflow.items() if key not in EXAMPLE_OMITTED_FIELDS}
+    shown["steps"] = [_redact_step(step, placeholders) for step in steps]
+    shown["variables"] = {name: _redact_variable(name, value) for name, value in variables.items()}
+    omitted = len(workflow.get("steps", [])) - len(steps)
+    return (
+        f"Session ({application}): {events}\n"
+        f"Workflow{f' (first {len(steps)} steps, {omitted} more omitted)' if omitted else ''}:\n"
+        f"{json.dumps(_prune(shown), separators=(',', ':'), ensure_ascii=False, default=str)}"
+    )
+
+
+def _redact_variable(name: str, value):
+    """Placeholder for a variable's value; a loop's item list keeps only its keys"""
+
+    if isinstance(value, list):
+        if value and isinstance(value[0], dict):
+            return [{key: f"{{{{item.{key}}}}}" for key in value[0]}]
+        return [f"{{{{{name}}}}}"]
+    return f"{{{{{name}}}}}"
+
+
+def _redact_step(step: dict, placeholders: dict[str, str]) -> dict:
+    """The step with typed text, in its parameters and description, replaced by
+    the variable that holds it or by {{text}}; loop bodies are redacted too"""
+
+    parameters = step.get("parameters") or {}
+    if step.get("action") == "LOOP" and isinstance(parameters.get("steps"), list):
+        body = [_redact_step(inner, placeholders) for inner in parameters["steps"]]
+        return {**step, "parameters": {**parameters, "steps": body}}
+
+    text = parameters.get("text")
+    if step.get("action") != "TYPE_TEXT" or not isinstance(text, str) or PLACEHOLDER.fullmatch(text):
+        return step
+    placeholder = placeholders.get(text, "{{text}}")
+    description = str(step.get("description", ""))
+    # Event-only descriptions hold the first 50 characters
+    for typed in (text, text[:50]):
+        if typed:
+            description = description.replace(typed, placeholder)
+    return {**step, "description": description, "parameters": {**parameters, "text": placeholder}}
+
+
+def _prune(value):
+    """Drop None values, empty containers, screenshot references and default step fields"""
+
+    if isinstance(value, dict):
+        pruned = {}
+        for key, item in value.items():
+            item = _prune(item)
+            if item is None or item == {} or item == [] or key.startswith("screenshot_"):
+                continue
+            if key in EXAMPLE_STEP_DEFAULTS and item == EXAMPLE_STEP_DEFAULTS[key]:
+                continue
+            pruned[key] = item
+        return pruned
+    if isinstance(value, list):
+        return [_prune(item) for item in value]
+    return value
+
+
+class _Example:
+    __slots__ = ("signature", "owner", "application", "types", "workflow", "grams", "norm")
+
+    def __init__(
+        self,
+        signature: str,
+        owner: str,
+        application: str,
+        types: list[str],
+        workflow: dict,
+        sizes: tuple[int, ...]
+    ):
+        self.signature = signature
+        self.owner = owner
+        self.application = application
+        self.types = types
+        self.workflow = workflow
+        self.grams = type_ngrams(types, sizes)
+        self.norm = math.sqrt(sum(count * count for count in self.grams.values())) or 1.0
+
+
+class ExampleIndex:
+    """Accepted workflows, retrieved as few-shot examples for similar sessions.
+
+    Examples belong to the tenant (the session's user_id) that added them and
+    are only retrieved for that tenant's sessions; sessions without a user_id
+    share one anonymous pool. Sessions are compared by cosine similarity of
+    their event-type n-gram counts through an inverted index per tenant and
+    application. Other applications' examples are considered only when the
+    session's own has fewer than k similar ones, and their similarity counts
+    at cross_application_weight. Adding a session with the same tenant,
+    application and event types replaces the older example. With a path,
+    examples are kept in SQLite and processes sharing it pick up each other's
+    additions every refresh_seconds.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        k: int = 2,
+        max_examples: int = 5000,
+        min_similarity: float = 0.3,
+        cross_application_weight: float = 0.5,
+        ngram_sizes: tuple[int, ...] = (1, 2, 3),
+        max_example_steps: int = 8,
+        max_example_tokens: int = 1200,
+        refresh_seconds: float = 5.0
+    ):
+        self.path = path
+        self.k = k
+        self.max_examples = max_examples
+        self.min_similarity = min_similarity
+        self.cross_application_weight = cross_application_weight
+        self.ngram_sizes = ngram_sizes
+        self.max_example_steps = max_example_steps
+        self.max_example_tokens = max_example_tokens
+        self.refresh_seconds = refresh_seconds
+        self.hits = 0
+        self.misses = 0
+        self._examples: OrderedDict[str, _Example] = OrderedDict()
+        # (owner, application) -> n-gram -> {signature: count}
+        self._postings: dict[tuple[str, str], dict[str, dict[str, int]]] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last_row = 0
+        self._synced_at = 0.0
+
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS examples (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    signature TEXT NOT NULL UNIQUE,
+                    owner TEXT,
+                    application TEXT NOT NULL,
+                    event_types TEXT NOT NULL,
+                    workflow TEXT NOT NULL
+                )"""
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(examples)")}
+            if "owner" not in columns:
+                # Rows from before examples had owners are never retrieved
+                self._conn.execute("ALTER TABLE examples ADD COLUMN owner TEXT")
+            self._sync()
+
+    def add(self, session_data: dict, workflow: WorkflowDefinition) -> str:
+        """Store an accepted workflow for the session it was generated from; returns its id"""
+
+        owner = str(session_data.get("user_id") or "")
+        application = str(session_data.get("application", ""))
+        types = event_types(session_data)
+        signature = hashlib.sha256(
+            json.dumps([owner, application.lower(), types], separators=(",", ":")).encode("utf-8")
+        ).hexdigest()[:16]
+        workflow_dict = workflow.model_dump(mode="json")
+
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO examples (signature, owner, application, event_types, workflow) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (signature, owner, application, json.dumps(types), json.dumps(workflow_dict))
+                )
+                self._conn.execute(
+                    "DELETE FROM examples WHERE id <= (SELECT MAX(id) FROM examples) - ?", (self.max_examples,)
+                )
+            self._insert(_Example(signature, owner, application, types, workflow_dict, self.ngram_sizes))
+        return signature
+
+    def retrieve(self, session_data: dict, k: Optional[int] = None) -> list[str]:
+        """Rendered examples for the k most similar sessions the same tenant
+        stored, most similar first, within max_example_tokens"""
+
+        k = self.k if k is None else k
+        if self._conn is not None and time.monotonic() - self._synced_at >= self.refresh_seconds:
+            with self._lock:
+                self._sync()
+
+        owner = str(session_data.get("user_id") or "")
+        application = str(session_data.get("application", "")).lower()
+        grams = type_ngrams(event_types(session_data), self.ngram_sizes)
+        norm = math.sqrt(sum(count * count for count in grams.values())) or 1.0
+
+        with self._lock:
+            scored = self._score(self._postings.get((owner, application), {}), grams, norm, 1.0)
+            # The tenant's other applications are searched only when this one has too few similar sessions
+            if len(scored) < k:
+                for (other_owner, other), postings in self._postings.items():
+                    if other_owner == owner and other != application:
+                        scored.extend(self._score(postings, grams, norm, self.cross_application_weight))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        rendered, tokens = [], 0
+        for _, example in scored[:k]:
+            text = render_example(example.application, example.types, example.workflow, self.max_example_steps)
+            cost = estimate_tokens(text)
+            if tokens + cost > self.max_example_tokens:
+                continue
+            rendered.append(text)
+            tokens += cost
+
+        with self._lock:
+            if rendered:
+                self.hits += 1
+            else:
+                self.misses += 1
+        CACHE_REQUESTS.inc(cache="example_index", result="hit" if rendered else "miss")
+        return rendered
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "examples": len(self._examples),
+                "applications": len({application for _, application in self._postings}),
+                "retrievals_with_examples": self.hits,
+                "retrievals_without": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "k": self.k,
+            }
+
+    def __len__(self) -> int:
+        return len(self._examples)
+
+    def _score(self, postings: dict, grams: Counter, norm: float, weight: float) -> list[tuple[float, _Example]]:
+        """Examples in one application's postings at or above min_similarity (lock held)"""
+
+        dots: Counter = Counter()
+        for gram, count in grams.items():
+            for signature, stored in postings.get(gram, {}).items():
+                dots[signature] += count * stored
+        scored = []
+        for signature, dot in dots.items():
+            example = self._examples[signature]
+            score = weight * dot / (norm * example.norm)
+            if score >= self.min_similarity:
+                scored.append((score, example))
+        return scored
+
+    def _insert(self, example: _Example) -> None:
+        """Add to the in-memory index (lock held), replacing an equal signature and evicting the oldest"""
+
+        self._remove(example.signature)
+        self._examples[example.signature] = example
+        postings = self._postings.setdefault((example.owner, example.application.lower()), {})
+        for gram, count in example.grams.items():
+            postings.setdefault(gram, {})[example.signature] = count
+        while len(self._examples) > self.max_examples:
+            self._remove(next(iter(self._examples)))
+
+    def _remove(self, signature: str) -> None:
+        example = self._examples.pop(signature, None)
+        if example is None:
+            return
+        scope = (example.owner, example.application.lower())
+        postings = self._postings[scope]
+        for gram in example.grams:
+            del postings[gram][signature]
+            if not postings[gram]:
+                del postings[gram]
+        if not postings:
+            del self._postings[scope]
+
+    def _sync(self) -> None:
+        """Load rows added by any process since the last sync (lock held)"""
+
+        rows = self._conn.execute(
+            "SELECT id, signature, owner, application, event_types, workflow FROM examples "
+            "WHERE id > ? AND owner IS NOT NULL ORDER BY id",
+            (self._last_row,)
+        ).fetchall()
+        for row_id, signature, owner, application, types, workflow in rows:
+            example = _Example(signature, owner, application, json.loads(types), json.loads(workflow), self.ngram_sizes)
+            self._insert(example)
+            self._last_row = row_id
+        self._synced_at = time.monotonic()
+
+
+def build_example_index() -> Optional[ExampleIndex]:
+    """Index from FEW_SHOT_EXAMPLES (examples per prompt, 0 disables) and
+    EXAMPLE_INDEX_PATH (SQLite file shared by workers; in memory if unset)"""
+
+    k = int(os.getenv("FEW_SHOT_EXAMPLES", "2"))
+    if k <= 0:
+        return None
+    return ExampleIndex(
+        path=os.getenv("EXAMPLE_INDEX_PATH"),
+        k=k,
+        max_examples=int(os.getenv("EXAMPLE_INDEX_MAX_EXAMPLES", "5000")),
+        min_similarity=float(os.getenv("EXAMPLE_MIN_SIMILARITY", "0.3")),
+    )
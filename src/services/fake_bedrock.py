@@ -0,0 +1,275 @@
+import argparse
+import base64
+import itertools
+import json
+import random
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+from pydantic import BaseModel, Field
+
+from src.services.session_encoder import estimate_tokens
+
+
+class FakeBedrockConfig(BaseModel):
+    """How the stand-in runtime behaves"""
+    latency: str = Field("fixed", description="Latency distribution: fixed, uniform or lognormal")
+    latency_ms: float = Field(0.0, description="fixed: the delay; uniform: the upper bound; lognormal: the median")
+    latency_sigma: float = Field(0.5, description="Spread of the lognormal distribution")
+    tokens_per_second: Optional[float] = Field(None, description="Also delay each response as if generated at this rate")
+    error_rate: float = Field(0.0, description="Share of requests that fail")
+    throttle_share: float = Field(0.8, description="Share of failures that are 429 throttling rather than 503")
+    outputs: list[str] = Field(default_factory=list, description="Canned outputs, cycled; empty generates a workflow")
+    stream_chunk_chars: int = Field(40, description="Characters per streamed text delta")
+    seed: int = Field(7, description="Seed for latency and error sampling")
+
+
+class FakeBedrockServer:
+    """Local stand-in for the Bedrock runtime, for tests and load benchmarks.
+
+    Speaks InvokeModel and InvokeModelWithResponseStream over HTTP, including
+    the binary event-stream framing, so BedrockClient and AsyncBedrockClient
+    run unchanged against it via endpoint_url. responder, when given, maps a
+    request body to the output text. Standalone, for the API with
+    BEDROCK_ENDPOINT_URL=http://127.0.0.1:8089:
+
+        python -m src.services.fake_bedrock --port 8089 --latency-ms 800
+    """
+
+    def __init__(
+        self,
+        config: Optional[FakeBedrockConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        responder: Optional[Callable[[dict], str]] = None
+    ):
+        self.config = config or FakeBedrockConfig()
+        self.responder = responder or self._default_output
+        self.requests = 0
+        self.errors = 0
+        self.streams = 0
+        self._rng = random.Random(self.config.seed)
+        self._outputs = itertools.cycle(self.config.outputs) if self.config.outputs else None
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeBedrockServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeBedrockServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors, "streams": self.streams}
+
+    def _sample(self) -> tuple[float, Optional[int]]:
+        """Delay in seconds before answering, and the HTTP error status if the request fails"""
+
+        config = self.config
+        with self._lock:
+            self.requests += 1
+            if config.latency == "uniform":
+                delay = self._rng.uniform(0, config.latency_ms)
+            elif config.latency == "lognormal":
+                delay = self._rng.lognormvariate(0, config.latency_sigma) * config.latency_ms
+            else:
+                delay = config.latency_ms
+            error = None
+            if self._rng.random() < config.error_rate:
+                self.errors += 1
+                error = 429 if self._rng.random() < config.throttle_share else 503
+        return delay / 1000, error
+
+    def _output(self, body: dict) -> str:
+        if self._outputs is not None:
+            with self._lock:
+                return next(self._outputs)
+        return self.responder(body)
+
+    @staticmethod
+    def _default_output(body: dict) -> str:
+        """A valid reply for each kind of request this service sends"""
+
+        messages = body.get("messages", [])
+        if messages and messages[-1]["role"] == "assistant":
+            # Continuation of a truncated output: generated outputs are never truncated
+            return ""
+        prompt = messages[0]["content"][-1].get("text", "") if messages else ""
+        if body.get("inferenceConfig", {}).get("maxTokens", 0) <= 10:
+            return "connected"
+        if "INPUT:\n" in prompt:
+            return json.dumps({"variables": {}} if '"typed_text"' in prompt else {"steps": []})
+        if "workflow definition" not in prompt:
+            return "A login form with username and password fields."
+
+        # Roughly one step per 40 prompt tokens, so bigger sessions cost more output
+        steps = max(1, min(60, estimate_tokens(prompt) // 40))
+        return json.dumps({
+            "workflow_id": "wf-fake",
+            "name": "Generated workflow",
+            "description": "Produced by the local Bedrock stand-in",
+            "application": "Chrome Browser",
+            "steps": [
+                {
+                    "step_id": f"step_{i}",
+                    "action": "CLICK",
+                    "description": f"Click control {i}",
+                    "selector": {"type": "coordinates", "value": {"x": 10 * i, "y": 20}},
+                    "parameters": {"button": "left"}
+                }
+                for i in range(1, steps + 1)
+            ]
+        })
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is normal under load
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+ERROR_TYPES = {
+    429: ("ThrottlingException", "Too many requests, please wait before trying again."),
+    503: ("ServiceUnavailableException", "Bedrock is unable to process your request."),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        fake: FakeBedrockServer = self.server.fake
+        match = re.fullmatch(r"/model/([^/]+)/(invoke|invoke-with-response-stream)", self.path)
+        if match is None:
+            self._send_json(404, {"message": f"Unknown operation {self.path}"})
+            return
+
+        delay, error = fake._sample()
+        if error is not None:
+            time.sleep(delay)
+            error_type, message = ERROR_TYPES[error]
+            self._send_json(error, {"message": message}, {"x-amzn-ErrorType": f"{error_type}:http://internal.amazon.com/coral/com.amazon.bedrock/"})
+            return
+
+        body = json.loads(raw)
+        text = fake._output(body)
+        usage = {
+            "inputTokens": estimate_tokens(raw.decode("utf-8", "replace")),
+            "outputTokens": estimate_tokens(text),
+        }
+        usage["totalTokens"] = usage["inputTokens"] + usage["outputTokens"]
+        generation = usage["outputTokens"] / fake.config.tokens_per_second if fake.config.tokens_per_second else 0.0
+
+        if match.group(2) == "invoke":
+            time.sleep(delay + generation)
+            self._send_json(200, {
+                "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+                "stopReason": "end_turn",
+                "usage": usage
+            })
+        else:
+            with fake._lock:
+                fake.streams += 1
+            time.sleep(delay)
+            self._stream(text, usage, generation, fake.config.stream_chunk_chars)
+
+    def _stream(self, text: str, usage: dict, generation: float, chunk_chars: int) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        pieces = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        pause = generation / len(pieces) if pieces else 0.0
+        self._write_chunk(encode_event({"messageStart": {"role": "assistant"}}))
+        for piece in pieces:
+            time.sleep(pause)
+            self._write_chunk(encode_event({"contentBlockDelta": {"delta": {"text": piece}, "contentBlockIndex": 0}}))
+        self._write_chunk(encode_event({"contentBlockStop": {"contentBlockIndex": 0}}))
+        self._write_chunk(encode_event({"messageStop": {"stopReason": "end_turn"}}))
+        self._write_chunk(encode_event({"metadata": {"usage": usage}}))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def encode_event(payload: dict) -> bytes:
+    """One application/vnd.amazon.eventstream message carrying a response-stream chunk"""
+
+    headers = b"".join(
+        _encode_header(name, value)
+        for name, value in ((":event-type", "chunk"), (":content-type", "application/json"), (":message-type", "event"))
+    )
+    body = json.dumps({"bytes": base64.b64encode(json.dumps(payload).encode()).decode()}).encode()
+    prelude = struct.pack(">II", 16 + len(headers) + len(body), len(headers))
+    message = prelude + struct.pack(">I", zlib.crc32(prelude)) + headers + body
+    return message + struct.pack(">I", zlib.crc32(message))
+
+
+def _encode_header(name: str, value: str) -> bytes:
+    name_bytes, value_bytes = name.encode(), value.encode()
+    # Header value type 7 is a UTF-8 string
+    return struct.pack(">B", len(name_bytes)) + name_bytes + b"\x07" + struct.pack(">H", len(value_bytes)) + value_bytes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Bedrock runtime stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="fixed", choices=["fixed", "uniform", "lognormal"])
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeBedrockServer(FakeBedrockConfig(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate
+    ), host=args.host, port=args.port)
+    print(f"Fake Bedrock runtime on {server.endpoint_url}")
+    server.serve_forever()
@@ -0,0 +1,229 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+import httpx
+from botocore.exceptions import BotoCoreError, ClientError
+
+from src.services.bedrock_client import BedrockClient
+from src.services.client_factory import check_endpoint
+
+
+# Bedrock error codes that mean the service, not the request, is the problem.
+# Throttling is quota pushback, not an outage: the rate limiter backs off for it.
+OUTAGE_ERROR_CODES = {
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelTimeoutException",
+    "ModelNotReadyException",
+}
+
+
+def is_outage(error: BaseException) -> bool:
+    """Whether a model call failed because Bedrock is unavailable"""
+
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code")
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+        return code in OUTAGE_ERROR_CODES or status >= 500
+    return isinstance(error, (BotoCoreError, httpx.TransportError, ConnectionError, TimeoutError))
+
+
+class CircuitBreaker:
+    """Stops sending AI traffic to Bedrock while it is failing.
+
+    closed: calls flow; failure_threshold consecutive outage failures open it.
+    open: calls are refused for reset_timeout seconds.
+    half_open: one trial call is let through; its outcome closes or re-opens.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self.opened = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def allow(self) -> bool:
+        """Whether a model call may go ahead now"""
+        return self.acquire() is not None
+
+    def acquire(self) -> Optional[bool]:
+        """None if a model call must be shed now, else whether it holds the
+        half-open trial; a holder must record an outcome or release() it"""
+
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return False
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            self.rejected += 1
+            return None
+
+    def release(self) -> None:
+        """End a trial that finished without recording an outcome (no model
+        call was made, or the caller went away) so the next call can try"""
+
+        with self._lock:
+            self._trial = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            reopen = self._trial
+            self._trial = False
+            if reopen or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = self._clock()
+                self.opened += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._state(),
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+
+class BedrockProber:
+    """Bedrock connectivity, probed in the background and cached for ttl_seconds.
+
+    The default light probe resolves credentials and makes one unsigned
+    request to the runtime endpoint over the shared connection pool: no
+    inference, no cost. mode="model" runs the old one-token inference
+    instead. Failed probes count against the circuit breaker. Only a
+    successful model probe closes it: an endpoint that answers a GET may
+    still be timing out on inference, so after a light probe recovery is
+    left to the breaker's half-open trial.
+    """
+
+    def __init__(
+        self,
+        bedrock: BedrockClient,
+        breaker: Optional[CircuitBreaker] = None,
+        ttl_seconds: float = 30.0,
+        mode: str = "light",
+        timeout: float = 2.0
+    ):
+        self.bedrock = bedrock
+        self.breaker = breaker
+        self.ttl_seconds = ttl_seconds
+        self.mode = mode
+        self.timeout = timeout
+        self.probes = 0
+        self._last: Optional[dict] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def status(self) -> dict:
+        """Last probe result, probing first if it is older than ttl_seconds"""
+
+        if self._last is not None and time.monotonic() - self._checked < self.ttl_seconds:
+            return self._last
+        with self._lock:
+            # Another caller may have probed while this one waited
+            if self._last is not None and time.monotonic() - self._checked < self.ttl_seconds:
+                return self._last
+            return self._probe()
+
+    def refresh(self) -> dict:
+        with self._lock:
+            return self._probe()
+
+    async def run(self, interval_seconds: float) -> None:
+        """Re-probe every interval_seconds until cancelled"""
+
+        while True:
+            await asyncio.to_thread(self.refresh)
+            await asyncio.sleep(interval_seconds)
+
+    def watch(self, stop: threading.Event, interval_seconds: float) -> None:
+        """Re-probe every interval_seconds until stop is set, for processes without an event loop"""
+
+        while not stop.is_set():
+            self.refresh()
+            stop.wait(interval_seconds)
+
+    def _probe(self) -> dict:
+        started = time.perf_counter()
+        error = None
+        try:
+            if self.mode == "model":
+                if not self.bedrock.test_connection():
+                    error = "Model invocation failed"
+            else:
+                self._light_check()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if self.breaker is not None:
+            if error is not None:
+                self.breaker.record_failure()
+            elif self.mode == "model" and self.breaker.state != "closed":
+                # The model answered, so the outage is over even if no traffic was let through
+                self.breaker.record_success()
+
+        self.probes += 1
+        self._checked = time.monotonic()
+        self._last = {
+            "connected": error is None,
+            "mode": self.mode,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "error": error,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+        }
+        return self._last
+
+    def _light_check(self) -> None:
+        # Any answer below 500 (typically 403/404 for an unsigned GET) means the endpoint is up
+        status = check_endpoint(self.bedrock.client, self.timeout)
+        if status >= 500:
+            raise RuntimeError(f"Bedrock endpoint returned HTTP {status}")
+
+
+def build_circuit_breaker() -> CircuitBreaker:
+    """Circuit breaker from CIRCUIT_FAILURE_THRESHOLD / CIRCUIT_RESET_SECONDS"""
+
+    return CircuitBreaker(
+        failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("CIRCUIT_RESET_SECONDS", "30")),
+    )
+
+
+def build_prober(bedrock: BedrockClient, breaker: Optional[CircuitBreaker] = None) -> BedrockProber:
+    """Prober from HEALTH_PROBE_TTL_SECONDS / HEALTH_PROBE_MODE (light or model)"""
+
+    return BedrockProber(
+        bedrock,
+        breaker,
+        ttl_seconds=float(os.getenv("HEALTH_PROBE_TTL_SECONDS", "30")),
+        mode=os.getenv("HEALTH_PROBE_MODE", "light"),
+    )
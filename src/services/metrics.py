@@ -0,0 +1,294 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+try:
+    from opentelemetry import trace
+except ImportError:  # spans are optional; metrics work without OpenTelemetry
+    trace = None
+
+
+# Latency buckets in seconds: sub-millisecond parsing up to multi-minute model calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Metric:
+    """A named metric with one series per combination of label values"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key: tuple, value) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0.0)
+
+    def _render_series(self, key: tuple, value: float) -> list[str]:
+        return [f"{self.name}{self._labels(key)} {_number(value)}"]
+
+
+class Gauge(Metric):
+    """A value that goes up and down; set when it is measured"""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0.0)
+
+    def _render_series(self, key: tuple, value: float) -> list[str]:
+        return [f"{self.name}{self._labels(key)} {_number(value)}"]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (not cumulative) counts, then sum and count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def sum(self, **labels) -> float:
+        series = self._series.get(self._key(labels))
+        return series[1] if series else 0.0
+
+    def _render_series(self, key: tuple, value: list) -> list[str]:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket in zip((*self.buckets, float("inf")), counts):
+            cumulative += bucket
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            bucket_label = f'le="{le}"'
+            lines.append(f"{self.name}_bucket{self._labels(key, bucket_label)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+        lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: list[Metric] = []
+        self._collectors: list[Callable[[], None]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Run collector before every render, to set gauges read from elsewhere"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: Metric) -> Metric:
+        if any(existing.name == metric.name for existing in self._metrics):
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics.append(metric)
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "workflow_stage_seconds",
+    "Time spent in each stage of workflow generation",
+    ("stage",)
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "workflow_stage_errors_total",
+    "Stage failures by exception class",
+    ("stage", "error")
+)
+BEDROCK_TOKENS = REGISTRY.counter(
+    "bedrock_tokens_total",
+    "Model tokens billed, by direction (input, output, cache_read or cache_write)",
+    ("model", "direction")
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "workflow_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ("cache", "result")
+)
+COALESCED_REQUESTS = REGISTRY.counter(
+    "workflow_coalesced_requests_total",
+    "Generations that waited on an identical in-flight request instead of calling the model"
+)
+MODEL_ROUTES = REGISTRY.counter(
+    "workflow_model_attempts_total",
+    "Routed generation attempts by model and outcome (success, invalid or error)",
+    ("model", "outcome")
+)
+MODEL_ESCALATIONS = REGISTRY.counter(
+    "workflow_model_escalations_total",
+    "Routed generations passed to a larger model because this one's output failed validation",
+    ("model",)
+)
+TRUNCATED_OUTPUTS = REGISTRY.counter(
+    "workflow_truncated_outputs_total",
+    "Model outputs still truncated after continuing; their complete steps were kept"
+)
+JOB_OUTCOMES = REGISTRY.counter(
+    "workflow_jobs_total",
+    "Job attempts by outcome (completed, retried or failed)",
+    ("outcome",)
+)
+WEBHOOK_DELIVERIES = REGISTRY.counter(
+    "workflow_webhook_deliveries_total",
+    "Job webhook calls by outcome (delivered, failed or rejected for an internal host)",
+    ("outcome",)
+)
+POOL_CONNECTIONS_IN_USE = REGISTRY.gauge(
+    "aws_pool_connections_in_use",
+    "Connections checked out of a shared AWS client's endpoint pool",
+    ("service", "region", "endpoint")
+)
+POOL_CONNECTIONS_IDLE = REGISTRY.gauge(
+    "aws_pool_connections_idle",
+    "Open connections waiting in a shared AWS client's endpoint pool",
+    ("service", "region", "endpoint")
+)
+POOL_CONNECTIONS_MAX = REGISTRY.gauge(
+    "aws_pool_connections_max",
+    "Configured size of a shared AWS client's endpoint pool",
+    ("service", "region", "endpoint")
+)
+POOL_FULL_DISCARDS = REGISTRY.counter(
+    "aws_pool_full_discards_total",
+    "Requests that found every pooled connection busy and used a throwaway one"
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_seconds",
+    "API request latency until the response starts",
+    ("method", "route", "status")
+)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Record the duration of a stage, and its failures by exception class"""
+
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        STAGE_ERRORS.inc(stage=stage, error=type(e).__name__)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+@contextmanager
+def traced(name: str, **attributes) -> Iterator[None]:
+    """OpenTelemetry span around a block when opentelemetry is installed"""
+
+    if trace is None:
+        yield
+        return
+    with trace.get_tracer(__name__).start_as_current_span(name, attributes=attributes):
+        yield
+
+
+@contextmanager
+def bedrock_call(operation: str, model_id: str) -> Iterator[None]:
+    """Stage timer (bedrock.<operation>) and span around one Bedrock request"""
+
+    with traced(f"bedrock.{operation}", **{"gen_ai.system": "aws.bedrock", "gen_ai.request.model": model_id}):
+        with timed(f"bedrock.{operation}"):
+            yield
+
+
+def record_usage(model_id: str, usage: Optional[dict]) -> None:
+    """Count the tokens reported in a Bedrock response's usage block"""
+
+    if not usage:
+        return
+    input_tokens = usage.get("inputTokens") or 0
+    output_tokens = usage.get("outputTokens") or 0
+    BEDROCK_TOKENS.inc(input_tokens, model=model_id, direction="input")
+    BEDROCK_TOKENS.inc(output_tokens, model=model_id, direction="output")
+    # Prompt caching: cached prefix tokens are reported apart from inputTokens
+    for key, direction in (("cacheReadInputTokenCount", "cache_read"), ("cacheWriteInputTokenCount", "cache_write")):
+        if usage.get(key):
+            BEDROCK_TOKENS.inc(usage[key], model=model_id, direction=direction)
+    if trace is not None:
+        span = trace.get_current_span()
+        span.set_attribute("gen_ai.usage.input_tokens", input_tokens)
+        span.set_attribute("gen_ai.usage.output_tokens", output_tokens)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
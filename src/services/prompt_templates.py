@@ -0,0 +1,112 @@
+from functools import lru_cache
+from typing import Sequence
+
+from src.models.workflow import ActionType
+from src.services.session_encoder import ENCODING_NOTES, encode_session
+
+
+WORKFLOW_SCHEMA = """{
+    "workflow_id": "string",
+    "name": "string",
+    "description": "string",
+    "version": "1.0.0",
+    "application": "string",
+    "steps": [
+        {
+            "step_id": "string",
+            "action": "CLICK|TYPE_TEXT|PRESS_KEY|etc",
+            "description": "string",
+            "selector": {
+                "type": "coordinates|text|xpath",
+                "value": "selector value"
+            },
+            "parameters": {},
+            "wait_after": 0.5,
+            "retry_count": 3,
+            "on_failure": "stop"
+        }
+    ],
+    "variables": {},
+    "preconditions": [],
+    "metadata": {}
+}"""
+
+# Parameters per action, as the deterministic converters emit them, so AI
+# and rule-based workflows replay through the same executor
+ACTION_PARAMETERS = """CLICK, RIGHT_CLICK, DOUBLE_CLICK: {"button": "left|right|middle"}
+TYPE_TEXT: {"text": "typed text"}
+PRESS_KEY, KEY_COMBINATION: {"key": "Enter", "modifiers": ["ctrl", "shift"]}
+SCROLL: {"delta_x": 0, "delta_y": -3}
+DRAG: {"end": {"x": 0, "y": 0}, "button": "left"}
+NAVIGATE: {"url": "https://..."}
+SWITCH_WINDOW: {"window_title": "string", "application": "string"}
+LOOP: {"iterations": 3, "items": "loop_1", "steps": [step objects using {{item.field}}]}, \
+where variables["loop_1"] lists one {"field": value} object per iteration"""
+
+# Bedrock caches the request prefix up to this block, so the instructions are
+# billed at the cache-read rate after the first request. Prefixes shorter than
+# the model's minimum are simply sent uncached.
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+
+class WorkflowPromptTemplate:
+    """Workflow generation prompt for one session encoding.
+
+    Everything that does not depend on the request (instructions, schema,
+    encoding note) is rendered once into the system prompt and marked as a
+    cache point. Per-request parts follow in the user turn: few-shot
+    examples, screenshots, then the session itself.
+    """
+
+    def __init__(self, encoding: str = "pretty", caching: bool = True):
+        self.encoding = encoding
+        self.caching = caching
+        note = ENCODING_NOTES[encoding]
+        self.system_text = (
+            "You analyze user session recordings and generate structured workflow definitions that can replay "
+            "the recorded actions. Screenshots, when given, come before the session data.\n\n"
+            "Output ONLY valid JSON matching this schema:\n"
+            f"{WORKFLOW_SCHEMA}\n\n"
+            f"Step action must be one of: {', '.join(action.value for action in ActionType)}.\n"
+            f"Parameters by action:\n{ACTION_PARAMETERS}\n\n"
+            "Rules:\n"
+            "- One step per user intent: merge keystrokes typed into one field into a single TYPE_TEXT step.\n"
+            "- Prefer text, xpath or css selectors when the event names the element; use coordinates otherwise.\n"
+            "- step_id values are step_1, step_2, ... in replay order.\n"
+            "- Values that would change between runs (names, emails, search terms) become variables, "
+            "referenced in parameters as {{variable_name}}."
+            + (f"\n\nIn SESSION DATA: {note}" if note else "")
+        )
+        self.system = [{"text": self.system_text}] + ([CACHE_POINT] if caching else [])
+
+    def render(self, session_data: dict, screenshots: Sequence[str] = (), examples: Sequence[str] = ()) -> dict:
+        """Request body for a session; examples are rendered few-shot workflows"""
+
+        content = []
+        if examples:
+            content.append({"text": "Accepted workflows for similar sessions, as examples:\n\n" + "\n\n".join(examples)})
+        # Screenshots (base64 PNG) go ahead of the session so the prompt can refer to them
+        content.extend({"image": {"format": "png", "source": {"bytes": image}}} for image in screenshots)
+        content.append({
+            "text": f"SESSION DATA:\n{encode_session(session_data, self.encoding)}\n\n"
+                    "Based on the event logs and screenshots provided, generate the workflow definition JSON:"
+        })
+        return {
+            "system": list(self.system),
+            "messages": [{"role": "user", "content": content}],
+        }
+
+
+@lru_cache(maxsize=None)
+def workflow_template(encoding: str = "pretty", caching: bool = True) -> WorkflowPromptTemplate:
+    """Shared, precompiled template per encoding"""
+    return WorkflowPromptTemplate(encoding, caching)
+
+
+def prompt_text(body: dict) -> str:
+    """All text a request body sends, system prompt included"""
+
+    blocks = list(body.get("system", []))
+    for message in body.get("messages", []):
+        blocks.extend(message.get("content", []))
+    return "\n".join(block["text"] for block in blocks if "text" in block)
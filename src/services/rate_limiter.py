@@ -0,0 +1,368 @@
+import asyncio
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, Optional
+
+from botocore.exceptions import ClientError
+
+from src.services.session_encoder import estimate_tokens
+
+
+# Who a model call is made for; requests queue fairly between tenants
+TENANT: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("tenant", default=None)
+
+# Rough input cost of one image block; Bedrock bills images by size, this errs high for screenshots
+IMAGE_TOKENS = 1600
+
+
+def estimate_body_tokens(body: dict) -> int:
+    """Tokens a request reserves against the TPM quota: estimated input plus
+    maxTokens, as Bedrock itself reserves before the output is known"""
+
+    tokens = 0
+    for message in body.get("messages", []):
+        for block in message.get("content", []):
+            if "text" in block:
+                tokens += estimate_tokens(block["text"])
+            elif "image" in block:
+                tokens += IMAGE_TOKENS
+    for block in body.get("system", []):
+        tokens += estimate_tokens(block.get("text", ""))
+    return tokens + body.get("inferenceConfig", {}).get("maxTokens", 0)
+
+
+@contextmanager
+def tenant_scope(tenant: Optional[str]) -> Iterator[None]:
+    """Attribute model calls made in this block (and tasks started from it) to tenant"""
+
+    token = TENANT.set(tenant)
+    try:
+        yield
+    finally:
+        TENANT.reset(token)
+
+
+def is_throttle(error: BaseException) -> bool:
+    if not isinstance(error, ClientError):
+        return False
+    code = error.response.get("Error", {}).get("Code")
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return code == "ThrottlingException" or status == 429
+
+
+class RateLimitTimeout(Exception):
+    """A request waited longer than its timeout for rate-limit capacity"""
+
+
+class MemoryLimiterStore:
+    """Bucket state for one process"""
+
+    def __init__(self):
+        self._state: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def update(self, apply: Callable[[Optional[dict]], tuple[dict, object]]):
+        with self._lock:
+            self._state, result = apply(self._state)
+            return result
+
+
+class SQLiteLimiterStore:
+    """Bucket state shared by every process on the host through one SQLite row"""
+
+    def __init__(self, path: str, name: str = "bedrock"):
+        self.path = path
+        self.name = name
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS limiter (name TEXT PRIMARY KEY, state TEXT NOT NULL)")
+        self._lock = threading.Lock()
+
+    def update(self, apply: Callable[[Optional[dict]], tuple[dict, object]]):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT state FROM limiter WHERE name = ?", (self.name,)).fetchone()
+                state, result = apply(json.loads(row[0]) if row else None)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO limiter (name, state) VALUES (?, ?)", (self.name, json.dumps(state))
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return result
+
+
+class _Ticket:
+    def __init__(self, tenant: str, tokens: int):
+        self.tenant = tenant
+        self.tokens = tokens
+
+
+class RateLimiter:
+    """Token buckets for Bedrock's requests-per-minute and tokens-per-minute quotas.
+
+    Requests reserve their estimated tokens up front and settle the
+    difference once the response reports actual usage. Throttling responses
+    cut the refill rate multiplicatively (at most once per cooldown) and each
+    success adds a little back, so workers sharing a store back off together
+    instead of retrying in lockstep. Waiting requests are served round-robin
+    by tenant (the session's user_id) within each process, so one tenant's
+    backfill cannot starve interactive traffic.
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        store=None,
+        decrease: float = 0.5,
+        increase: float = 0.02,
+        min_rate: float = 0.05,
+        cooldown: float = 2.0,
+        max_retries: int = 4,
+        poll_interval: float = 0.05,
+        clock: Callable[[], float] = time.time
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.store = store or MemoryLimiterStore()
+        self.decrease = decrease
+        self.increase = increase
+        self.min_rate = min_rate
+        self.cooldown = cooldown
+        self.max_retries = max_retries
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self.throttled = 0
+        self.waited_seconds = 0.0
+        self._waiting: OrderedDict[str, deque] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int, tenant: Optional[str] = None, timeout: Optional[float] = None) -> None:
+        """Block until the request may be sent, reserving tokens"""
+
+        ticket = self._enqueue(tenant, tokens)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._attempt(ticket)
+                if wait == 0:
+                    return
+                if timeout is not None and time.monotonic() - started + wait > timeout:
+                    raise RateLimitTimeout(f"No capacity for {tokens} tokens within {timeout}s")
+                time.sleep(min(wait, self.poll_interval))
+        finally:
+            self._dequeue(ticket)
+            self.waited_seconds += time.monotonic() - started
+
+    async def acquire_async(self, tokens: int, tenant: Optional[str] = None, timeout: Optional[float] = None) -> None:
+        """Async variant of acquire. Bucket updates take a lock and, with a shared
+        store, a SQLite write lock, so they run in a thread rather than on the loop."""
+
+        ticket = self._enqueue(tenant, tokens)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = await asyncio.to_thread(self._attempt, ticket)
+                if wait == 0:
+                    return
+                if timeout is not None and time.monotonic() - started + wait > timeout:
+                    raise RateLimitTimeout(f"No capacity for {tokens} tokens within {timeout}s")
+                await asyncio.sleep(min(wait, self.poll_interval))
+        finally:
+            self._dequeue(ticket)
+            self.waited_seconds += time.monotonic() - started
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Return over-reserved tokens to the bucket, or charge for an underestimate"""
+
+        if self.tpm is None or reserved == used:
+            return
+
+        def apply(state):
+            state = self._refill(state)
+            state["tokens"] = min(state["tokens"] + reserved - used, self.tpm * state["rate"])
+            return state, None
+
+        self.store.update(apply)
+
+    def on_throttle(self) -> None:
+        self.throttled += 1
+
+        def apply(state):
+            state = self._refill(state)
+            now = self._clock()
+            if state["decreased_at"] is None or now - state["decreased_at"] >= self.cooldown:
+                state["rate"] = max(self.min_rate, state["rate"] * self.decrease)
+                state["decreased_at"] = now
+                # Drain what was banked at the old rate so the cut takes effect at once
+                state["requests"] = min(state["requests"], 0.0)
+                state["tokens"] = min(state["tokens"], 0.0)
+            return state, None
+
+        self.store.update(apply)
+
+    def on_success(self) -> None:
+        def apply(state):
+            state = self._refill(state)
+            state["rate"] = min(1.0, state["rate"] + self.increase)
+            return state, None
+
+        self.store.update(apply)
+
+    def run(self, send: Callable[[], dict], tokens: int, tenant: Optional[str] = None) -> dict:
+        """Send a request under the limiter, retrying throttled attempts after backing
+        off. send returns the response body; its usage settles the reservation."""
+
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens, tenant)
+            try:
+                response_body = send()
+            except Exception as e:
+                self.settle(tokens, 0)
+                if is_throttle(e):
+                    self.on_throttle()
+                    if attempt < self.max_retries:
+                        continue
+                raise
+            self._succeeded(tokens, response_body)
+            return response_body
+
+    async def run_async(self, send: Callable[[], Awaitable[dict]], tokens: int, tenant: Optional[str] = None) -> dict:
+        """Async variant of run; bucket updates run off the event loop"""
+
+        for attempt in range(self.max_retries + 1):
+            await self.acquire_async(tokens, tenant)
+            try:
+                response_body = await send()
+            except Exception as e:
+                await asyncio.to_thread(self.settle, tokens, 0)
+                if is_throttle(e):
+                    await asyncio.to_thread(self.on_throttle)
+                    if attempt < self.max_retries:
+                        continue
+                raise
+            await asyncio.to_thread(self._succeeded, tokens, response_body)
+            return response_body
+
+    def record_usage(self, tokens: int, usage: Optional[dict]) -> None:
+        """Settle a reservation from a response's usage block (used by streams)"""
+
+        self.on_success()
+        if usage:
+            self.settle(tokens, (usage.get("inputTokens") or 0) + (usage.get("outputTokens") or 0))
+
+    def stats(self) -> dict:
+        def snapshot(state):
+            state = self._refill(state)
+            return state, dict(state)
+
+        state = self.store.update(snapshot)
+        with self._lock:
+            waiting = {tenant: len(tickets) for tenant, tickets in self._waiting.items()}
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "rate": round(state["rate"], 3),
+            "throttled": self.throttled,
+            "waited_seconds": round(self.waited_seconds, 3),
+            "waiting": waiting,
+        }
+
+    def _succeeded(self, tokens: int, response_body: dict) -> None:
+        self.record_usage(tokens, response_body.get("usage"))
+
+    def _enqueue(self, tenant: Optional[str], tokens: int) -> _Ticket:
+        ticket = _Ticket(tenant or TENANT.get() or "default", tokens)
+        with self._lock:
+            self._waiting.setdefault(ticket.tenant, deque()).append(ticket)
+        return ticket
+
+    def _dequeue(self, ticket: _Ticket) -> None:
+        with self._lock:
+            tickets = self._waiting.get(ticket.tenant)
+            if tickets is None or ticket not in tickets:
+                return
+            tickets.remove(ticket)
+            if not tickets:
+                del self._waiting[ticket.tenant]
+
+    def _attempt(self, ticket: _Ticket) -> float:
+        """Take capacity for ticket if it is next in line; otherwise seconds to wait"""
+
+        with self._lock:
+            tenant, tickets = next(iter(self._waiting.items()))
+            if tickets[0] is not ticket:
+                return self.poll_interval
+            wait = self.store.update(lambda state: self._take(state, ticket.tokens))
+            if wait == 0:
+                # Served: this tenant goes to the back of the rotation
+                tickets.popleft()
+                if tickets:
+                    self._waiting.move_to_end(tenant)
+                else:
+                    del self._waiting[tenant]
+            return wait
+
+    def _take(self, state: Optional[dict], tokens: int) -> tuple[dict, float]:
+        state = self._refill(state)
+        rate = state["rate"]
+        waits = []
+        if self.rpm is not None and state["requests"] < 1:
+            waits.append((1 - state["requests"]) / (self.rpm * rate / 60))
+        if self.tpm is not None:
+            # A request bigger than the whole bucket goes once the bucket is full
+            needed = min(tokens, self.tpm * rate)
+            if state["tokens"] < needed:
+                waits.append((needed - state["tokens"]) / (self.tpm * rate / 60))
+        if waits:
+            return state, max(waits)
+        if self.rpm is not None:
+            state["requests"] -= 1
+        if self.tpm is not None:
+            state["tokens"] -= tokens
+        return state, 0
+
+    def _refill(self, state: Optional[dict]) -> dict:
+        now = self._clock()
+        if state is None:
+            return {"requests": self.rpm or 0.0, "tokens": self.tpm or 0.0, "rate": 1.0, "updated": now, "decreased_at": None}
+        elapsed = max(0.0, now - state["updated"])
+        rate = state["rate"]
+        if self.rpm is not None:
+            state["requests"] = min(self.rpm * rate, state["requests"] + elapsed * self.rpm * rate / 60)
+        if self.tpm is not None:
+            state["tokens"] = min(self.tpm * rate, state["tokens"] + elapsed * self.tpm * rate / 60)
+        state["updated"] = now
+        return state
+
+
+def build_rate_limiter() -> Optional[RateLimiter]:
+    """Limiter from BEDROCK_RPM / BEDROCK_TPM (none if neither is set). With
+    RATE_LIMIT_PATH, processes on the host share one budget through SQLite.
+    Pair it with AWS_MAX_ATTEMPTS=0 and AWS_RETRY_MODE=standard so throttles
+    reach the limiter instead of botocore's own retries and pacing."""
+
+    rpm = os.getenv("BEDROCK_RPM")
+    tpm = os.getenv("BEDROCK_TPM")
+    if not rpm and not tpm:
+        return None
+    path = os.getenv("RATE_LIMIT_PATH")
+    return RateLimiter(
+        rpm=float(rpm) if rpm else None,
+        tpm=float(tpm) if tpm else None,
+        store=SQLiteLimiterStore(path) if path else None,
+    )
@@ -0,0 +1,185 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from PIL import Image, UnidentifiedImageError
+
+from src.core.image_hash import hamming_distance, phash
+from src.services.metrics import CACHE_REQUESTS
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes under Hamming distance.
+
+    Removal only tombstones a node; callers rebuild the tree once tombstones
+    outnumber live hashes.
+    """
+
+    def __init__(self):
+        self._root: Optional[list] = None  # node: [hash, live, {distance: child}]
+        self.live = 0
+        self.removed = 0
+
+    def add(self, value: int) -> None:
+        if self._root is None:
+            self._root = [value, True, {}]
+            self.live += 1
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                if not node[1]:
+                    node[1] = True
+                    self.live += 1
+                    self.removed -= 1
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, True, {}]
+                self.live += 1
+                return
+            node = child
+
+    def remove(self, value: int) -> None:
+        node = self._root
+        while node is not None:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                if node[1]:
+                    node[1] = False
+                    self.live -= 1
+                    self.removed += 1
+                return
+            node = node[2].get(distance)
+
+    def nearest(self, value: int, max_distance: int) -> Optional[tuple[int, int]]:
+        """Closest live hash within max_distance as (distance, hash), or None"""
+
+        best = None
+        limit = max_distance
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if node[1] and distance <= limit and (best is None or distance < best[0]):
+                best = (distance, node[0])
+                limit = distance
+            # Triangle inequality: only children at distance within limit of ours can match
+            for child_distance, child in node[2].items():
+                if distance - limit <= child_distance <= distance + limit:
+                    stack.append(child)
+        return best
+
+    def __len__(self) -> int:
+        return self.live
+
+
+class ScreenshotIndex:
+    """Analysis results keyed by perceptual hash and prompt.
+
+    A lookup returns the stored analysis of the nearest screenshot within
+    max_distance bits, so near-identical screens share one vision call.
+    Entries are evicted least recently used beyond max_entries.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_distance: int = 6):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[tuple[str, int], str] = OrderedDict()
+        self._trees: dict[str, BKTree] = {}
+        self._lock = threading.Lock()
+
+    def get(self, image_hash: int, prompt: str, max_distance: Optional[int] = None) -> Optional[str]:
+        prompt_key = _prompt_key(prompt)
+        limit = self.max_distance if max_distance is None else max_distance
+
+        with self._lock:
+            tree = self._trees.get(prompt_key)
+            match = tree.nearest(image_hash, limit) if tree is not None else None
+            if match is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache="screenshot_index", result="miss")
+                return None
+
+            distance, matched_hash = match
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache="screenshot_index", result="hit")
+            if distance == 0:
+                self.exact_hits += 1
+            key = (prompt_key, matched_hash)
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, image_hash: int, prompt: str, analysis: str) -> None:
+        prompt_key = _prompt_key(prompt)
+        key = (prompt_key, image_hash)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                self._trees.setdefault(prompt_key, BKTree()).add(image_hash)
+            self._entries[key] = analysis
+
+            while len(self._entries) > self.max_entries:
+                (old_prompt, old_hash), _ = self._entries.popitem(last=False)
+                self._remove_from_tree(old_prompt, old_hash)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.hits - self.exact_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+            "max_distance": self.max_distance,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove_from_tree(self, prompt_key: str, image_hash: int) -> None:
+        tree = self._trees[prompt_key]
+        tree.remove(image_hash)
+        if tree.live == 0:
+            del self._trees[prompt_key]
+        elif tree.removed > tree.live:
+            rebuilt = BKTree()
+            for entry_prompt, entry_hash in self._entries:
+                if entry_prompt == prompt_key:
+                    rebuilt.add(entry_hash)
+            self._trees[prompt_key] = rebuilt
+
+
+def screenshot_hash(image_base64: str) -> Optional[int]:
+    """pHash of a base64 image, or None if it cannot be decoded"""
+    try:
+        return phash(Image.open(io.BytesIO(base64.b64decode(image_base64))))
+    except (binascii.Error, UnidentifiedImageError, OSError, ValueError):
+        return None
+
+
+def _prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def build_screenshot_index() -> ScreenshotIndex:
+    return ScreenshotIndex(
+        max_entries=int(os.getenv("SCREENSHOT_INDEX_MAX_ENTRIES", "4096")),
+        max_distance=int(os.getenv("SCREENSHOT_INDEX_MAX_DISTANCE", "6")),
+    )
@@ -0,0 +1,54 @@
+import os
+from typing import Optional
+
+from src.services.client_factory import ClientPoolConfig, get_client
+
+
+class ScreenshotStore:
+    """Where screenshot images live, addressed by the key recorded in the session"""
+
+    def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+
+class LocalScreenshotStore(ScreenshotStore):
+    """Screenshots as files under a root directory; a stand-in for S3 in development"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def get(self, key: str) -> bytes:
+        path = os.path.abspath(os.path.join(self.root, key.lstrip("/")))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Screenshot key escapes the store root: {key}")
+        with open(path, "rb") as f:
+            return f.read()
+
+
+class S3ScreenshotStore(ScreenshotStore):
+    """Screenshots in an S3 bucket, fetched through the shared S3 client.
+    Keys may be s3:// URIs, but only for the configured bucket."""
+
+    def __init__(self, bucket: str, region: str = "us-east-1", pool_config: Optional[ClientPoolConfig] = None):
+        self.bucket = bucket
+        self.client = get_client("s3", region, pool_config)
+
+    def get(self, key: str) -> bytes:
+        if key.startswith("s3://"):
+            bucket, _, key = key[len("s3://"):].partition("/")
+            if bucket != self.bucket:
+                raise ValueError(f"Screenshot key is outside the store bucket: s3://{bucket}/")
+        response = self.client.get_object(Bucket=self.bucket, Key=key)
+        return response["Body"].read()
+
+
+def build_screenshot_store(pool_config: Optional[ClientPoolConfig] = None) -> Optional[ScreenshotStore]:
+    """S3 store for SCREENSHOT_BUCKET, else a local store for SCREENSHOT_DIR, else None"""
+
+    bucket = os.getenv("SCREENSHOT_BUCKET")
+    if bucket:
+        return S3ScreenshotStore(bucket, region=os.getenv("AWS_REGION", "us-east-1"), pool_config=pool_config)
+    directory = os.getenv("SCREENSHOT_DIR")
+    if directory:
+        return LocalScreenshotStore(directory)
+    return None
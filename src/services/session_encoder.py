@@ -0,0 +1,153 @@
+import json
+import re
+from datetime import datetime
+from typing import Any, Optional
+
+
+ENCODING_MODES = ("pretty", "minified", "compact", "tabular")
+
+# Payload values that match the event model defaults carry no information
+DEFAULT_FIELD_VALUES = {
+    "button": "left",
+    "delta_x": 0,
+}
+
+# Prompt sentence explaining each non-obvious encoding to the model
+ENCODING_NOTES = {
+    "pretty": "",
+    "minified": "",
+    "compact": "Event times are given as t_ms, milliseconds since start_time. Omitted fields are null or default.",
+    "tabular": (
+        "Events are a table: 'columns' names each position in the 'rows' arrays. "
+        "t_ms is milliseconds since start_time and null means the field is absent."
+    ),
+}
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|\s{2,}|[^\sA-Za-z\d]")
+
+
+def encode_session(session_data: dict, mode: str = "compact") -> str:
+    """Serialize a session dict for the prompt using one of ENCODING_MODES"""
+
+    if mode == "pretty":
+        return json.dumps(session_data, indent=2, default=str)
+    if mode == "minified":
+        return _dumps(session_data)
+    if mode == "compact":
+        return _dumps(_compact_session(session_data))
+    if mode == "tabular":
+        return _dumps(_tabular_session(session_data))
+    raise ValueError(f"Unknown session encoding: {mode}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count: letters in ~4 character pieces, digit runs
+    in ~3 digit pieces, one token per punctuation mark or whitespace run"""
+
+    count = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if piece[0].isalpha():
+            count += (len(piece) + 3) // 4
+        elif piece[0].isdigit():
+            count += (len(piece) + 2) // 3
+        else:
+            count += 1
+    return count
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _prune(value: Any) -> Any:
+    """Recursively drop None, empty containers and default-valued payload fields"""
+
+    if isinstance(value, dict):
+        pruned = {}
+        for key, item in value.items():
+            item = _prune(item)
+            if item is None or item == {} or item == []:
+                continue
+            if key in DEFAULT_FIELD_VALUES and item == DEFAULT_FIELD_VALUES[key]:
+                continue
+            pruned[key] = item
+        return pruned
+    if isinstance(value, list):
+        return [_prune(item) for item in value]
+    return value
+
+
+def _relative_ms(timestamp: Any, start: Optional[datetime]) -> Any:
+    moment = parse_time(timestamp)
+    if start is None or moment is None:
+        return timestamp
+    return round((moment - start).total_seconds() * 1000)
+
+
+def parse_time(value: Any) -> Optional[datetime]:
+    """Accept a datetime or ISO-8601 string; anything else yields None"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _session_header(session_data: dict) -> dict:
+    return _prune({key: value for key, value in session_data.items() if key != "events"})
+
+
+def _compact_session(session_data: dict) -> dict:
+    start = parse_time(session_data.get("start_time"))
+    encoded = _session_header(session_data)
+
+    events = []
+    for event in session_data.get("events", []):
+        compact_event = {"t_ms": _relative_ms(event.get("timestamp"), start)}
+        compact_event.update(_prune({key: value for key, value in event.items() if key != "timestamp"}))
+        events.append(compact_event)
+
+    encoded["events"] = events
+    return encoded
+
+
+def _tabular_session(session_data: dict) -> dict:
+    start = parse_time(session_data.get("start_time"))
+    encoded = _session_header(session_data)
+
+    rows = []
+    columns = ["t_ms", "event_type"]
+    positions = {name: index for index, name in enumerate(columns)}
+
+    for event in session_data.get("events", []):
+        fields = {
+            "t_ms": _relative_ms(event.get("timestamp"), start),
+            "event_type": event.get("event_type"),
+        }
+        data = event.get("data")
+        if isinstance(data, dict):
+            fields.update(_prune(data))
+        elif data is not None:
+            fields["data"] = data
+        if event.get("screenshot_ref"):
+            fields["screenshot_ref"] = event["screenshot_ref"]
+
+        row = [None] * len(columns)
+        for name, value in fields.items():
+            if name not in positions:
+                positions[name] = len(columns)
+                columns.append(name)
+                row.append(None)
+            row[positions[name]] = value
+        rows.append(row)
+
+    # Earlier rows are shorter when later events introduced new columns
+    width = len(columns)
+    encoded["events"] = {
+        "columns": columns,
+        "rows": [row + [None] * (width - len(row)) for row in rows],
+    }
+    return encoded
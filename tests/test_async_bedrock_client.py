@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from botocore.credentials import Credentials
+from botocore.exceptions import ClientError
+
+from src.services.async_bedrock_client import AsyncBedrockClient
+from src.core.workflow_generator import WorkflowGenerator
+from test_workflow_generation import create_mock_session
+
+
+WORKFLOW = {
+    "workflow_id": "wf-async",
+    "name": "Login",
+    "description": "Log in",
+    "application": "Chrome Browser",
+    "steps": []
+}
+
+
+def make_client(handler, **kwargs) -> AsyncBedrockClient:
+    return AsyncBedrockClient(
+        credentials=Credentials("AKIDEXAMPLE", "secret"),
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        **kwargs
+    )
+
+
+def model_reply(text: str) -> httpx.Response:
+    return httpx.Response(200, json={"output": {"message": {"content": [{"text": text}]}}})
+
+
+def test_requests_are_signed_and_parsed():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return model_reply(json.dumps(WORKFLOW))
+
+    client = make_client(handler)
+    generator = WorkflowGenerator(async_bedrock_client=client)
+
+    workflow = asyncio.run(generator.generate_from_session_async(create_mock_session()))
+
+    assert workflow.workflow_id == "wf-async"
+    request = seen[0]
+    assert request.url.raw_path == b"/model/amazon.nova-pro-v1%3A0/invoke"
+    assert request.headers["Authorization"].startswith("AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/")
+    assert "/bedrock/aws4_request" in request.headers["Authorization"]
+
+
+def test_throttling_maps_to_client_error():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            429,
+            json={"message": "Too many requests"},
+            headers={"x-amzn-ErrorType": "ThrottlingException:http://internal.amazon.com/coral/"}
+        )
+
+    client = make_client(handler)
+
+    with pytest.raises(ClientError) as error:
+        asyncio.run(client.generate_workflow({"events": []}, []))
+
+    assert error.value.response["Error"]["Code"] == "ThrottlingException"
+
+
+def test_semaphore_caps_in_flight_calls():
+    in_flight = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return model_reply("connected")
+
+    client = make_client(handler, max_concurrency=3)
+
+    async def run():
+        return await asyncio.gather(*(client.test_connection() for _ in range(12)))
+
+    assert all(asyncio.run(run()))
+    assert peak == 3
+
+
+def test_requests_are_signed_only_once_they_hold_a_slot():
+    client = make_client(lambda request: model_reply("connected"), max_concurrency=1)
+    sign = client._sign
+    held = []
+
+    def recording_sign(url: str, payload: str) -> dict:
+        held.append(client._semaphore.locked())
+        return sign(url, payload)
+
+    client._sign = recording_sign
+
+    async def run():
+        return await asyncio.gather(*(client.test_connection() for _ in range(4)))
+
+    assert all(asyncio.run(run()))
+    assert held == [True] * 4
@@ -0,0 +1,85 @@
+import json
+import threading
+import time
+
+from src.services.bedrock_client import BedrockClient
+from src.core.workflow_generator import WorkflowGenerator
+from test_workflow_generation import create_mock_session
+
+
+class SlowBedrockClient(BedrockClient):
+    """Returns a canned workflow after a delay and tracks peak concurrency"""
+
+    def __init__(self):
+        super().__init__()
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def generate_workflow(self, session_data: dict, screenshots: list[str], use_cache: bool = True) -> str:
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(0.02)
+        with self._lock:
+            self.in_flight -= 1
+        if session_data["session_id"] == "broken":
+            return "not json"
+        return json.dumps({
+            "workflow_id": session_data["session_id"],
+            "name": "Login",
+            "description": "Log in",
+            "application": session_data["application"],
+            "steps": []
+        })
+
+
+def make_sessions(count: int):
+    sessions = []
+    for i in range(count):
+        session = create_mock_session()
+        session.session_id = f"session-{i}"
+        sessions.append(session)
+    return sessions
+
+
+def test_ai_batch_is_bounded_and_reports_errors():
+    client = SlowBedrockClient()
+    generator = WorkflowGenerator(client)
+    sessions = make_sessions(12)
+    sessions[5].session_id = "broken"
+
+    results = generator.generate_many(sessions, use_ai=True, max_concurrency=4)
+
+    assert [r.index for r in results] == list(range(12))
+    assert client.peak == 4
+    assert not results[5].success and results[5].error
+    assert all(r.success for i, r in enumerate(results) if i != 5)
+    assert results[3].workflow.workflow_id == "session-3"
+
+
+def test_deterministic_batch_uses_process_pool():
+    generator = WorkflowGenerator(deterministic_workers=2, process_pool_min_batch=4)
+    sessions = make_sessions(8)
+
+    try:
+        results = generator.generate_many(sessions, use_ai=False)
+    finally:
+        generator.close()
+
+    assert all(r.success for r in results)
+    assert [r.session_id for r in results] == [s.session_id for s in sessions]
+    assert len(results[0].workflow.steps) == 6
+
+
+def test_batch_endpoint_rejects_invalid_concurrency():
+    from fastapi.testclient import TestClient
+    from src.api.main import app
+
+    sessions = [session.model_dump(mode="json") for session in make_sessions(1)]
+    client = TestClient(app)
+    for max_concurrency in (0, -1, 10_000):
+        body = {"sessions": sessions, "use_ai": False, "max_concurrency": max_concurrency}
+        assert client.post("/generate/batch", json=body).status_code == 422
+    body = {"sessions": sessions, "use_ai": False, "max_concurrency": 2}
+    assert client.post("/generate/batch", json=body).json()["succeeded"] == 1
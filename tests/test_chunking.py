@@ -0,0 +1,77 @@
+import json
+from datetime import datetime, timedelta
+
+from src.core.chunking import split_session
+from src.core.workflow_generator import WorkflowGenerator
+from src.models.events import SessionTimeline, EventLog, EventType
+from src.services.bedrock_client import BedrockClient
+
+
+def make_long_session(pages: int = 5, clicks_per_page: int = 30) -> SessionTimeline:
+    start = datetime(2024, 1, 1, 12, 0, 0)
+    events = []
+    for page in range(pages):
+        events.append(EventLog(
+            timestamp=start + timedelta(seconds=len(events)),
+            event_type=EventType.NAVIGATION,
+            data={"url": f"https://app.example.com/page/{page}"}
+        ))
+        for i in range(clicks_per_page):
+            events.append(EventLog(
+                timestamp=start + timedelta(seconds=len(events)),
+                event_type=EventType.MOUSE_CLICK,
+                data={"x": i, "y": page, "button": "left"}
+            ))
+    return SessionTimeline(session_id="long", start_time=start, application="Chrome Browser", events=events)
+
+
+class EchoBedrockClient(BedrockClient):
+    """Turns each event of the window into one step"""
+
+    def generate_workflow(self, session_data: dict, screenshots: list[str], use_cache: bool = True) -> str:
+        steps = [
+            {"step_id": f"s{i}", "action": "CLICK", "description": f"{session_data['session_id']} #{i}"}
+            for i, _ in enumerate(session_data["events"])
+        ]
+        return json.dumps({
+            "workflow_id": session_data["session_id"],
+            "name": "Chunk",
+            "description": "Partial",
+            "application": session_data["application"],
+            "steps": steps,
+            "variables": {f"v_{session_data['session_id']}": 1}
+        })
+
+
+def test_split_prefers_navigation_boundaries():
+    session = make_long_session()
+
+    windows = split_session(session, max_events=50, min_events=10)
+
+    assert [len(w.events) for w in windows] == [31] * 5
+    assert all(w.events[0].event_type == EventType.NAVIGATION for w in windows)
+    assert sum(len(w.events) for w in windows) == len(session.events)
+
+
+def test_split_respects_max_events_and_idle_gaps():
+    session = make_long_session(pages=1, clicks_per_page=100)
+    session.events[60].timestamp += timedelta(minutes=5)
+    for event in session.events[61:]:
+        event.timestamp += timedelta(minutes=5)
+
+    windows = split_session(session, max_events=50, min_events=5)
+
+    assert [len(w.events) for w in windows] == [50, 10, 41]
+
+
+def test_long_sessions_are_generated_in_chunks_and_renumbered():
+    generator = WorkflowGenerator(EchoBedrockClient(), chunk_threshold=100, chunk_size=40)
+    session = make_long_session()
+
+    workflow = generator.generate_from_session(session)
+
+    assert len(workflow.steps) == len(session.events)
+    assert [s.step_id for s in workflow.steps] == [f"step_{i + 1}" for i in range(len(session.events))]
+    assert workflow.steps[0].description == "long#part1 #0"
+    assert workflow.metadata["chunk_count"] == 5
+    assert len(workflow.variables) == 5
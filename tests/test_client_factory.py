@@ -0,0 +1,97 @@
+import http.server
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.services.bedrock_client import BedrockClient
+from src.services.client_factory import ClientPoolConfig, check_endpoint, get_client, pool_stats, warm_up
+from src.services.metrics import POOL_FULL_DISCARDS, REGISTRY
+
+
+class FakeRuntimeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(0.005)
+        body = json.dumps({"output": {"message": {"content": [{"text": "ok"}]}}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_clients_are_shared_per_service_region_and_config():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        clients = list(pool.map(lambda _: BedrockClient(region="eu-west-3").client, range(16)))
+
+    assert all(client is clients[0] for client in clients)
+    assert get_client("bedrock-runtime", "eu-west-3") is clients[0]
+
+    small = ClientPoolConfig(max_pool_connections=4)
+    sized = BedrockClient(region="eu-west-3", pool_config=ClientPoolConfig(max_pool_connections=4)).client
+    # Equal configs share a client
+    assert sized is not clients[0]
+    assert sized is get_client("bedrock-runtime", "eu-west-3", small)
+    assert sized.meta.config.max_pool_connections == 4
+    assert sized.meta.config.tcp_keepalive is True
+
+
+def test_pool_stats_report_reuse_and_saturation(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FakeRuntimeHandler)
+    server.handle_error = lambda *args: None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        client = get_client("bedrock-runtime", "us-east-1", ClientPoolConfig(max_pool_connections=2), endpoint)
+        assert warm_up(client, connections=2) == 2
+
+        before = pool_stats()["pool_full_discards"]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: client.invoke_model(modelId="m", body=b"{}")["body"].read(), range(40)))
+    finally:
+        server.shutdown()
+
+    stats = pool_stats()
+    entry = next(c for c in stats["clients"] if c["endpoint"] == endpoint)
+    assert entry["requests"] == 40
+    assert entry["connections_opened"] < 40
+    assert entry["reuse_rate"] > 0.5
+    assert (entry["in_use"], entry["idle_connections"]) == (0, 2)
+    # 8 threads on a 2-connection pool overflow it
+    assert stats["pool_full_discards"] > before
+
+    # The same figures are exported as gauges on /metrics
+    exported = REGISTRY.render()
+    labels = f'service="bedrock-runtime",region="us-east-1",endpoint="{endpoint}"'
+    assert f"aws_pool_connections_max{{{labels}}} 2" in exported
+    assert f"aws_pool_connections_in_use{{{labels}}} 0" in exported
+    assert f"aws_pool_connections_idle{{{labels}}} 2" in exported
+    assert POOL_FULL_DISCARDS.value() >= stats["pool_full_discards"] - before
+
+
+def test_pool_introspection_degrades_when_botocore_internals_change(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FakeRuntimeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        client = get_client("bedrock-runtime", "us-east-1", ClientPoolConfig(max_pool_connections=3), endpoint)
+        monkeypatch.setattr(client._endpoint, "http_session", object())
+        assert warm_up(client) == 0
+        # No GET handler: 501, answered over a connection of its own
+        assert check_endpoint(client) == 501
+        entry = next(c for c in pool_stats()["clients"] if c["endpoint"] == endpoint)
+        assert entry["max_pool_connections"] == 3 and "requests" not in entry
+    finally:
+        server.shutdown()
+
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.core.columnar import (
+    ColumnarFormatError,
+    ColumnarSession,
+    encode_columnar,
+    session_header,
+    write_columnar,
+)
+from src.core.workflow_generator import WorkflowGenerator
+from src.models.events import SessionTimeline
+from test_workflow_generation import create_mock_session
+
+
+def unusual_session() -> SessionTimeline:
+    """Every event type, aware and naive times, and values the columns cannot hold"""
+
+    start = datetime(2024, 3, 1, 9, 30, 0, 123456, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+    events = [
+        ("MOUSE_RIGHT_CLICK", {"x": 1, "y": 2, "button": "middle", "element_text": "Ünïcode ✓"}),
+        ("MOUSE_CLICK", {"x": 2 ** 40, "y": -5}),  # beyond 32 bits: kept as JSON
+        ("MOUSE_DRAG", {"start_x": 0, "start_y": 0, "end_x": -300, "end_y": 40, "button": "right"}),
+        ("KEY_COMBINATION", {"key": "s", "modifiers": ["ctrl", "shift"]}),
+        ("KEY_PRESS", {"key": "Enter"}),
+        ("TEXT_INPUT", {"text": "", "target_element": "search"}),
+        ("SCROLL", {"x": 10, "y": 10, "delta_y": -3}),
+        ("NAVIGATION", {"url": "https://example.com/a?b=c"}),
+        ("WINDOW_SWITCH", {"window_title": "Inbox", "application": "Outlook"}),
+        ("SCREENSHOT", {"s3_key": "shots/1.png", "width": 1920, "height": 1080, "ocr_text": "Save"}),
+        ("FILE_OPERATION", {"operation": "copy", "path": "/tmp/a", "destination": None}),
+    ]
+    return SessionTimeline(
+        session_id="unusual",
+        start_time=start,
+        application="Desktop",
+        metadata={"tags": ["x"]},
+        events=[
+            {
+                "timestamp": start + timedelta(milliseconds=i) if i % 2 else (start + timedelta(seconds=i)).replace(tzinfo=None),
+                "event_type": event_type,
+                "data": data,
+                "screenshot_ref": f"shots/{i}.png" if i % 3 == 0 else None,
+            }
+            for i, (event_type, data) in enumerate(events)
+        ],
+    )
+
+
+@pytest.mark.parametrize("make_session", [create_mock_session, unusual_session])
+def test_round_trip_is_lossless(tmp_path, make_session):
+    session = make_session()
+    path = str(tmp_path / "session.wfcs")
+    write_columnar(path, session_header(session), session.events)
+
+    with ColumnarSession.open(path) as columnar:
+        restored = columnar.to_session()
+        assert len(columnar) == len(session.events)
+        # Columns are views into the mapped file, not copies
+        assert isinstance(columnar.columns["timestamp"], memoryview)
+        assert len(columnar.columns["x"]) == len(session.events)
+
+    assert restored == session
+    assert restored.model_dump_json() == session.model_dump_json()
+    assert SessionTimeline.model_validate_json(restored.model_dump_json()) == session
+
+
+def test_generator_reads_columnar_files(tmp_path):
+    session = create_mock_session()
+    path = str(tmp_path / "session.wfcs")
+    write_columnar(path, session_header(session), session.events)
+    generator = WorkflowGenerator()
+
+    columnar = generator.generate_from_columnar(path)
+    in_memory = generator.generate_from_events_only(session)
+
+    assert [s.model_dump() for s in columnar.steps] == [s.model_dump() for s in in_memory.steps]
+    assert columnar.metadata["event_count"] == 6
+
+    with pytest.raises(ColumnarFormatError):
+        ColumnarSession(b"NDJS" + encode_columnar(session_header(session), session.events)[4:])
+
+
+def test_fields_left_out_of_the_recording_stay_unset(tmp_path):
+    session = SessionTimeline.model_validate_json(unusual_session().model_dump_json(exclude_unset=True))
+    path = str(tmp_path / "session.wfcs")
+    write_columnar(path, session_header(session), session.events)
+
+    with ColumnarSession.open(path) as columnar:
+        restored = columnar.to_session()
+    assert restored.model_dump(exclude_unset=True) == session.model_dump(exclude_unset=True)
+
+
+def test_damaged_files_are_rejected(tmp_path):
+    empty = tmp_path / "empty.wfcs"
+    empty.write_bytes(b"")
+    with pytest.raises(ColumnarFormatError):
+        ColumnarSession.open(str(empty))
+
+    session = create_mock_session()
+    data = encode_columnar(session_header(session), session.events)
+
+    # Cut inside the string table
+    with pytest.raises(ColumnarFormatError):
+        ColumnarSession(data[:-40])
+
+    for column, value in (("event_type", 250), ("s1", 10 ** 6)):
+        columnar = ColumnarSession(bytearray(data))
+        columnar.columns[column][0] = value
+        with pytest.raises(ColumnarFormatError):
+            columnar.to_session()
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from src.core.compaction import CompactionConfig, EventCompactor
+from src.core.workflow_generator import WorkflowGenerator
+from src.models.events import SessionTimeline, EventLog, EventType
+from src.models.workflow import ActionType
+
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def event(ms: int, event_type: EventType, **data) -> EventLog:
+    return EventLog(timestamp=START + timedelta(milliseconds=ms), event_type=event_type, data=data)
+
+
+def noisy_events():
+    return [
+        event(0, EventType.MOUSE_CLICK, x=100, y=100, button="left"),
+        event(150, EventType.MOUSE_CLICK, x=101, y=100, button="left"),
+        event(1000, EventType.SCREENSHOT, s3_key="s/1.png", width=10, height=10),
+        *[event(2000 + i * 80, EventType.TEXT_INPUT, text=char, target_element="search") for i, char in enumerate("hello")],
+        *[event(3000 + i * 50, EventType.SCROLL, x=5, y=5, delta_x=0, delta_y=-3) for i in range(10)],
+        event(6000, EventType.SCROLL, x=5, y=5, delta_x=0, delta_y=-3),
+        event(7000, EventType.MOUSE_CLICK, x=300, y=300, button="left"),
+    ]
+
+
+def test_compactor_folds_redundant_events():
+    compactor = EventCompactor()
+
+    compacted = list(compactor.compact(noisy_events()))
+
+    assert [e.event_type for e in compacted] == [
+        "MOUSE_DOUBLE_CLICK", "TEXT_INPUT", "SCROLL", "SCROLL", "MOUSE_CLICK"
+    ]
+    assert compacted[1].data.text == "hello"
+    assert compacted[2].data.delta_y == -30
+    assert compactor.stats.input_events == 20
+    assert compactor.stats.compression_ratio == 4.0
+
+
+def test_text_typed_after_a_long_pause_stays_separate():
+    events = [
+        event(0, EventType.TEXT_INPUT, text="jo", target_element="name"),
+        event(150, EventType.TEXT_INPUT, text="hn", target_element="name"),
+        # Came back to the same field a minute later: a separate entry
+        event(60_000, EventType.TEXT_INPUT, text="smith", target_element="name"),
+    ]
+
+    compacted = list(EventCompactor().compact(events))
+
+    assert [e.data.text for e in compacted] == ["john", "smith"]
+
+
+def test_rules_can_be_disabled():
+    config = CompactionConfig(merge_text_input=False, fold_double_clicks=False, drop_screenshots=False)
+
+    compacted = list(EventCompactor(config).compact(noisy_events()))
+
+    types = [e.event_type for e in compacted]
+    assert types.count("TEXT_INPUT") == 5
+    assert types.count("MOUSE_CLICK") == 3
+    assert "SCREENSHOT" in types
+
+
+def test_generator_reports_compression_ratio():
+    session = SessionTimeline(session_id="noisy", start_time=START, application="Notes", events=noisy_events())
+
+    workflow = WorkflowGenerator().generate_from_events_only(session)
+
+    assert [s.action for s in workflow.steps][:2] == [ActionType.DOUBLE_CLICK, ActionType.TYPE_TEXT]
+    assert workflow.metadata["compaction"]["compression_ratio"] == 4.0
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from src.core.converters import convert_event, get_converter, register_converter, make_step
+from src.models.events import EventLog, EventType
+from src.models.workflow import WorkflowStep, ActionType
+
+
+SAMPLE_DATA = {
+    EventType.MOUSE_CLICK: {"x": 1, "y": 2, "button": "left"},
+    EventType.MOUSE_DOUBLE_CLICK: {"x": 1, "y": 2},
+    EventType.MOUSE_RIGHT_CLICK: {"x": 1, "y": 2, "button": "right"},
+    EventType.MOUSE_DRAG: {"start_x": 1, "start_y": 2, "end_x": 30, "end_y": 40},
+    EventType.KEY_PRESS: {"key": "Enter", "modifiers": []},
+    EventType.KEY_COMBINATION: {"key": "c", "modifiers": ["ctrl"]},
+    EventType.TEXT_INPUT: {"text": "hello"},
+    EventType.SCROLL: {"x": 1, "y": 2, "delta_y": -3},
+    EventType.NAVIGATION: {"url": "https://example.com"},
+    EventType.WINDOW_SWITCH: {"window_title": "Inbox - Mail", "application": "Outlook"},
+    EventType.SCREENSHOT: {"s3_key": "s/1.png", "width": 10, "height": 10},
+    EventType.FILE_OPERATION: {"operation": "save", "path": "/tmp/report.pdf"},
+}
+
+
+def make_event(event_type: EventType) -> EventLog:
+    return EventLog(timestamp=datetime(2024, 1, 1), event_type=event_type, data=SAMPLE_DATA[event_type])
+
+
+def test_every_event_type_has_a_converter():
+    assert all(get_converter(event_type) is not None for event_type in EventType)
+
+
+def test_constructed_steps_match_validated_steps():
+    for event_type in EventType:
+        step = convert_event(make_event(event_type), 7)
+        if step is None:
+            assert event_type in (EventType.SCREENSHOT, EventType.FILE_OPERATION)
+            continue
+        assert step.step_id == "step_7"
+        assert step == WorkflowStep(**step.model_dump())
+
+    combo = convert_event(make_event(EventType.KEY_COMBINATION), 1)
+    assert combo.action == ActionType.KEY_COMBINATION
+    assert combo.description == "Press ctrl+c"
+
+
+def test_third_party_converters_can_replace_builtins():
+    original = get_converter(EventType.FILE_OPERATION)
+
+    @register_converter(EventType.FILE_OPERATION)
+    def file_operation_to_wait(event, step_num):
+        return make_step(step_num, ActionType.WAIT, f"Wait for {event.data.operation}", parameters={"seconds": 1})
+
+    try:
+        step = convert_event(make_event(EventType.FILE_OPERATION), 3)
+        assert step.action == ActionType.WAIT
+        assert step.parameters == {"seconds": 1}
+    finally:
+        register_converter(EventType.FILE_OPERATION, original)
@@ -0,0 +1,112 @@
+import json
+
+from src.core.workflow_generator import WorkflowGenerator
+from src.models.workflow import WorkflowDefinition
+from src.services.bedrock_client import BedrockClient
+from src.services.example_index import ExampleIndex
+from src.services.response_cache import MemoryCache
+from test_async_bedrock_client import WORKFLOW
+from test_workflow_generation import create_mock_session
+
+
+def session_of(application: str, types: list[str]) -> dict:
+    return {"application": application, "events": [{"event_type": event_type} for event_type in types]}
+
+
+def workflow_named(name: str) -> WorkflowDefinition:
+    return WorkflowDefinition(**{**WORKFLOW, "name": name})
+
+
+def test_similar_sessions_rank_first_and_are_shared_through_sqlite(tmp_path):
+    path = str(tmp_path / "examples.sqlite3")
+    writer = ExampleIndex(path, k=2, refresh_seconds=0)
+    reader = ExampleIndex(path, k=2, refresh_seconds=0)
+    login = ["MOUSE_CLICK", "TEXT_INPUT", "MOUSE_CLICK", "TEXT_INPUT", "KEY_PRESS"]
+
+    writer.add(session_of("Chrome Browser", login), workflow_named("login"))
+    writer.add(session_of("Chrome Browser", ["SCROLL", "SCROLL", "NAVIGATION"]), workflow_named("browse"))
+    writer.add(session_of("Excel", login), workflow_named("excel login"))
+    # Same application and event types: replaces the first example
+    writer.add(session_of("chrome browser", login), workflow_named("login v2"))
+
+    examples = reader.retrieve(session_of("Chrome Browser", login + ["MOUSE_CLICK"]))
+    assert len(reader) == 3
+    assert [json.loads(text.split("\n", 2)[2])["name"] for text in examples] == ["login v2", "excel login"]
+    assert examples[0].startswith("Session (chrome browser): MOUSE_CLICK, TEXT_INPUT, MOUSE_CLICK, TEXT_INPUT, KEY_PRESS")
+    assert '"wait_after"' not in examples[0]  # default step fields are left out
+    assert reader.retrieve(session_of("Notepad", ["FILE_OPERATION"])) == []
+    assert reader.stats()["hit_rate"] == 0.5
+
+
+def test_prompt_has_cached_prefix_and_examples():
+    sent = []
+
+    class RecordingClient(BedrockClient):
+        def _invoke(self, body: dict) -> str:
+            sent.append(body)
+            return json.dumps(WORKFLOW)
+
+    index = ExampleIndex()
+    session = create_mock_session()
+    index.add(session.model_dump(mode="json"), workflow_named("accepted login"))
+    generator = WorkflowGenerator(RecordingClient(example_index=index))
+    generator.generate_from_session(session)
+    generator.generate_from_session(session.model_copy(update={"session_id": "other"}))
+
+    first, second = sent
+    assert first["system"][-1] == {"cachePoint": {"type": "default"}}
+    assert first["system"] == second["system"]  # identical prefix, so Bedrock can reuse it
+    content = first["messages"][0]["content"]
+    assert "accepted login" in content[0]["text"]
+    assert content[-1]["text"].startswith("SESSION DATA:")
+    assert "cachePoint" not in BedrockClient(prompt_caching=False)._workflow_body({}, [])["system"][-1]
+
+
+def test_examples_stay_with_their_tenant_and_hide_typed_values():
+    index = ExampleIndex(k=2)
+    login = ["MOUSE_CLICK", "TEXT_INPUT", "KEY_PRESS"]
+    workflow = WorkflowDefinition(**{
+        **WORKFLOW,
+        "name": "login",
+        "steps": [
+            {"step_id": "1", "action": "TYPE_TEXT", "description": "Type: alice@corp.example...",
+             "parameters": {"text": "alice@corp.example"}},
+            {"step_id": "2", "action": "TYPE_TEXT", "description": "Type the password hunter2",
+             "parameters": {"text": "hunter2"}},
+            {"step_id": "3", "action": "LOOP", "description": "For each row",
+             "parameters": {"items": "rows", "steps": [
+                 {"step_id": "1", "action": "TYPE_TEXT", "description": "Type row", "parameters": {"text": "acme-42"}}
+             ]}},
+        ],
+        "variables": {"email": "alice@corp.example", "rows": [{"step1_text": "acme-42"}, {"step1_text": "acme-43"}]},
+    })
+    index.add({**session_of("Chrome Browser", login), "user_id": "alice"}, workflow)
+
+    assert index.retrieve({**session_of("Chrome Browser", login), "user_id": "bob"}) == []
+    assert index.retrieve(session_of("Chrome Browser", login)) == []
+
+    example = index.retrieve({**session_of("Chrome Browser", login), "user_id": "alice"})[0]
+    for secret in ("alice@corp.example", "hunter2", "acme-4"):
+        assert secret not in example
+    shown = json.loads(example.split("\n", 2)[2])
+    assert shown["steps"][0] == {"step_id": "1", "action": "TYPE_TEXT", "description": "Type: {{email}}...",
+                                 "parameters": {"text": "{{email}}"}}
+    assert shown["steps"][1]["description"] == "Type the password {{text}}"
+    assert shown["variables"] == {"email": "{{email}}", "rows": [{"step1_text": "{{item.step1_text}}"}]}
+
+
+def test_tenants_do_not_share_cached_answers():
+    calls = []
+
+    class CountingClient(BedrockClient):
+        def _invoke(self, body: dict) -> str:
+            calls.append(body)
+            return json.dumps(WORKFLOW)
+
+    generator = WorkflowGenerator(CountingClient(cache=MemoryCache(), example_index=ExampleIndex()))
+    session = create_mock_session()
+    generator.generate_from_session(session.model_copy(update={"user_id": "alice"}))
+    generator.generate_from_session(session.model_copy(update={"user_id": "alice", "session_id": "again"}))
+    generator.generate_from_session(session.model_copy(update={"user_id": "bob"}))
+
+    assert len(calls) == 2
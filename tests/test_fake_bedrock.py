@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from src.services.async_bedrock_client import AsyncBedrockClient
+from src.services.bedrock_client import BedrockClient
+from src.services.client_factory import ClientPoolConfig
+from src.services.fake_bedrock import FakeBedrockConfig, FakeBedrockServer
+from test_workflow_generation import create_mock_session
+
+
+@pytest.fixture(autouse=True)
+def fake_credentials(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "fake")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "fake")
+
+
+def test_invoke_and_stream_speak_the_runtime_protocol():
+    config = FakeBedrockConfig(outputs=['{"steps": []}'], stream_chunk_chars=4, latency_ms=50)
+    with FakeBedrockServer(config) as server:
+        client = BedrockClient(endpoint_url=server.endpoint_url)
+        session = create_mock_session()
+
+        started = time.perf_counter()
+        assert client.generate_workflow(session.model_dump(mode="json"), []) == '{"steps": []}'
+        assert time.perf_counter() - started >= 0.05
+
+        deltas = list(client.generate_workflow_stream(session.model_dump(mode="json"), []))
+        assert len(deltas) > 1 and "".join(deltas) == '{"steps": []}'
+
+        async_client = AsyncBedrockClient(endpoint_url=server.endpoint_url)
+        text = asyncio.run(async_client.generate_workflow(session.model_dump(mode="json"), []))
+        assert text == '{"steps": []}'
+        assert server.stats() == {"requests": 3, "errors": 0, "streams": 1}
+
+
+def test_injected_errors_map_to_bedrock_exceptions():
+    config = FakeBedrockConfig(error_rate=1.0, throttle_share=0.0)
+    with FakeBedrockServer(config) as server:
+        client = BedrockClient(endpoint_url=server.endpoint_url, pool_config=ClientPoolConfig(max_attempts=0))
+
+        with pytest.raises(ClientError) as raised:
+            client.generate_workflow(create_mock_session().model_dump(mode="json"), [])
+
+    assert raised.value.response["Error"]["Code"] == "ServiceUnavailableException"
+    assert raised.value.response["ResponseMetadata"]["HTTPStatusCode"] == 503
@@ -0,0 +1,174 @@
+import http.server
+import threading
+
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+
+from src.core.workflow_generator import WorkflowGenerator
+from src.services.bedrock_client import BedrockClient
+from src.services.client_factory import ClientPoolConfig, get_client
+from src.services.health import BedrockProber, CircuitBreaker
+from test_client_factory import FakeRuntimeHandler
+from test_workflow_generation import create_mock_session
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FailingBedrockClient(BedrockClient):
+    def __init__(self, error_code: str, status: int):
+        super().__init__()
+        self.error_code = error_code
+        self.status = status
+        self.calls = 0
+
+    def _invoke(self, body: dict) -> str:
+        self.calls += 1
+        raise ClientError(
+            {"Error": {"Code": self.error_code, "Message": "failed"}, "ResponseMetadata": {"HTTPStatusCode": self.status}},
+            "InvokeModel"
+        )
+
+
+def test_breaker_opens_sheds_and_recovers_through_one_trial():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now = 31
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 62
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0, "opened": 2, "rejected": 2}
+
+
+def test_open_circuit_serves_deterministic_workflows():
+    client = FailingBedrockClient("ServiceUnavailableException", 503)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    generator = WorkflowGenerator(client, circuit_breaker=breaker)
+    session = create_mock_session()
+
+    for _ in range(2):
+        try:
+            generator.generate_from_session(session)
+        except ClientError:
+            pass
+    assert breaker.state == "open"
+
+    workflow = generator.generate_from_session(session)
+    assert client.calls == 2
+    assert workflow.metadata["fallback"] == "bedrock_unavailable"
+    assert len(workflow.steps) == 6
+
+    # Bad requests and throttling are not outages
+    other = CircuitBreaker(failure_threshold=1)
+    for code, status in (("ValidationException", 400), ("ThrottlingException", 429)):
+        try:
+            WorkflowGenerator(FailingBedrockClient(code, status), circuit_breaker=other).generate_from_session(session)
+        except ClientError:
+            pass
+    assert other.state == "closed"
+
+
+def test_half_open_trial_is_released_when_no_model_call_reports():
+    class StreamingBedrockClient(FailingBedrockClient):
+        def generate_workflow_stream(self, session_data, screenshots=None):
+            yield '{"name": "w", "steps": [{"step_id": "1", "action": "CLICK", "description": "a"}, '
+
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    generator = WorkflowGenerator(StreamingBedrockClient("ServiceUnavailableException", 503), circuit_breaker=breaker)
+    session = create_mock_session()
+    breaker.record_failure()
+    clock.now = 31
+
+    # Only navigation: the hybrid path has nothing to send to the model
+    navigation_only = session.model_copy(update={"events": [e for e in session.events if e.event_type == "NAVIGATION"]})
+    generator.generate_hybrid(navigation_only)
+    assert breaker.state == "half_open" and breaker.allow()
+    breaker.release()
+
+    # A client that stops reading a stream abandons its trial
+    stream = generator.stream_from_session(session)
+    next(stream)
+    stream.close()
+    assert breaker.state == "half_open" and breaker.allow()
+
+
+class ReachableHandler(FakeRuntimeHandler):
+    def do_GET(self):
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def serve(handler):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_light_probe_is_cached_and_trips_the_breaker(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    up, down = serve(ReachableHandler), serve(FakeRuntimeHandler)
+
+    try:
+        bedrock = BedrockClient()
+        bedrock.client = get_client("bedrock-runtime", "us-east-1", ClientPoolConfig(), f"http://127.0.0.1:{up.server_port}")
+        prober = BedrockProber(bedrock, ttl_seconds=60)
+        assert prober.status()["connected"]
+        assert prober.status()["connected"]
+        assert prober.probes == 1
+
+        # No GET handler: the endpoint answers 501
+        bedrock.client = get_client("bedrock-runtime", "us-east-1", ClientPoolConfig(), f"http://127.0.0.1:{down.server_port}")
+        breaker = CircuitBreaker(failure_threshold=1)
+        failing = BedrockProber(bedrock, breaker)
+        result = failing.refresh()
+        assert not result["connected"] and "501" in result["error"]
+        assert breaker.state == "open"
+
+        # A reachable endpoint says nothing about inference: the breaker stays open
+        bedrock.client = get_client("bedrock-runtime", "us-east-1", ClientPoolConfig(), f"http://127.0.0.1:{up.server_port}")
+        assert failing.refresh()["connected"]
+        assert breaker.state == "open"
+
+        # A model probe that gets an answer does close it
+        bedrock.test_connection = lambda: True
+        assert BedrockProber(bedrock, breaker, mode="model").refresh()["connected"]
+        assert breaker.state == "closed"
+    finally:
+        up.shutdown()
+        down.shutdown()
+
+
+def test_liveness_and_readiness_do_not_call_the_model(monkeypatch):
+    from src.api import main
+
+    def no_inference(body: dict) -> str:
+        raise AssertionError("health checks must not invoke the model")
+
+    monkeypatch.setattr(main.bedrock, "_invoke", no_inference)
+    with TestClient(main.app) as client:
+        assert client.get("/health/live").json() == {"status": "alive"}
+        ready = client.get("/health/ready")
+        assert ready.status_code == 200
+        assert ready.json()["circuit"]["state"] in ("closed", "open", "half_open")
+        assert "bedrock_connected" in client.get("/health").json()
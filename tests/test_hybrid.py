@@ -0,0 +1,147 @@
+import asyncio
+import json
+import threading
+from datetime import timedelta
+
+from src.core.workflow_generator import WorkflowGenerator
+from src.models.events import EventLog, EventType
+from src.services.bedrock_client import BedrockClient
+from src.services.metrics import STAGE_ERRORS
+from test_async_bedrock_client import make_client, model_reply
+from test_workflow_generation import create_mock_session
+
+
+class EnrichingBedrockClient(BedrockClient):
+    """Answers enrichment prompts by task; records every prompt it receives"""
+
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def _invoke(self, body: dict) -> str:
+        prompt = body["messages"][0]["content"][-1]["text"]
+        with self._lock:
+            self.prompts.append(prompt)
+        payload = json.loads(prompt.split("INPUT:\n", 1)[1])
+
+        if "typed_text" in payload:
+            # The password value is altered, so it must not become a variable
+            return json.dumps({"variables": {"email": "demo@example.com", "password": "********"}})
+        targets = [
+            step["step_id"]
+            for segment in payload["segments"]
+            for step in segment["steps"]
+            if step.get("resolve")
+        ]
+        return "```json\n" + json.dumps({"steps": [
+            {"step_id": step_id, "description": "Open the profile menu",
+             "selector": {"type": "css", "value": "#profile-menu"}}
+            for step_id in targets
+        ]}) + "\n```"
+
+
+def create_session_with_unlabelled_click():
+    session = create_mock_session()
+    last = session.events[-1].timestamp
+    session.events.append(EventLog(
+        timestamp=last + timedelta(seconds=2),
+        event_type=EventType.MOUSE_CLICK,
+        data={"x": 1800, "y": 40}
+    ))
+    session.events.append(EventLog(
+        timestamp=last + timedelta(seconds=3),
+        event_type=EventType.KEY_PRESS,
+        data={"key": "Escape"}
+    ))
+    # Same spot on the same page: shares the first click's answer
+    session.events.append(EventLog(
+        timestamp=last + timedelta(seconds=5),
+        event_type=EventType.MOUSE_CLICK,
+        data={"x": 1800, "y": 40}
+    ))
+    return session
+
+
+def test_only_ambiguous_spans_reach_the_model():
+    client = EnrichingBedrockClient()
+    workflow = WorkflowGenerator(client).generate_hybrid(create_session_with_unlabelled_click())
+    steps = {step.step_id: step for step in workflow.steps}
+
+    # Labelled clicks resolved locally, recorded coordinates kept as fallback
+    assert steps["step_1"].selector.type == "text"
+    assert steps["step_1"].selector.value == "Username"
+    assert steps["step_1"].selector.fallback.value == {"x": 450, "y": 320}
+
+    # The unlabelled click went to the model, with the page it happened on
+    assert steps["step_7"].selector.type == "css"
+    assert steps["step_7"].description == "Open the profile menu"
+    assert steps["step_7"].selector.fallback.type == "coordinates"
+    selector_prompt = next(p for p in client.prompts if '"resolve":true' in p)
+    assert "app.example.com/dashboard" in selector_prompt
+    assert "step_1" not in selector_prompt
+    assert selector_prompt.count('"resolve":true') == 1
+    assert steps["step_9"].selector.value == "#profile-menu"
+
+    assert workflow.variables == {"email": "demo@example.com"}
+    assert steps["step_2"].parameters["text"] == "{{email}}"
+    assert steps["step_4"].parameters["text"] == "SecurePass123!"
+
+    assert len(client.prompts) == 2
+    assert workflow.metadata["hybrid"] == {"model_requests": 2, "failed_requests": 0, "enriched_steps": 3}
+
+
+def test_failed_enrichment_keeps_the_deterministic_steps():
+    async def handler(request):
+        return model_reply("I cannot help with that")
+
+    def enrichment_errors() -> float:
+        return sum(count for (stage, _), count in STAGE_ERRORS._series.items() if stage.startswith("enrich_"))
+
+    before = enrichment_errors()
+    generator = WorkflowGenerator(BedrockClient(), make_client(handler))
+    workflow = asyncio.run(generator.generate_hybrid_async(create_session_with_unlabelled_click()))
+    assert enrichment_errors() == before + 2
+
+    step = workflow.steps[-3]
+    assert step.selector.type == "coordinates"
+    assert step.description == "Click at (1800, 40)"
+    assert workflow.steps[1].parameters["text"] == "demo@example.com"
+    assert workflow.metadata["hybrid"]["failed_requests"] == 2
+
+
+def test_repeated_rows_are_enriched_before_folding():
+    client = EnrichingBedrockClient()
+    session = create_mock_session()
+    start = session.events[-1].timestamp
+    for row in range(3):
+        at = start + timedelta(seconds=3 * row + 1)
+        session.events.append(EventLog(timestamp=at, event_type=EventType.MOUSE_CLICK, data={"x": 300, "y": 200 + 20 * row}))
+        session.events.append(EventLog(timestamp=at + timedelta(seconds=1), event_type=EventType.TEXT_INPUT, data={"text": f"row {row}"}))
+
+    workflow = WorkflowGenerator(client).generate_hybrid(session)
+
+    loop = workflow.steps[-1]
+    assert loop.action == "LOOP" and loop.parameters["iterations"] == 3
+    assert loop.parameters["steps"][0]["selector"]["value"] == "#profile-menu"
+    assert workflow.metadata["hybrid"]["enriched_steps"] >= 3
+
+
+def test_click_hints_do_not_leak_between_pages():
+    client = EnrichingBedrockClient()
+    session = create_mock_session()
+    start = session.events[-1].timestamp
+    for offset, url, data in (
+        (1, "https://a.example.com", {"x": 450, "y": 450, "element_text": "Next"}),
+        (3, "https://b.example.com", {"x": 450, "y": 450}),
+    ):
+        session.events.append(EventLog(timestamp=start + timedelta(seconds=offset), event_type=EventType.NAVIGATION, data={"url": url}))
+        session.events.append(EventLog(timestamp=start + timedelta(seconds=offset + 1), event_type=EventType.MOUSE_CLICK, data=data))
+
+    workflow = WorkflowGenerator(client).generate_hybrid(session)
+
+    page_a, page_b = workflow.steps[-3], workflow.steps[-1]
+    assert page_a.selector.value == "Next"
+    # The same coordinates on another page are not labelled by page a's click
+    assert page_b.selector.value == "#profile-menu"
+    assert "b.example.com" in next(p for p in client.prompts if '"resolve":true' in p)
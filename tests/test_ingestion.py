@@ -0,0 +1,53 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src.core.ingestion import IngestionError, read_ndjson_session, write_ndjson_session
+from src.core.workflow_generator import WorkflowGenerator
+from src.models.events import SessionHeader
+from test_workflow_generation import create_mock_session
+
+
+def session_lines():
+    session = create_mock_session()
+    header = SessionHeader(**session.model_dump(exclude={"events"}))
+    return list(write_ndjson_session(header, session.events))
+
+
+def test_ndjson_matches_in_memory_generation():
+    generator = WorkflowGenerator()
+
+    streamed = generator.generate_from_ndjson(iter(session_lines()))
+    in_memory = generator.generate_from_events_only(create_mock_session())
+
+    assert [s.model_dump() for s in streamed.steps] == [s.model_dump() for s in in_memory.steps]
+    assert streamed.metadata["event_count"] == 6
+
+
+def test_events_are_validated_lazily():
+    lines = session_lines()
+    lines.insert(3, '{"timestamp": "not a time", "event_type": "MOUSE_CLICK", "data": {}}\n')
+
+    header, events = read_ndjson_session(lines)
+    assert header.session_id == "test-session-001"
+    assert next(events).event_type == "MOUSE_CLICK"
+    next(events)
+
+    with pytest.raises(IngestionError) as error:
+        next(events)
+    assert error.value.line_number == 4
+
+
+def test_ndjson_endpoint():
+    from src.api.main import app
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/generate/deterministic/ndjson",
+            content="".join(session_lines()).encode(),
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 200
+        assert len(response.json()["workflow"]["steps"]) == 6
+
+        bad = client.post("/generate/deterministic/ndjson", content=b"{}\n")
+        assert bad.status_code == 422
@@ -0,0 +1,190 @@
+import http.server
+import json
+import socket
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.core import jobs
+from src.core.jobs import JobQueue, JobWorker, check_webhook_url
+from src.core.workflow_generator import WorkflowGenerator, build_workflow_generator
+from test_health import FailingBedrockClient, FakeClock
+from test_workflow_generation import create_mock_session
+
+
+def request(use_ai: bool = True) -> dict:
+    return {"session": create_mock_session().model_dump(mode="json"), "use_ai": use_ai}
+
+
+def test_claims_by_priority_and_resumes_lost_jobs(tmp_path):
+    clock = FakeClock()
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=60, max_attempts=2, clock=clock)
+    low = queue.submit(request(), priority=0)
+    high = queue.submit(request(), priority=5)
+
+    assert queue.claim("a")["job_id"] == high
+    assert queue.claim("a")["job_id"] == low
+    assert queue.claim("b") is None
+
+    # Worker "a" dies: after its lease runs out a new process picks the jobs up again
+    clock.now = 61
+    restarted = JobQueue(queue.path, lease_seconds=60, max_attempts=2, clock=clock)
+    resumed = restarted.claim("b")
+    assert resumed["job_id"] == high and resumed["attempts"] == 2
+    restarted.complete(high, "b", {"workflow_id": "wf"})
+    assert restarted.claim("b")["job_id"] == low
+    queue.complete(low, "a", {"workflow_id": "late"})  # no longer a's job: ignored
+
+    # Out of attempts: a job lost again is failed rather than retried forever
+    clock.now = 200
+    assert restarted.claim("c") is None
+    assert restarted.expire() == [{"job_id": low, "webhook_url": None, "error": "Worker lost while running the job"}]
+    assert restarted.expire() == []
+    assert restarted.get(high)["result"] == {"workflow_id": "wf"}
+    assert restarted.get(low)["status"] == "failed"
+    assert restarted.stats() == {"queued": 0, "running": 0, "completed": 1, "failed": 1}
+
+
+def test_throttling_is_retried_with_backoff_until_attempts_run_out(tmp_path):
+    clock = FakeClock()
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=3, clock=clock)
+    throttled = FailingBedrockClient("ThrottlingException", 429)
+    worker = JobWorker(queue, WorkflowGenerator(throttled))
+    worker.backoff = lambda attempts: 10.0
+    job_id = queue.submit(request())
+
+    assert worker.run_once()
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and "ThrottlingException" in job["error"]
+    assert not worker.run_once()  # not due until the backoff has passed
+
+    clock.now = 10
+    assert worker.run_once()
+    clock.now = 20
+    assert worker.run_once()
+    assert queue.get(job_id)["status"] == "failed"
+    assert throttled.calls == 3
+
+    # Bad requests fail at once
+    invalid = FailingBedrockClient("ValidationException", 400)
+    job_id = queue.submit(request())
+    JobWorker(queue, WorkflowGenerator(invalid)).run_once()
+    assert queue.get(job_id)["status"] == "failed" and invalid.calls == 1
+
+
+class WebhookHandler(http.server.BaseHTTPRequestHandler):
+    received: list = []
+    hosts: list = []
+
+    def do_POST(self):
+        self.hosts.append(self.headers["Host"])
+        self.received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_job_api_runs_the_job_and_calls_the_webhook(tmp_path, monkeypatch):
+    from src.api import main
+
+    monkeypatch.setattr(main, "job_queue", JobQueue(str(tmp_path / "jobs.sqlite3")))
+    monkeypatch.setenv("WEBHOOK_ALLOWED_HOSTS", "127.0.0.1")
+    webhook = http.server.ThreadingHTTPServer(("127.0.0.1", 0), WebhookHandler)
+    threading.Thread(target=webhook.serve_forever, daemon=True).start()
+
+    try:
+        with TestClient(main.app) as client:
+            body = request(use_ai=False)
+            body["webhook_url"] = f"http://127.0.0.1:{webhook.server_port}/done"
+            submitted = client.post("/jobs", json=body)
+            assert submitted.status_code == 202
+            job_id = submitted.json()["job_id"]
+
+            deadline = time.time() + 10
+            while client.get(f"/jobs/{job_id}").json()["status"] != "completed" and time.time() < deadline:
+                time.sleep(0.05)
+            job = client.get(f"/jobs/{job_id}").json()
+            assert job["status"] == "completed" and len(job["result"]["steps"]) == 6
+            assert client.get("/jobs/missing").status_code == 404
+    finally:
+        webhook.shutdown()
+
+    assert WebhookHandler.received[-1]["job_id"] == job_id
+    assert WebhookHandler.received[-1]["status"] == "completed"
+
+
+def test_webhooks_cannot_reach_internal_addresses(tmp_path, monkeypatch):
+    from src.api import main
+
+    def resolve(host, port, *args, **kwargs):
+        address = {"hooks.example.com": "93.184.216.34", "rebound.example.com": "169.254.169.254"}.get(host, host)
+        return [(socket.AF_INET6 if ":" in address else socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))]
+
+    monkeypatch.setattr(socket, "getaddrinfo", resolve)
+    check_webhook_url("https://hooks.example.com/done")
+    for url in ("ftp://hooks.example.com/", "http://127.0.0.1:8080/", "http://10.0.0.5/", "http://[::1]/",
+                "http://169.254.169.254/latest/meta-data/", "http://rebound.example.com/"):
+        with pytest.raises(ValueError):
+            check_webhook_url(url)
+    check_webhook_url("http://127.0.0.1:8080/", allowed_hosts={"127.0.0.1"})
+
+    monkeypatch.setattr(main, "job_queue", JobQueue(str(tmp_path / "jobs.sqlite3")))
+    body = {**request(use_ai=False), "webhook_url": "http://169.254.169.254/latest/meta-data/"}
+    assert TestClient(main.app).post("/jobs", json=body).status_code == 400
+
+
+def test_callers_are_told_when_a_lost_job_runs_out_of_attempts(tmp_path):
+    clock = FakeClock()
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=60, max_attempts=1, clock=clock)
+    job_id = queue.submit(request(), webhook_url="https://hooks.example.com/done")
+    queue.claim("crashed")
+
+    notified = []
+    worker = JobWorker(queue, WorkflowGenerator())
+    worker._notify = lambda job, payload: notified.append(payload)
+    clock.now = 61
+    assert not worker.run_once()
+    assert notified == [{"job_id": job_id, "status": "failed", "error": "Worker lost while running the job"}]
+    assert queue.get(job_id)["status"] == "failed"
+
+
+
+def test_workers_build_their_generator_like_the_api(tmp_path, monkeypatch):
+    monkeypatch.setenv("SINGLE_FLIGHT_LOCK_DIR", str(tmp_path / "locks"))
+    monkeypatch.setenv("BEDROCK_MAX_CONCURRENCY", "7")
+    monkeypatch.setenv("CIRCUIT_FAILURE_THRESHOLD", "3")
+    generator = build_workflow_generator()
+
+    assert generator.circuit_breaker is not None and generator.circuit_breaker.failure_threshold == 3
+    assert generator.async_bedrock.max_concurrency == 7
+    assert generator.single_flight.coordinator is not None
+
+
+def test_webhooks_go_to_the_checked_address_off_the_job_thread(tmp_path, monkeypatch):
+    webhook = http.server.ThreadingHTTPServer(("127.0.0.1", 0), WebhookHandler)
+    threading.Thread(target=webhook.serve_forever, daemon=True).start()
+    url = f"http://hooks.example.com:{webhook.server_port}/done"
+    # The name does not resolve here: the delivery must use the address the check returned
+    monkeypatch.setattr(jobs, "check_webhook_url", lambda checked: "127.0.0.1")
+
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.submit(request(use_ai=False), webhook_url=url)
+    worker = JobWorker(queue, WorkflowGenerator())
+    try:
+        assert worker.run_once()
+        worker.close()
+    finally:
+        webhook.shutdown()
+
+    assert WebhookHandler.received[-1]["job_id"] == job_id
+    assert WebhookHandler.hosts[-1] == f"hooks.example.com:{webhook.server_port}"
+
+    pinned = jobs.pinned_request(worker._http, "https://user@hooks.example.com/done?x=1", "2001:db8::1", {})
+    assert str(pinned.url) == "https://user@[2001:db8::1]/done?x=1"
+    assert pinned.headers["Host"] == "hooks.example.com"
+    assert pinned.extensions["sni_hostname"] == "hooks.example.com"
+
@@ -0,0 +1,147 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.core.json_repair import scan_json
+from src.core.workflow_generator import WorkflowGenerator
+from src.services.bedrock_client import BedrockClient
+from src.services.metrics import TRUNCATED_OUTPUTS
+from src.services.response_cache import MemoryCache
+from test_async_bedrock_client import make_client, model_reply
+from test_workflow_generation import create_mock_session
+
+
+def workflow_text(steps: int) -> str:
+    return json.dumps({
+        "workflow_id": "wf-repair",
+        "name": "Fill {rows}",
+        "description": "Type \"quoted\" values",
+        "application": "Chrome Browser",
+        "steps": [
+            {"step_id": f"step_{i}", "action": "TYPE_TEXT", "description": f"Type row {i}",
+             "parameters": {"text": f"row {i}, col {{{i}}}"}}
+            for i in range(1, steps + 1)
+        ],
+        "variables": {}
+    }, indent=2)
+
+
+FULL = workflow_text(6)
+
+# Malformed outputs seen from the model: (name, output, expected step count, truncated)
+CORPUS = [
+    ("clean", FULL, 6, False),
+    ("fenced", f"```json\n{FULL}\n```", 6, False),
+    ("unclosed fence", f"```json\n{FULL}", 6, False),
+    ("bare fence", f"```\n{FULL}\n```", 6, False),
+    ("leading prose with braces", f"I kept {{placeholders}} as written. Here it is:\n{FULL}", 6, False),
+    ("trailing prose", f"{FULL}\n\nLet me know if you need {{changes}}!", 6, False),
+    ("trailing commas", FULL.replace('"variables": {}', '"variables": {},').replace("}\n  ],", "},\n  ],"), 6, False),
+    ("double comma", FULL.replace('"step_2",', '"step_2",,'), 6, False),
+    ("missing comma between steps", FULL.replace("},\n    {", "}\n    {"), 6, False),
+    ("comments", FULL.replace('"steps": [', '"steps": [ // typed rows\n /* six of them */'), 6, False),
+    ("python literals", FULL.replace('"variables": {}', '"variables": {"done": True, "next": None}'), 6, False),
+    ("unquoted keys", FULL.replace('"workflow_id":', "workflow_id:"), 6, False),
+    ("raw newline in string", FULL.replace("Type row 3", "Type row\n3"), 6, False),
+    ("mismatched closer", FULL[:FULL.rindex("]")] + "}" + FULL[FULL.rindex("]") + 1:], 6, False),
+    ("truncated in a step", FULL[:FULL.index('"step_5"') + 20], 4, True),
+    ("truncated in a string", FULL[:FULL.index("row 6, col") + 5], 5, True),
+    ("truncated after a step", FULL[:FULL.index("\n    }", FULL.index('"step_3"')) + 6], 3, True),
+    ("truncated before steps", FULL[:FULL.index('"steps"') + 3], 0, True),
+]
+
+
+@pytest.mark.parametrize("name,output,steps,truncated", CORPUS, ids=[case[0] for case in CORPUS])
+def test_corpus_output_yields_every_complete_step(name, output, steps, truncated):
+    extraction = scan_json(output)
+
+    assert extraction.value is not None, extraction.error
+    assert extraction.truncated == truncated
+    assert len(extraction.value.get("steps", [])) == steps
+    assert extraction.value["workflow_id"] == "wf-repair"
+    # Recovered steps are exact, never half-written
+    expected = json.loads(FULL)["steps"][:steps]
+    recovered = extraction.value.get("steps", [])
+    assert [s["parameters"]["text"] for s in recovered] == [s["parameters"]["text"] for s in expected]
+
+
+@pytest.mark.parametrize("output", ["I cannot help with that", "{not json at all}", '{"workflow_id": "wf'])
+def test_unusable_output_reports_an_error(output):
+    extraction = scan_json(output)
+    assert extraction.value is None
+    assert extraction.error
+
+
+@pytest.mark.parametrize("output,value", [
+    ('{"a": 1 "b": 2}', {"a": 1, "b": 2}),
+    ('{"a": -1.5e3 "b": [1 2]}', {"a": -1500.0, "b": [1, 2]}),
+    ('{"a": true "b": null c: 3}', {"a": True, "b": None, "c": 3}),
+])
+def test_missing_comma_after_a_number_or_literal(output, value):
+    extraction = scan_json(output)
+    assert extraction.value == value
+    assert "missing comma" in extraction.repairs
+
+
+class TruncatingBedrockClient(BedrockClient):
+    """Stops the workflow at a fixed point; continuation requests get the rest"""
+
+    def __init__(self, cut: int, **kwargs):
+        super().__init__(**kwargs)
+        self.cut = cut
+        self.bodies = []
+
+    def _invoke(self, body: dict) -> str:
+        self.bodies.append(body)
+        messages = body["messages"]
+        if messages[-1]["role"] == "assistant":
+            written = messages[-1]["content"][0]["text"]
+            return FULL[len(written):len(written) + self.cut]
+        return FULL[:self.cut]
+
+
+def test_truncated_output_is_continued_not_regenerated():
+    cache = MemoryCache()
+    client = TruncatingBedrockClient(cut=len(FULL) // 2 + 7, cache=cache)
+    workflow = WorkflowGenerator(client).generate_from_session(create_mock_session())
+
+    assert len(workflow.steps) == 6
+    assert "output_repair" not in workflow.metadata
+    assert len(client.bodies) == 2
+    # The continuation carries the partial output as the assistant turn
+    assert client.bodies[1]["messages"][-1]["content"][0]["text"] == FULL[:client.cut].rstrip()
+
+    # The completed output is cached: no further model calls
+    WorkflowGenerator(client).generate_from_session(create_mock_session())
+    assert len(client.bodies) == 2
+
+
+def test_output_still_truncated_keeps_complete_steps():
+    client = TruncatingBedrockClient(cut=len(FULL) // 4)
+    truncated_before = TRUNCATED_OUTPUTS.value()
+    workflow = WorkflowGenerator(client, max_continuations=1).generate_from_session(create_mock_session())
+
+    assert len(client.bodies) == 2
+    assert 0 < len(workflow.steps) < 6
+    assert workflow.metadata["output_repair"] == {"repairs": [], "truncated": True}
+    assert TRUNCATED_OUTPUTS.value() == truncated_before + 1
+
+
+def test_async_generation_repairs_and_continues():
+    preamble = "Sure! ```json\n"
+    cut = FULL.index('"step_4"')
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        messages = json.loads(request.content)["messages"]
+        if messages[-1]["role"] == "assistant":
+            written = len(messages[-1]["content"][0]["text"]) - len(preamble)
+            return model_reply(FULL[written:].replace("}\n  ]", "},\n  ]"))
+        return model_reply(preamble + FULL[:cut])
+
+    generator = WorkflowGenerator(BedrockClient(), make_client(handler))
+    workflow = asyncio.run(generator.generate_from_session_async(create_mock_session()))
+
+    assert [step.step_id for step in workflow.steps] == [f"step_{i}" for i in range(1, 7)]
+    assert workflow.metadata["output_repair"] == {"repairs": ["trailing comma"], "truncated": False}
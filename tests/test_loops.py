@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from src.core.converters import coordinates, make_step
+from src.core.loops import LoopDetectionConfig, LoopFolder, expand_loops
+from src.core.workflow_generator import WorkflowGenerator
+from src.models.events import EventLog, EventType
+from src.models.workflow import ActionType
+from test_workflow_generation import create_mock_session
+
+
+def data_entry(rows: int) -> list:
+    steps = [make_step(1, ActionType.NAVIGATE, "Navigate to sheet", parameters={"url": "https://sheet"})]
+    for row in range(rows):
+        y = 200 + row * 18
+        steps.append(make_step(0, ActionType.CLICK, f"Click at (310, {y})", selector=coordinates(310, y), parameters={"button": "left"}))
+        steps.append(make_step(0, ActionType.TYPE_TEXT, f"Type: item-{row}...", parameters={"text": f"item-{row}"}))
+        steps.append(make_step(0, ActionType.PRESS_KEY, "Press key: Enter", parameters={"key": "Enter", "modifiers": []}))
+    steps.append(make_step(0, ActionType.KEY_COMBINATION, "Press ctrl+s", parameters={"key": "s", "modifiers": ["ctrl"]}))
+    return [step.model_copy(update={"step_id": f"step_{i}"}) for i, step in enumerate(steps, start=1)]
+
+
+def test_repeated_rows_fold_into_one_loop_and_expand_back():
+    steps = data_entry(200)
+    variables = {}
+    folded = LoopFolder().fold(steps, variables)
+
+    assert [step.action for step in folded] == [ActionType.NAVIGATE, ActionType.LOOP, ActionType.KEY_COMBINATION]
+    assert [step.step_id for step in folded] == ["step_1", "step_2", "step_3"]
+
+    loop = folded[1]
+    assert loop.parameters["iterations"] == 200
+    body = loop.parameters["steps"]
+    assert body[0]["selector"]["value"] == {"x": 310, "y": "{{item.step1_y}}"}
+    assert body[1]["parameters"]["text"] == "{{item.step2_text}}"
+    assert body[2]["parameters"] == {"key": "Enter", "modifiers": []}
+    assert variables[loop.parameters["items"]][1] == {"step1_y": 218, "step2_text": "item-1"}
+
+    expanded = expand_loops(folded, variables)
+    assert [s.model_dump() for s in expanded] == [s.model_dump() for s in steps]
+
+
+def test_short_or_structurally_different_repeats_stay_flat():
+    steps = data_entry(2)
+    assert LoopFolder().fold(steps, {}) == steps
+
+    # Same actions but different keys are different steps
+    keys = [make_step(i, ActionType.PRESS_KEY, "Press", parameters={"key": key, "modifiers": []})
+            for i, key in enumerate(["Tab", "Enter", "Tab", "Escape", "Tab", "Enter"], start=1)]
+    assert len(LoopFolder().fold(keys, {})) == 6
+    assert len(LoopFolder(LoopDetectionConfig(min_iterations=2)).fold(data_entry(2), {})) == 3
+
+
+def test_deterministic_generation_folds_loops():
+    session = create_mock_session()
+    start = session.events[-1].timestamp
+    events = list(session.events)
+    for row in range(5):
+        at = start + timedelta(seconds=3 * row + 1)
+        events.append(EventLog(timestamp=at, event_type=EventType.MOUSE_CLICK, data={"x": 300, "y": 200 + 20 * row}))
+        events.append(EventLog(timestamp=at + timedelta(seconds=1), event_type=EventType.TEXT_INPUT, data={"text": f"row {row}"}))
+    session = session.model_copy(update={"events": events})
+
+    workflow = WorkflowGenerator().generate_from_events_only(session)
+
+    assert len(workflow.steps) == 7
+    assert workflow.steps[-1].action == ActionType.LOOP
+    assert workflow.variables["loop_1"][4] == {"step1_y": 280, "step2_text": "row 4"}
+    assert workflow.metadata["loops"] == {"loops": 1, "folded_steps": 10}
+
+    flat = WorkflowGenerator(loop_detection=None).generate_from_events_only(session)
+    assert len(flat.steps) == 16
+    assert not flat.variables
+
+
+def test_descriptions_round_trip_when_values_are_substrings():
+    steps = [
+        make_step(0, ActionType.CLICK, f"Click at (200, {y})", selector=coordinates(200, y), parameters={"button": "left"})
+        for y in (20, 40, 60)
+    ] + [
+        make_step(0, ActionType.CLICK, f"Click at ({x}, 50)", selector=coordinates(x, 50), parameters={"button": "right"})
+        for x in (50, 70, 90)
+    ]
+    steps = [step.model_copy(update={"step_id": f"step_{i}"}) for i, step in enumerate(steps, start=1)]
+    variables = {}
+    folded = LoopFolder().fold(steps, variables)
+
+    assert [loop.parameters["steps"][0]["description"] for loop in folded] == [
+        "Click at (200, {{item.step1_y}})",
+        # Only the x coordinate varies, but 50 also appears as a whole token
+        "{{item.step1_description}}",
+    ]
+    assert [s.model_dump() for s in expand_loops(folded, variables)] == [s.model_dump() for s in steps]
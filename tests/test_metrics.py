@@ -0,0 +1,93 @@
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.core.workflow_generator import WorkflowGenerator
+from src.services.bedrock_client import BedrockClient
+from src.services.metrics import BEDROCK_TOKENS, STAGE_ERRORS, STAGE_SECONDS, MetricsRegistry
+from test_async_bedrock_client import WORKFLOW
+from test_workflow_generation import create_mock_session
+
+
+class FakeRuntime:
+    """invoke_model stand-in that reports token usage like Bedrock does"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def invoke_model(self, **kwargs):
+        body = {
+            "output": {"message": {"content": [{"text": self.text}]}},
+            "usage": {"inputTokens": 1200, "outputTokens": 300}
+        }
+        return {"body": io.BytesIO(json.dumps(body).encode())}
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    in_flight = registry.gauge("in_flight", "In flight")
+    registry.add_collector(lambda: in_flight.set(4))
+
+    requests.inc(route='/a"b')
+    requests.inc(2, route='/a"b')
+    latency.observe(0.05, stage="parse")
+    latency.observe(0.5, stage="parse")
+    latency.observe(5, stage="parse")
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a\\"b"} 3',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{stage="parse",le="0.1"} 1',
+        'latency_seconds_bucket{stage="parse",le="1"} 2',
+        'latency_seconds_bucket{stage="parse",le="+Inf"} 3',
+        'latency_seconds_sum{stage="parse"} 5.55',
+        'latency_seconds_count{stage="parse"} 3',
+        "# HELP in_flight In flight",
+        "# TYPE in_flight gauge",
+        "in_flight 4",
+    ]
+    with pytest.raises(ValueError):
+        requests.inc(path="/a")
+
+
+def test_generation_records_stages_tokens_and_errors():
+    client = BedrockClient(model_id="test-model")
+    client.client = FakeRuntime(json.dumps(WORKFLOW))
+    generator = WorkflowGenerator(client)
+    stages = ("prompt_build", "bedrock.generate_workflow", "json_extract", "validation")
+    before = {stage: STAGE_SECONDS.count(stage=stage) for stage in stages}
+
+    generator.generate_from_session(create_mock_session())
+
+    assert all(STAGE_SECONDS.count(stage=stage) == before[stage] + 1 for stage in stages)
+    assert BEDROCK_TOKENS.value(model="test-model", direction="input") == 1200
+    assert BEDROCK_TOKENS.value(model="test-model", direction="output") == 300
+
+    client.client = FakeRuntime("I cannot help with that")
+    with pytest.raises(ValueError):
+        generator.generate_from_session(create_mock_session())
+    assert STAGE_ERRORS.value(stage="json_extract", error="ValueError") >= 1
+
+
+def test_metrics_endpoint():
+    from src.api.main import app
+
+    with TestClient(app) as client:
+        session = create_mock_session().model_dump(mode="json")
+        assert client.post("/generate", json={"session": session, "use_ai": False}).status_code == 200
+
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'workflow_stage_seconds_count{stage="request_parse"}' in body
+    assert 'workflow_stage_seconds_count{stage="generate.deterministic"}' in body
+    assert 'http_request_seconds_count{method="POST",route="/generate",status="200"}' in body
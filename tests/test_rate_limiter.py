@@ -0,0 +1,156 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from src.services.bedrock_client import BedrockClient, build_workflow_body
+from src.services.client_factory import ClientPoolConfig
+from src.services.fake_bedrock import FakeBedrockConfig, FakeBedrockServer
+from src.services.rate_limiter import (
+    RateLimiter,
+    RateLimitTimeout,
+    SQLiteLimiterStore,
+    estimate_body_tokens,
+    tenant_scope,
+)
+from test_health import FakeClock
+from test_workflow_generation import create_mock_session
+
+
+def test_requests_and_tokens_are_paced_and_settled():
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=2, tpm=1000, clock=clock)
+
+    limiter.acquire(400)
+    limiter.acquire(400)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(100, timeout=0.01)  # out of requests
+
+    clock.now = 60
+    limiter.acquire(900)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(900, timeout=0.01)  # a request is back, but not the tokens
+
+    # The response used far less than reserved: the difference is returned
+    limiter.settle(900, 150)
+    clock.now = 90
+    limiter.acquire(900)
+
+    body = build_workflow_body(create_mock_session().model_dump(mode="json"), ["aGVsbG8="], "compact")
+    assert estimate_body_tokens(body) > 8192 + 1600
+
+
+def test_throttling_cuts_the_shared_rate_and_success_restores_it(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "limiter.sqlite3")
+    worker_a = RateLimiter(rpm=600, store=SQLiteLimiterStore(path), cooldown=2, increase=0.1, clock=clock)
+    worker_b = RateLimiter(rpm=600, store=SQLiteLimiterStore(path), cooldown=2, increase=0.1, clock=clock)
+
+    worker_a.on_throttle()
+    worker_a.on_throttle()  # same burst of throttles: one cut
+    assert worker_b.stats()["rate"] == 0.5
+
+    clock.now = 3
+    worker_b.on_throttle()
+    assert worker_a.stats()["rate"] == 0.25
+    for _ in range(3):
+        worker_a.on_success()
+    assert worker_b.stats()["rate"] == 0.55
+
+
+def test_tenants_are_served_round_robin():
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=1, clock=clock, poll_interval=0.001)
+    limiter.acquire(0)  # bucket now empty
+    served = []
+
+    def request(tenant: str, name: str):
+        with tenant_scope(tenant):
+            limiter.acquire(0)
+        served.append(name)
+
+    threads = []
+    for tenant, name in (("backfill", "b1"), ("backfill", "b2"), ("backfill", "b3"), ("interactive", "i1")):
+        thread = threading.Thread(target=request, args=(tenant, name))
+        thread.start()
+        threads.append(thread)
+        while sum(len(tickets) for tickets in limiter._waiting.values()) < len(threads):
+            time.sleep(0.001)
+
+    for expected in range(1, 5):
+        clock.now += 60
+        while len(served) < expected:
+            time.sleep(0.001)
+
+    for thread in threads:
+        thread.join()
+    assert served == ["b1", "i1", "b2", "b3"]
+
+
+def test_client_retries_throttles_through_the_limiter(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "fake")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "fake")
+    config = FakeBedrockConfig(outputs=['{"steps": []}'], error_rate=0.5, throttle_share=1.0, seed=3)
+
+    with FakeBedrockServer(config) as server:
+        limiter = RateLimiter(rpm=6000, tpm=1_000_000_000, max_retries=8, cooldown=0)
+        client = BedrockClient(
+            endpoint_url=server.endpoint_url,
+            pool_config=ClientPoolConfig(max_attempts=0, retry_mode="standard"),
+            rate_limiter=limiter
+        )
+        for _ in range(4):
+            assert client.generate_workflow(create_mock_session().model_dump(mode="json"), []) == '{"steps": []}'
+
+    assert limiter.throttled == server.stats()["errors"] > 0
+    assert limiter.stats()["rate"] < 1.0
+
+
+def test_async_waits_do_not_block_the_event_loop(tmp_path):
+    path = str(tmp_path / "limiter.sqlite3")
+    limiter = RateLimiter(rpm=600, store=SQLiteLimiterStore(path))
+    # Another process holds the store's write lock for a while
+    holder = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, lambda: holder.execute("COMMIT")).start()
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        await limiter.acquire_async(10)
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 10
+
+
+def test_abandoned_streams_return_their_reservation(monkeypatch):
+    limiter = RateLimiter(tpm=100_000)
+    client = BedrockClient(rate_limiter=limiter)
+
+    def stream(**kwargs):
+        def body():
+            yield {"chunk": {"bytes": json.dumps({"contentBlockDelta": {"delta": {"text": "{"}}}).encode()}}
+            raise ConnectionError("stream cut")
+        return {"body": body()}
+
+    monkeypatch.setattr(client.client, "invoke_model_with_response_stream", stream)
+    settled = []
+    monkeypatch.setattr(limiter, "settle", lambda reserved, used: settled.append(used))
+
+    fragments = client.generate_workflow_stream(create_mock_session().model_dump(mode="json"), [])
+    assert next(fragments) == "{"
+    fragments.close()
+    with pytest.raises(ConnectionError):
+        list(client.generate_workflow_stream({"events": []}, []))
+    assert settled == [0, 0]
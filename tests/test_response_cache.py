@@ -0,0 +1,120 @@
+import time
+from datetime import timedelta
+
+from src.services.async_bedrock_client import AsyncBedrockClient
+from src.services.bedrock_client import BedrockClient, WORKFLOW_INFERENCE_CONFIG, workflow_cache_key
+from src.services.response_cache import MemoryCache, SQLiteCache, TieredCache, make_cache_key
+from src.core.workflow_generator import WorkflowGenerator
+from test_workflow_generation import create_mock_session
+
+
+WORKFLOW_TEXT = """{"workflow_id": "wf-1", "name": "Login", "description": "Log in",
+"application": "Chrome Browser", "steps": []}"""
+
+
+class CountingBedrockClient(BedrockClient):
+    """BedrockClient whose model call is replaced by a counter"""
+
+    def __init__(self, cache):
+        super().__init__(cache=cache)
+        self.calls = 0
+
+    def _invoke(self, body: dict) -> str:
+        self.calls += 1
+        return WORKFLOW_TEXT
+
+
+def test_cache_key_ignores_identity_and_absolute_time():
+    first = create_mock_session()
+    second = create_mock_session()
+    second.session_id = "another-session"
+    second.user_id = "another-user"
+    second.start_time -= timedelta(days=1)
+    for event in second.events:
+        event.timestamp -= timedelta(days=1)
+
+    key_a = make_cache_key("model", WORKFLOW_INFERENCE_CONFIG, first.model_dump(mode="json"))
+    key_b = make_cache_key("model", WORKFLOW_INFERENCE_CONFIG, second.model_dump(mode="json"))
+    key_c = make_cache_key("other-model", WORKFLOW_INFERENCE_CONFIG, first.model_dump(mode="json"))
+
+    assert key_a == key_b
+    assert key_a != key_c
+
+
+def test_sync_and_async_clients_share_workflow_cache_keys():
+    cache = MemoryCache()
+    session = create_mock_session().model_dump(mode="json")
+    other_tenant = {**session, "user_id": "another-user"}
+    BedrockClient(cache=cache).remember_workflow(session, [], WORKFLOW_TEXT)
+
+    async_client = AsyncBedrockClient(cache=cache)
+    assert async_client.cached_workflow(session, []) == WORKFLOW_TEXT
+    assert async_client.cached_workflow(other_tenant, []) == WORKFLOW_TEXT
+    # With tenant examples in the prompt, another tenant never gets the answer
+    assert workflow_cache_key("m", session, [], tenant_scoped=True) != workflow_cache_key(
+        "m", other_tenant, [], tenant_scoped=True
+    )
+
+
+def test_memory_cache_lru_and_ttl():
+    cache = MemoryCache(max_entries=2, ttl_seconds=None)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.evictions == 1
+
+    expiring = MemoryCache(ttl_seconds=0.01)
+    expiring.set("a", "1")
+    time.sleep(0.02)
+    assert expiring.get("a") is None
+
+
+def test_sqlite_cache_size_eviction(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=10, max_bytes=10)
+    cache.set("a", "12345")
+    cache.set("b", "12345")
+    cache.set("c", "12345")
+
+    assert cache.get("a") is None
+    assert cache.get("c") == "12345"
+
+
+def test_repeat_session_skips_model(tmp_path):
+    cache = TieredCache(MemoryCache(), SQLiteCache(str(tmp_path / "cache.sqlite3")))
+    client = CountingBedrockClient(cache)
+    generator = WorkflowGenerator(client)
+
+    session = create_mock_session()
+    first = generator.generate_from_session(session)
+    second = generator.generate_from_session(session)
+
+    assert client.calls == 1
+    assert first == second
+    assert cache.stats()["hits"] == 1
+
+
+def test_output_is_cached_only_after_it_validates():
+    class FlakyBedrockClient(CountingBedrockClient):
+        def _invoke(self, body: dict) -> str:
+            self.calls += 1
+            return "Sorry, I cannot produce that." if self.calls == 1 else WORKFLOW_TEXT
+
+    cache = MemoryCache()
+    client = FlakyBedrockClient(cache)
+    generator = WorkflowGenerator(client)
+    session = create_mock_session()
+
+    try:
+        generator.generate_from_session(session)
+    except ValueError:
+        pass
+    assert len(cache) == 0
+
+    # The retry reaches the model instead of replaying the bad answer
+    assert generator.generate_from_session(session).workflow_id == "wf-1"
+    generator.generate_from_session(session)
+    assert client.calls == 2
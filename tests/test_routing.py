@@ -0,0 +1,138 @@
+import asyncio
+import json
+
+import pytest
+
+from src.core.routing import ModelRouter, RoutingBudget
+from src.core.workflow_generator import WorkflowGenerator
+from src.services.async_bedrock_client import AsyncBedrockClient
+from src.services.bedrock_client import BedrockClient
+from src.services.client_factory import ClientPoolConfig
+from src.services.metrics import MODEL_ESCALATIONS
+from src.services.response_cache import MemoryCache
+from test_async_bedrock_client import WORKFLOW
+from test_workflow_generation import create_mock_session
+
+
+MICRO, LITE, PRO = "amazon.nova-micro-v1:0", "amazon.nova-lite-v1:0", "amazon.nova-pro-v1:0"
+
+
+def long_session(repeats: int):
+    session = create_mock_session()
+    session.events = session.events * repeats
+    return session
+
+
+def test_plan_follows_size_screenshots_and_budget():
+    router = ModelRouter()
+    small = create_mock_session().model_dump(mode="json")
+
+    assert [tier.model_id for tier in router.plan(small, [])] == [MICRO, LITE, PRO]
+    assert [tier.model_id for tier in router.plan(small, ["aW1n"])] == [LITE, PRO]
+    assert [tier.model_id for tier in router.plan(long_session(40).model_dump(mode="json"), [])] == [PRO]
+
+    # Micro has been slow lately: a 9 s latency budget moves the request to Lite
+    for _ in range(5):
+        router.record(router.tiers[0], "success", 10.0)
+    assert router.plan(small, [], RoutingBudget(latency_seconds=9))[0].model_id == LITE
+    # Nothing fits: the smallest capable model is used anyway
+    assert router.plan(small, [], RoutingBudget(cost_usd=1e-9))[0].model_id == MICRO
+
+
+@pytest.fixture
+def models_by_size(monkeypatch):
+    """Micro answers with prose; the larger models answer with a valid workflow"""
+
+    calls = []
+
+    def reply(model_id: str) -> str:
+        calls.append(model_id)
+        return "Here are the steps the user took." if model_id == MICRO else json.dumps(WORKFLOW)
+
+    def invoke(self, body: dict) -> str:
+        return reply(self.model_id)
+
+    async def invoke_async(self, body: dict) -> str:
+        return reply(self.model_id)
+
+    monkeypatch.setattr(BedrockClient, "_invoke", invoke)
+    monkeypatch.setattr(AsyncBedrockClient, "_invoke", invoke_async)
+    return calls
+
+
+def test_invalid_output_escalates_and_is_recorded(models_by_size):
+    router = ModelRouter()
+    generator = WorkflowGenerator(BedrockClient(), router=router)
+
+    workflow = generator.generate_from_session(create_mock_session())
+
+    assert models_by_size == [MICRO, LITE]
+    assert workflow.metadata["model_id"] == LITE
+    assert workflow.metadata["escalated_from"] == [MICRO]
+    stats = router.stats()
+    assert stats[MICRO]["validation_failures"] == 1 and stats[MICRO]["escalations"] == 1
+    assert MODEL_ESCALATIONS.value(model=MICRO) >= 1
+    assert stats[LITE]["successes"] == 1 and stats[LITE]["estimated_cost_usd"] > 0
+    assert stats[PRO]["requests"] == 0
+
+    # Too long for the small models; the async path routes the same way
+    budget = RoutingBudget(latency_seconds=60)
+    workflow = asyncio.run(generator.generate_from_session_async(long_session(30), budget))
+    assert workflow.metadata["model_id"] == PRO
+    assert models_by_size[-1] == PRO
+
+
+def test_cache_hits_stay_out_of_latency_and_cost(models_by_size):
+    cache = MemoryCache()
+    router = ModelRouter()
+    generator = WorkflowGenerator(BedrockClient(cache=cache), router=router)
+    session = create_mock_session()
+
+    generator.generate_from_session(session)
+    before = router.stats()[LITE]
+    workflow = generator.generate_from_session(session)
+
+    # Micro's prose was never cached, so only Lite is answered from the cache
+    assert models_by_size == [MICRO, LITE, MICRO]
+    assert workflow.metadata["model_id"] == LITE
+    stats = router.stats()[LITE]
+    assert stats["requests"] == 1 and stats["cache_hits"] == 1
+    assert stats["estimated_cost_usd"] == before["estimated_cost_usd"]
+    assert stats["p50_latency_seconds"] == before["p50_latency_seconds"]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_budget_is_part_of_the_flight_key():
+    generator = WorkflowGenerator(BedrockClient(), router=ModelRouter())
+    session_dict = create_mock_session().model_dump(mode="json")
+
+    keys = {
+        generator._flight_key(session_dict),
+        generator._flight_key(session_dict, RoutingBudget(latency_seconds=5)),
+        generator._flight_key(session_dict, RoutingBudget(latency_seconds=60)),
+        generator._flight_key(session_dict, RoutingBudget(cost_usd=0.01)),
+    }
+    assert len(keys) == 4
+
+
+def test_tier_clients_share_pools_and_the_concurrency_limit():
+    bedrock = BedrockClient(pool_config=ClientPoolConfig(max_pool_connections=7))
+    async_bedrock = AsyncBedrockClient(max_concurrency=3, timeout=5.0)
+    router = ModelRouter()
+    router.bind(bedrock, async_bedrock)
+
+    micro, micro_async = router.clients(MICRO)
+    assert micro.model_id == MICRO and micro.client is bedrock.client
+    assert micro.pool_config == bedrock.pool_config
+    assert micro_async.model_id == MICRO and micro_async.timeout == 5.0
+    assert micro_async._semaphore is async_bedrock._semaphore
+    assert micro_async._client() is async_bedrock._client()
+
+
+def test_an_empty_plan_fails_loudly():
+    router = ModelRouter()
+    router.plan = lambda *args: []
+    generator = WorkflowGenerator(BedrockClient(), router=router)
+    with pytest.raises(ValueError):
+        generator.generate_from_session(create_mock_session())
+
@@ -0,0 +1,66 @@
+import base64
+import io
+import random
+
+from src.core.image_hash import hamming_distance
+from src.services.bedrock_client import BedrockClient
+from src.services.screenshot_index import BKTree, ScreenshotIndex
+from test_screenshots import save_frame
+
+
+def test_bk_tree_matches_brute_force():
+    rng = random.Random(3)
+    hashes = [rng.getrandbits(64) for _ in range(500)]
+    tree = BKTree()
+    for value in hashes:
+        tree.add(value)
+    for value in hashes[::3]:
+        tree.remove(value)
+    live = set(hashes) - set(hashes[::3])
+
+    for _ in range(200):
+        # Queries near a live hash, so matches exist at small radii
+        query = rng.choice(sorted(live)) ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64))
+        expected = min((hamming_distance(query, h) for h in live if hamming_distance(query, h) <= 6), default=None)
+        found = tree.nearest(query, 6)
+        assert (found[0] if found else None) == expected
+    assert len(tree) == len(live)
+
+
+def test_index_reuses_near_matches_per_prompt_and_evicts():
+    index = ScreenshotIndex(max_entries=2, max_distance=3)
+    index.set(0b1111, "describe", "login screen")
+
+    assert index.get(0b1110, "describe") == "login screen"
+    assert index.get(0b1110, "describe", max_distance=0) is None
+    assert index.get(0b1111, "list buttons") is None
+
+    index.set(1 << 40, "describe", "settings")
+    index.set(1 << 50, "describe", "inbox")  # evicts the least recently used entry
+    assert index.get(0b1111, "describe") is None
+    assert index.get(1 << 50, "describe") == "inbox"
+
+    stats = index.stats()
+    assert (stats["hits"], stats["exact_hits"], stats["misses"], stats["evictions"]) == (2, 1, 3, 1)
+    assert len(index) == 2
+
+
+def test_analyze_screenshot_reuses_analysis_of_recompressed_screen(tmp_path):
+    frame = save_frame(tmp_path / "a.png", 1)
+    png, jpeg = io.BytesIO(), io.BytesIO()
+    frame.save(png, format="PNG")
+    frame.resize((960, 540)).save(jpeg, format="JPEG", quality=60)
+    calls = []
+
+    class CountingClient(BedrockClient):
+        def _invoke(self, body: dict) -> str:
+            calls.append(body)
+            return f"analysis {len(calls)}"
+
+    client = CountingClient(screenshot_index=ScreenshotIndex())
+    first = client.analyze_screenshot(base64.b64encode(png.getvalue()).decode(), "What is on screen?")
+    second = client.analyze_screenshot(base64.b64encode(jpeg.getvalue()).decode(), "What is on screen?")
+    client.analyze_screenshot("not an image", "What is on screen?")
+
+    assert first == second == "analysis 1"
+    assert len(calls) == 2
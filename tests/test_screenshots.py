@@ -0,0 +1,107 @@
+import base64
+import io
+import json
+
+import pytest
+from PIL import Image, ImageDraw
+
+from src.core.image_hash import dhash, hamming_distance
+from src.core.screenshots import ScreenshotPipeline, estimate_image_tokens
+from src.core.workflow_generator import WorkflowGenerator
+from src.services.bedrock_client import BedrockClient, build_workflow_body
+from src.services.metrics import STAGE_ERRORS
+from src.services.screenshot_store import LocalScreenshotStore, S3ScreenshotStore
+from test_workflow_generation import create_mock_session
+
+
+def save_frame(path, label: int, size=(1920, 1080)):
+    """A synthetic screen whose layout depends on label"""
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for i in range(8):
+        shade = (label * 37 + i * 29) % 256
+        draw.rectangle([i * size[0] // 8, 0, (i + 1) * size[0] // 8, size[1] * ((label + i) % 5 + 1) // 6], fill=(shade, 90, 255 - shade))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    image.save(path)
+    return image
+
+
+def test_dhash_tolerates_recompression_but_not_new_screens(tmp_path):
+    frame = save_frame(tmp_path / "a.png", 1)
+    jpeg = io.BytesIO()
+    frame.save(jpeg, format="JPEG", quality=40)
+    recompressed = Image.open(io.BytesIO(jpeg.getvalue()))
+    other = save_frame(tmp_path / "b.png", 2)
+
+    assert hamming_distance(dhash(frame), dhash(recompressed)) <= 4
+    assert hamming_distance(dhash(frame), dhash(other)) > 10
+
+
+def test_pipeline_dedupes_downscales_and_skips_missing(tmp_path):
+    # step_001 and step_003 show the same screen; step_005 was never uploaded
+    save_frame(tmp_path / "screenshots/step_001.png", 1)
+    save_frame(tmp_path / "screenshots/step_003.png", 1)
+    pipeline = ScreenshotPipeline(LocalScreenshotStore(str(tmp_path)), image_token_budget=1000)
+    skipped = STAGE_ERRORS.value(stage="screenshot_load", error="FileNotFoundError")
+
+    images = pipeline.collect(create_mock_session())
+
+    assert len(images) == 1
+    decoded = Image.open(io.BytesIO(base64.b64decode(images[0])))
+    assert estimate_image_tokens(*decoded.size) <= 1000
+    assert abs(decoded.width / decoded.height - 1920 / 1080) < 0.01
+    assert STAGE_ERRORS.value(stage="screenshot_load", error="FileNotFoundError") == skipped + 1
+
+
+def test_s3_store_only_reads_its_own_bucket():
+    requested = []
+
+    class RecordingS3:
+        def get_object(self, Bucket, Key):
+            requested.append((Bucket, Key))
+            return {"Body": io.BytesIO(b"png")}
+
+    store = S3ScreenshotStore("screens")
+    store.client = RecordingS3()
+
+    assert store.get("s3://screens/a.png") == b"png"
+    assert store.get("b.png") == b"png"
+    with pytest.raises(ValueError):
+        store.get("s3://other-bucket/secret.png")
+    assert requested == [("screens", "a.png"), ("screens", "b.png")]
+
+
+def test_pipeline_caps_images_evenly(tmp_path):
+    session = create_mock_session()
+    events = []
+    for i in range(10):
+        save_frame(tmp_path / f"frame_{i}.png", i, size=(320, 200))
+        events.append(session.events[0].model_copy(update={"screenshot_ref": f"frame_{i}.png"}))
+    session = session.model_copy(update={"events": events})
+
+    images = ScreenshotPipeline(LocalScreenshotStore(str(tmp_path)), max_images=3, duplicate_distance=0).collect(session)
+
+    hashes = [dhash(Image.open(io.BytesIO(base64.b64decode(image)))) for image in images]
+    assert hashes == [dhash(Image.open(tmp_path / f"frame_{i}.png")) for i in (0, 4, 9)]
+
+
+def test_workflow_request_carries_images(tmp_path):
+    save_frame(tmp_path / "screenshots/step_001.png", 1)
+    save_frame(tmp_path / "screenshots/step_005.png", 3)
+    sent = []
+
+    class RecordingClient(BedrockClient):
+        def _invoke(self, body: dict) -> str:
+            sent.append(body)
+            return json.dumps({"workflow_id": "wf", "name": "n", "description": "d", "application": "a", "steps": []})
+
+    generator = WorkflowGenerator(
+        RecordingClient(),
+        screenshot_pipeline=ScreenshotPipeline(LocalScreenshotStore(str(tmp_path)))
+    )
+    generator.generate_from_session(create_mock_session())
+
+    content = sent[0]["messages"][0]["content"]
+    assert [block["image"]["format"] for block in content[:-1]] == ["png", "png"]
+    assert "text" in content[-1]
+    assert build_workflow_body({}, [])["messages"][0]["content"][0].keys() == {"text"}
@@ -0,0 +1,40 @@
+import json
+
+from src.services.session_encoder import ENCODING_MODES, encode_session, estimate_tokens
+from test_workflow_generation import create_mock_session
+
+
+def test_all_modes_are_valid_json_and_smaller_than_pretty():
+    session_data = create_mock_session().model_dump(mode="json")
+    pretty_tokens = estimate_tokens(encode_session(session_data, "pretty"))
+
+    for mode in ENCODING_MODES:
+        text = encode_session(session_data, mode)
+        json.loads(text)
+        if mode != "pretty":
+            assert estimate_tokens(text) < pretty_tokens
+
+
+def test_compact_uses_relative_times_and_drops_nulls_and_defaults():
+    session_data = create_mock_session().model_dump(mode="json")
+
+    encoded = json.loads(encode_session(session_data, "compact"))
+
+    first = encoded["events"][0]
+    assert first["t_ms"] == 1000
+    assert "button" not in first["data"]
+    assert "end_time" not in encoded
+    assert "screenshot_ref" not in encoded["events"][1]
+
+
+def test_tabular_rows_align_with_columns():
+    session_data = create_mock_session().model_dump(mode="json")
+
+    table = json.loads(encode_session(session_data, "tabular"))["events"]
+
+    columns = table["columns"]
+    assert all(len(row) == len(columns) for row in table["rows"])
+    last = dict(zip(columns, table["rows"][-1]))
+    assert last["event_type"] == "NAVIGATION"
+    assert last["url"] == "https://app.example.com/dashboard"
+    assert last["t_ms"] == 9000
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from src.core.single_flight import FileLockCoordinator, SingleFlight
+from src.core.workflow_generator import WorkflowGenerator
+from src.services.bedrock_client import BedrockClient
+from src.services.response_cache import MemoryCache
+from test_async_bedrock_client import WORKFLOW, make_client, model_reply
+from test_workflow_generation import create_mock_session
+
+
+class CountingBedrockClient(BedrockClient):
+    """Slow fake model that counts invocations"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+        self._count_lock = threading.Lock()
+
+    def _invoke(self, body: dict) -> str:
+        with self._count_lock:
+            self.calls += 1
+        time.sleep(0.05)
+        return json.dumps(WORKFLOW)
+
+
+def test_concurrent_identical_requests_share_one_call():
+    client = CountingBedrockClient()
+    generator = WorkflowGenerator(client)
+    session = create_mock_session()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        workflows = list(pool.map(lambda _: generator.generate_from_session(session), range(8)))
+
+    assert client.calls == 1
+    assert all(w.workflow_id == "wf-async" for w in workflows)
+    assert workflows[0] is not workflows[1]
+    assert generator.single_flight.stats()["coalesced"] == 7
+
+    # Completed calls are not remembered
+    generator.generate_from_session(session)
+    assert client.calls == 2
+
+
+def test_async_requests_coalesce_and_share_errors():
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        if len(calls) == 1:
+            return model_reply(json.dumps(WORKFLOW))
+        return httpx.Response(500, json={"message": "boom"})
+
+    generator = WorkflowGenerator(BedrockClient(), make_client(handler))
+    session = create_mock_session()
+
+    async def burst():
+        return await asyncio.gather(
+            *(generator.generate_from_session_async(session) for _ in range(5)),
+            return_exceptions=True
+        )
+
+    first = asyncio.run(burst())
+    second = asyncio.run(burst())
+
+    assert len(calls) == 2
+    assert all(w.workflow_id == "wf-async" for w in first)
+    assert len(second) == 5 and all(isinstance(e, Exception) for e in second)
+
+
+def test_lock_file_coordinates_workers_through_shared_cache(tmp_path):
+    # Two generators with separate SingleFlights stand in for two worker processes
+    cache = MemoryCache()
+    coordinator = FileLockCoordinator(str(tmp_path / "locks"))
+    clients = [CountingBedrockClient(cache=cache) for _ in range(2)]
+    generators = [WorkflowGenerator(c, single_flight=SingleFlight(coordinator)) for c in clients]
+    session = create_mock_session()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(lambda g: g.generate_from_session(session), generators))
+
+    assert sum(c.calls for c in clients) == 1
+    # Lock files only exist while their key is in flight
+    assert not list((tmp_path / "locks").iterdir())
+
+
+def test_lock_files_are_per_key(tmp_path):
+    coordinator = FileLockCoordinator(str(tmp_path))
+    held = coordinator.acquire("a")
+    try:
+        assert coordinator.try_acquire("a") is None
+        other = coordinator.try_acquire("b")
+        assert other is not None
+        coordinator.release(other)
+    finally:
+        coordinator.release(held)
+
+    # A waiter on the released file moves on to a fresh one
+    again = coordinator.try_acquire("a")
+    assert again is not None
+    coordinator.release(again)
+
+
+def test_cancelling_the_first_caller_does_not_cancel_followers():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("key", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_async("key", slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower, leader.cancelled()
+
+    assert asyncio.run(main()) == ("done", True)
+    assert flight.stats()["coalesced"] == 1
+
+
+def test_leader_error_reaches_followers():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.05)
+        raise ValueError("model output was not JSON")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "key", fail)
+        started.wait()
+        follower = pool.submit(flight.do, "key", lambda: "never called")
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
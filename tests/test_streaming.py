@@ -0,0 +1,58 @@
+import json
+
+from src.core.stream_parser import IncrementalStepParser
+from src.core.workflow_generator import WorkflowGenerator
+from src.models.workflow import WorkflowDefinition, WorkflowStep
+from src.services.bedrock_client import BedrockClient
+from test_workflow_generation import create_mock_session
+
+
+MODEL_OUTPUT = """```json
+{
+  "workflow_id": "wf-stream",
+  "name": "Login {with braces}",
+  "description": "Quote \\" and [brackets] in strings",
+  "application": "Chrome Browser",
+  "steps": [
+    {"step_id": "step_1", "action": "CLICK", "description": "Click {login}",
+     "selector": {"type": "coordinates", "value": {"x": 1, "y": 2}}, "parameters": {"keys": [1, 2]}},
+    {"step_id": "step_2", "action": "TYPE_TEXT", "description": "Type", "parameters": {"text": "a}b"}}
+  ],
+  "variables": {"steps": [{"not": "a step"}]}
+}
+```"""
+
+
+class FakeStreamingRuntime:
+    def invoke_model_with_response_stream(self, **kwargs):
+        events = []
+        for i in range(0, len(MODEL_OUTPUT), 7):
+            chunk = {"contentBlockDelta": {"delta": {"text": MODEL_OUTPUT[i:i + 7]}, "contentBlockIndex": 0}}
+            events.append({"chunk": {"bytes": json.dumps(chunk).encode()}})
+        events.append({"chunk": {"bytes": json.dumps({"messageStop": {"stopReason": "end_turn"}}).encode()}})
+        return {"body": iter(events)}
+
+
+def test_parser_emits_steps_as_they_close():
+    parser = IncrementalStepParser()
+    emitted_at = []
+
+    for i, char in enumerate(MODEL_OUTPUT):
+        for step in parser.feed(char):
+            emitted_at.append((i, step["step_id"]))
+
+    assert [step_id for _, step_id in emitted_at] == ["step_1", "step_2"]
+    # Step 1 is available long before the model finishes writing
+    assert emitted_at[0][0] < MODEL_OUTPUT.index("step_2")
+
+
+def test_stream_from_session_yields_steps_then_workflow():
+    client = BedrockClient()
+    client.client = FakeStreamingRuntime()
+    generator = WorkflowGenerator(client)
+
+    items = list(generator.stream_from_session(create_mock_session()))
+
+    assert [type(item) for item in items] == [WorkflowStep, WorkflowStep, WorkflowDefinition]
+    assert items[1].parameters == {"text": "a}b"}
+    assert items[-1].workflow_id == "wf-stream"
@@ -1,7 +1,11 @@
 import json
+import os
 from datetime import datetime, timedelta
+from unittest.mock import patch
 from src.models.events import SessionTimeline, EventLog, EventType
 from src.core.workflow_generator import WorkflowGenerator
+from src.services.bedrock_client import BedrockClient
+from src.services.fake_bedrock import FakeBedrockServer
 
 
 def create_mock_session():
@@ -121,15 +125,28 @@ def test_deterministic_generation():
 
 
 def test_ai_generation():
-    """Test workflow generation with Nova Pro AI"""
+    """Test workflow generation with Nova Pro AI.
+
+    Runs against the local Bedrock stand-in; set BEDROCK_LIVE=1 to call the real service.
+    """
     
     print("\n" + "=" * 60)
     print("TEST: AI-Powered Workflow Generation (Nova Pro)")
     print("=" * 60)
     
     session = create_mock_session()
-    generator = WorkflowGenerator()
-    
+    if os.getenv("BEDROCK_LIVE"):
+        return run_ai_generation(WorkflowGenerator(), session)
+
+    credentials = {"AWS_ACCESS_KEY_ID": "fake", "AWS_SECRET_ACCESS_KEY": "fake"}
+    with FakeBedrockServer() as server, patch.dict(os.environ, credentials):
+        generator = WorkflowGenerator(BedrockClient(endpoint_url=server.endpoint_url))
+        workflow = run_ai_generation(generator, session)
+    assert workflow is not None and workflow.workflow_id == "wf-fake"
+    assert server.stats()["requests"] == 1
+
+
+def run_ai_generation(generator, session):
     print("\nSending session to Nova Pro for analysis...")
     
     try: